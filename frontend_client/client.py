@@ -4,14 +4,74 @@ import threading
 import time
 import asyncio
 import websocket
+import zlib
+from urllib.parse import quote
 from utils.pretty_display import print_info, print_border, print_startup_message
 from utils.animations import animate_pack_opening
+from utils.auction_protocol import AuctionDecoder, SUBPROTOCOL as AUCTION_BINARY_SUBPROTOCOL
 
 # Frontend CLI client helpers
 # This module provides a thin synchronous client for interacting with the
 # FastAPI server. WebSocket connections are handled via background threads
 # (using websocket-client) so the CLI remains responsive.
 
+class AuctionCountdown:
+    """Renders the auction countdown locally from the server's ends_at deadline."""
+    # The server only sends deadlines (auction_started / new_bid /
+    # timer_extended), so this thread prints the warnings the old per-second
+    # timer_update messages used to trigger.
+
+    WARN_AT = {30, 20, 10, 5, 4, 3, 2, 1}
+
+    def __init__(self):
+        self.ends_at = None
+        self._offset = 0.0  # server clock minus local clock
+        self._last_shown = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def update(self, ends_at, server_time=None):
+        with self._lock:
+            if server_time is not None:
+                self._offset = server_time - time.time()
+            self.ends_at = ends_at
+            self._last_shown = None
+
+    def clear(self):
+        self.update(None)
+
+    def remaining(self):
+        """Whole seconds left, or None when no auction is running."""
+        with self._lock:
+            if self.ends_at is None:
+                return None
+            left = self.ends_at - (time.time() + self._offset)
+        return max(0, int(left + 0.999))
+
+    def start(self):
+        self._stop.clear()
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.clear()
+
+    def _run(self):
+        while not self._stop.wait(0.2):
+            left = self.remaining()
+            if left is None or left == self._last_shown or left not in self.WARN_AT:
+                continue
+            self._last_shown = left
+            if left <= 10:
+                print(f" WARNING: {left} seconds remaining!")
+            else:
+                print(f" {left} seconds remaining")
+
+
 class SignInClient:
     def __init__(self, base_url: str):
         self.base_url = base_url
@@ -46,7 +106,9 @@ class MainClient:
         self._ws_thread = None
         self._auction_ws_app = None
         self._auction_ws_thread = None
+        self._market_ws_app = None
         self.current_auction_room_id = None
+        self.auction_countdown = AuctionCountdown()
         self.user_uuid = None  # You'll need to get this from login response
 
     def debug_create_pack(self):
@@ -210,52 +272,192 @@ class MainClient:
         response = self.session.post(url, json=payload)
         return response.json()
 
-    def list_item_for_marketplace(self, card_name: str, listing_price: int, rarity: str, email: str):
-        """List an item in the marketplace."""
+    def list_item_for_marketplace(self, card_name: str, listing_price: int, rarity: str, email: str, ttl_seconds: int = None):
+        """List an item in the marketplace, optionally expiring after ttl_seconds."""
         url = f"{self.base_url}/marketplace/list"
         payload = {
             "card_name": card_name,
             "rarity": rarity,
             "price": listing_price,
-            "email": email
+            "email": email,
+            "ttl_seconds": ttl_seconds
         }
         response = self.session.post(url, json=payload)
         return response.json()
 
-    def search_marketplace(self, num_items: int, min_price: float, max_price: float, rarities: list, card_names: list):
-        """Search the marketplace for items."""
+    def search_marketplace(self, num_items: int, min_price: float, max_price: float, rarities: list, card_names: list, query: str = None, fuzzy: bool = False, facets: bool = False):
+        """Search the marketplace for items. With facets=True the response also
+        has counts per rarity / card name and a price histogram."""
         url = f"{self.base_url}/marketplace/search"
         payload = {
-            "num_items": num_items,
-            "min_price": min_price,
+            "limit": num_items,
+            "price_min": int(min_price),
+            "price_max": int(max_price),
+            "rarities": rarities or None,
+            "card_names": card_names or None,
+            "facets": facets
+        }
+        if query:
+            # server-side name search (prefix / fuzzy) instead of exact names
+            payload["query"] = query
+            payload["fuzzy"] = fuzzy
+        response = self.session.post(url, json=payload)
+        return response.json()
+
+    def place_buy_order(self, card_name: str, rarity: str, max_price: int, quantity: int = 1):
+        """Place a standing buy order, filled automatically from listings at or below max_price."""
+        url = f"{self.base_url}/marketplace/bid"
+        payload = {
+            "email": self.email,
+            "card_name": card_name,
+            "rarity": rarity,
             "max_price": max_price,
-            "rarities": rarities,
-            "types": card_names
+            "quantity": quantity
+        }
+        response = self.session.post(url, json=payload)
+        return response.json()
+
+    def get_my_buy_orders(self):
+        url = f"{self.base_url}/marketplace/my_bids"
+        response = self.session.post(url, json={"email": self.email})
+        return response.json()
+
+    def cancel_buy_order(self, order_id: int):
+        url = f"{self.base_url}/marketplace/bid/cancel"
+        response = self.session.post(url, json={"email": self.email, "order_id": order_id})
+        return response.json()
+
+    def list_bundle(self, cards: list, price: int, title: str = None):
+        """List several cards together at one price. `cards` is a list of (card_name, rarity)."""
+        url = f"{self.base_url}/marketplace/bundle/list"
+        payload = {
+            "email": self.email,
+            "cards": [{"card_name": name, "rarity": rarity} for name, rarity in cards],
+            "price": price,
+            "title": title
         }
         response = self.session.post(url, json=payload)
         return response.json()
 
-    def join_auction_room(self, room_id: int, on_message=None, timeout: float = 5.0):
+    def search_bundles(self, card_name: str = None, limit: int = 10):
+        url = f"{self.base_url}/marketplace/bundles"
+        response = self.session.post(url, json={"card_name": card_name, "limit": limit})
+        return response.json()
+
+    def buy_bundle(self, bundle_id: int):
+        url = f"{self.base_url}/marketplace/bundle/buy"
+        response = self.session.post(url, json={"email": self.email, "bundle_id": bundle_id})
+        return response.json()
+
+    def add_price_alert(self, card_name: str, rarity: str, max_price: int):
+        """Get alerted when a card is listed at or below max_price."""
+        url = f"{self.base_url}/marketplace/watch"
+        payload = {"email": self.email, "card_name": card_name, "rarity": rarity, "max_price": max_price}
+        response = self.session.post(url, json=payload)
+        return response.json()
+
+    def get_price_alerts(self):
+        url = f"{self.base_url}/marketplace/watchlist"
+        response = self.session.post(url, json={"email": self.email})
+        return response.json()
+
+    def remove_price_alert(self, rule_id: int):
+        url = f"{self.base_url}/marketplace/watch/remove"
+        response = self.session.post(url, json={"email": self.email, "rule_id": rule_id})
+        return response.json()
+
+    def get_notifications(self):
+        """Unread alerts that arrived while not connected to the marketplace feed."""
+        url = f"{self.base_url}/notifications"
+        response = self.session.post(url, json={"email": self.email})
+        return response.json()
+
+    def watch_marketplace(self, card_names: list = None, rarities: list = None, on_event=None):
+        """Subscribe to live marketplace events (listings added/sold/cancelled, price changes).
+
+        Runs in a background thread until `stop_watching_marketplace` is called.
+        Replaces polling `search_marketplace` for updates.
+        """
+        # identify ourselves so our price alerts arrive on the same socket
+        params = ["email=" + quote(self.email)]
+        if card_names:
+            params.append("card_names=" + quote(",".join(card_names)))
+        if rarities:
+            params.append("rarities=" + quote(",".join(rarities)))
+        ws_path = f"{self.base_url}/ws/marketplace?" + "&".join(params)
+        ws_url = self._to_ws_url(ws_path)
+
+        def _on_message(ws, message):
+            try:
+                data = json.loads(message)
+            except json.JSONDecodeError:
+                print_info(f'Raw WS message: {message}')
+                return
+            if on_event:
+                on_event(data)
+            else:
+                print_market_event(data)
+
+        def _on_error(ws, error):
+            print_info(f'Marketplace feed error: {error}')
+
+        self._market_ws_app = websocket.WebSocketApp(
+            ws_url,
+            on_message=_on_message,
+            on_error=_on_error,
+        )
+        thread = threading.Thread(target=self._market_ws_app.run_forever, daemon=True)
+        thread.start()
+        return {'watching': True}
+
+    def stop_watching_marketplace(self):
+        if self._market_ws_app:
+            self._market_ws_app.close()
+            self._market_ws_app = None
+
+    def join_auction_room(self, room_id: int, on_message=None, timeout: float = 5.0, compress: bool = False,
+                          resync: bool = False, binary: bool = False):
         """Connect to an auction room websocket."""
         # Connects to a specific auction room and routes incoming JSON
         # messages to `_handle_auction_message` (or a user-provided handler).
+        # With compress=True the server deflates large messages into binary frames;
+        # resync=True asks for an occasional timer_update besides the deadlines.
+        # binary=True negotiates the packed binary protocol (decoded back into
+        # the same dicts); compress is ignored then.
         ws_path = f"{self.base_url}/auction/room/{room_id}?user_uuid={self.user_uuid}"
+        if compress and not binary:
+            ws_path += "&compress=true"
+        if resync:
+            ws_path += "&resync=true"
         ws_url = self._to_ws_url(ws_path)
         
         self.current_auction_room_id = room_id
+        decoder = AuctionDecoder() if binary else None
+
+        def _handle(data):
+            if on_message:
+                on_message(data)
+            else:
+                # Default message handling
+                self._handle_auction_message(data)
 
         def _on_open(ws):
             self.is_in_auction_room = True
+            self.auction_countdown.start()
             print_info(f'Connected to auction room {room_id}')
 
         def _on_message(ws, message):
             try:
+                if decoder and isinstance(message, bytes):
+                    for data in decoder.decode(message):
+                        _handle(data)
+                    return
+                if isinstance(message, bytes):
+                    message = zlib.decompress(message).decode('utf-8')
                 data = json.loads(message)
-                if on_message:
-                    on_message(data)
-                else:
-                    # Default message handling
-                    self._handle_auction_message(data)
+                if decoder and data.get('type') == 'auction_state_delta':
+                    data = decoder.message(data)
+                _handle(data)
             except json.JSONDecodeError:
                 print_info(f'Raw WS message: {message}')
             except Exception as e:
@@ -264,6 +466,7 @@ class MainClient:
         def _on_close(ws, close_status_code, close_msg):
             self.is_in_auction_room = False
             self.current_auction_room_id = None
+            self.auction_countdown.stop()
             print_info(f'Left auction room: {close_status_code} {close_msg}')
 
         def _on_error(ws, error):
@@ -275,6 +478,7 @@ class MainClient:
             on_message=_on_message,
             on_close=_on_close,
             on_error=_on_error,
+            subprotocols=[AUCTION_BINARY_SUBPROTOCOL] if binary else None,
         )
 
         def _run():
@@ -296,6 +500,12 @@ class MainClient:
     def _handle_auction_message(self, data):
         """Default handler for auction messages."""
         msg_type = data.get('type')
+
+        # Any message carrying a deadline resets the local countdown
+        if 'ends_at' in data:
+            self.auction_countdown.update(data['ends_at'], data.get('server_time'))
+        elif msg_type in ('buyout', 'auction_won', 'auction_failed', 'room_idle'):
+            self.auction_countdown.clear()
         
         if msg_type == 'auction_state':
             print_border()
@@ -308,7 +518,7 @@ class MainClient:
                 print(f"Buyout Price: ${item.get('buyout', 0)}")
             print(f"Current Bid: ${data.get('current_bid', 0)}")
             print(f"Current Winner: {data.get('current_winner', 'None')}")
-            print(f"Time Remaining: {data.get('time_remaining', 0)}s")
+            print(f"Time Remaining: {self.auction_countdown.remaining() or 0}s")
             print(f"Queue Length: {data.get('queue_length', 0)}")
             print_border()
             
@@ -326,9 +536,8 @@ class MainClient:
             print(f" New bid: ${data.get('amount', 0)} by {data.get('bidder', 'Unknown')}")
             
         elif msg_type == 'timer_update':
-            remaining = data.get('time_remaining', 0)
-            if remaining <= 10:
-                print(f" WARNING: {remaining} seconds remaining!")
+            # Optional resync; the countdown thread does the printing
+            pass
             
         elif msg_type == 'buyout':
             print_border()
@@ -348,7 +557,7 @@ class MainClient:
             print(f" Bid failed: {data.get('error', 'Unknown error')}")
             
         elif msg_type == 'timer_extended':
-            print(f" Timer extended to {data.get('new_time', 10)} seconds!")
+            print(f" Timer extended to {self.auction_countdown.remaining() or data.get('new_time', 10)} seconds!")
 
     def send_auction_message(self, payload: dict):
         if not self.is_in_auction_room or not self._auction_ws_app:
@@ -380,6 +589,7 @@ class MainClient:
     def leave_auction_room(self):
         """Leave the current auction room."""
         if self._auction_ws_app:
+            self.auction_countdown.stop()
             self._auction_ws_app.close()
             self.is_in_auction_room = False
             self.current_auction_room_id = None
@@ -417,6 +627,9 @@ def parse_auction_command(command: str):
     
     elif cmd == 'status':
         return 'status', None
+
+    elif cmd == 'time':
+        return 'time', None
     
     elif cmd == 'exit':
         return 'exit', None
@@ -427,6 +640,45 @@ def parse_auction_command(command: str):
     return 'invalid', f"Unknown command: {cmd}"
 
 
+def print_market_event(event: dict):
+    """Print one /ws/marketplace event."""
+    kind = event.get('type')
+    if kind == 'subscribed':
+        print_info(f"Watching {len(event.get('snapshot', []))} listed card(s)")
+        for item in event.get('snapshot', []):
+            print(f"  [{item['rarity'].upper()}] {item['card_name']} - from ${item['min_ask']} ({item['depth']} listed)")
+    elif kind in ('listing_added', 'listing_sold', 'listing_cancelled'):
+        listing = event['listing']
+        action = {'listing_added': 'NEW', 'listing_sold': 'SOLD', 'listing_cancelled': 'GONE'}[kind]
+        print(f"  {action}: [{listing['rarity'].upper()}] {listing['card_name']} - ${listing['price']} (ID: {listing['id']})")
+    elif kind == 'price_alert':
+        listing = event['listing']
+        print(f"  ALERT: [{listing['rarity'].upper()}] {listing['card_name']} listed at ${listing['price']} (your target ${event['max_price']}, ID: {listing['id']})")
+    elif kind == 'price_changed':
+        ask = f"${event['min_ask']}" if event.get('min_ask') is not None else "none listed"
+        sale = f", last sale ${event['last_sale']}" if event.get('last_sale') is not None else ""
+        print(f"  PRICE: [{event['rarity'].upper()}] {event['card_name']} - lowest ask {ask}{sale}")
+    else:
+        print_info(f"Marketplace: {event}")
+
+
+def print_search_facets(facets: dict):
+    """Print the facet counts and price histogram from a marketplace search."""
+    print(f"{facets.get('total', 0)} matching listing(s)")
+    if facets.get('rarities'):
+        print("By rarity:   " + ", ".join(f"{r} ({n})" for r, n in facets['rarities'].items()))
+    if facets.get('card_names'):
+        print("By card:     " + ", ".join(f"{c} ({n})" for c, n in facets['card_names'].items()))
+    histogram = facets.get('price_histogram') or []
+    peak = max((bucket['count'] for bucket in histogram), default=0)
+    if peak:
+        print("Prices:")
+        for bucket in histogram:
+            bar = "#" * round(20 * bucket['count'] / peak)
+            print(f"  ${bucket['min']:>6}-{bucket['max']:<6} {bar} {bucket['count']}")
+    print_border()
+
+
 def marketplace_menu(main_client: MainClient):
     """interaction with marketplace"""
     while True:
@@ -436,9 +688,13 @@ def marketplace_menu(main_client: MainClient):
         print("1. Search Market")
         print("2. List Item for Sale")
         print("3. Buy Item")
-        print("4. Back to Main Menu")
+        print("4. Watch Market (live)")
+        print("5. Buy Orders")
+        print("6. Price Alerts")
+        print("7. Bundles")
+        print("8. Back to Main Menu")
 
-        choice = input("Enter choice (1-4): ")
+        choice = input("Enter choice (1-8): ")
 
         if choice == '1':
             try:
@@ -446,13 +702,16 @@ def marketplace_menu(main_client: MainClient):
                 min_price = float(input("Minimum price: "))
                 max_price = float(input("Maximum price: "))
                 rarities = input("Rarities (comma-separated, leave blank for all): ").split(',')
-                card_names = input("Names (comma-separated, leave blank for all): ").split(',')
+                query = input("Name search (partial names ok, leave blank for all): ").strip()
                 response = main_client.search_marketplace(
                     num_items=num_items,
                     min_price=min_price,
                     max_price=max_price,
                     rarities=[r.strip() for r in rarities if r.strip()],
-                    card_names=[t.strip() for t in card_names if t.strip()]
+                    card_names=[],
+                    query=query or None,
+                    fuzzy=True,
+                    facets=True
                 )
                 
                 if "listings" in response:
@@ -465,6 +724,8 @@ def marketplace_menu(main_client: MainClient):
                         print(f"Price: ${item.get('price', 0)}")
                         #print(f"Seller: {item.get('seller_uuid', 'Unknown')}")
                         print_border()
+                    if response.get('facets'):
+                        print_search_facets(response['facets'])
                 else:
                     print(f"Error: {response}")
                     
@@ -500,11 +761,13 @@ def marketplace_menu(main_client: MainClient):
                 print(card_rarity)
                 
                 listing_price = int(input("Listing price: $"))
+                hours = input("Expire after how many hours? (leave blank for never): ").strip()
                 response = main_client.list_item_for_marketplace(
                     card_name=card_name,
                     listing_price=listing_price,
                     rarity=card_rarity,
-                    email=main_client.email
+                    email=main_client.email,
+                    ttl_seconds=int(float(hours) * 3600) if hours else None
                 )
                 
                 if response.get('message'):
@@ -574,6 +837,110 @@ def marketplace_menu(main_client: MainClient):
             except ValueError:
                 print("Invalid input.")
         elif choice == '4':
+            card_names = input("Card names (comma-separated, leave blank for all): ").split(',')
+            rarities = input("Rarities (comma-separated, leave blank for all): ").split(',')
+            main_client.watch_marketplace(
+                card_names=[n.strip() for n in card_names if n.strip()],
+                rarities=[r.strip() for r in rarities if r.strip()]
+            )
+            input("Watching the market, press Enter to stop...\n")
+            main_client.stop_watching_marketplace()
+        elif choice == '5':
+            orders = main_client.get_my_buy_orders().get('orders', [])
+            print_border()
+            print("YOUR BUY ORDERS")
+            print_border()
+            for order in orders:
+                print(f"  #{order['id']} [{order['rarity'].upper()}] {order['card_name']} - up to ${order['max_price']} x{order['remaining']}")
+            if not orders:
+                print("  (none)")
+            print_border()
+            action = input("(p)lace new order, (c)ancel an order, or Enter to go back: ").strip().lower()
+            try:
+                if action == 'p':
+                    card_name = input("Card name: ").strip()
+                    rarity = input("Rarity: ").strip()
+                    max_price = int(input("Max price per card: $"))
+                    quantity = int(input("Quantity (default 1): ") or 1)
+                    response = main_client.place_buy_order(card_name, rarity, max_price, quantity)
+                    if response.get('message'):
+                        print(f"Success: {response['message']}")
+                        for fill in response.get('fills', []):
+                            print(f"  Bought listing {fill['listing_id']} for ${fill['price']}")
+                        print(f"  Still waiting for {response.get('remaining', 0)} more")
+                    else:
+                        print(f"Error: {response.get('error', response)}")
+                elif action == 'c':
+                    order_id = int(input("Order number to cancel: #"))
+                    response = main_client.cancel_buy_order(order_id)
+                    print(response.get('message') or f"Error: {response.get('error', response)}")
+            except ValueError:
+                print("Invalid input.")
+        elif choice == '6':
+            inbox = main_client.get_notifications().get('notifications', [])
+            if inbox:
+                print_border()
+                print("WHILE YOU WERE AWAY")
+                print_border()
+                for notification in inbox:
+                    print_market_event(notification['payload'])
+            rules = main_client.get_price_alerts().get('rules', [])
+            print_border()
+            print("YOUR PRICE ALERTS")
+            print_border()
+            for rule in rules:
+                print(f"  #{rule['id']} [{rule['rarity'].upper()}] {rule['card_name']} at or below ${rule['max_price']}")
+            if not rules:
+                print("  (none)")
+            print_border()
+            action = input("(a)dd an alert, (r)emove one, or Enter to go back: ").strip().lower()
+            try:
+                if action == 'a':
+                    card_name = input("Card name: ").strip()
+                    rarity = input("Rarity: ").strip()
+                    max_price = int(input("Alert when listed at or below: $"))
+                    response = main_client.add_price_alert(card_name, rarity, max_price)
+                    print(response.get('message') or f"Error: {response.get('error', response)}")
+                elif action == 'r':
+                    rule_id = int(input("Alert number to remove: #"))
+                    response = main_client.remove_price_alert(rule_id)
+                    print(response.get('message') or f"Error: {response.get('error', response)}")
+            except ValueError:
+                print("Invalid input.")
+        elif choice == '7':
+            card_name = input("Only bundles containing card (leave blank for all): ").strip()
+            bundles = main_client.search_bundles(card_name=card_name or None).get('bundles', [])
+            print_border()
+            print("BUNDLES")
+            print_border()
+            for i, bundle in enumerate(bundles, start=1):
+                cards = ", ".join(f"[{c['rarity'].upper()}] {c['card_name']}" for c in bundle['cards'])
+                print(f"  {i}. {bundle.get('title') or 'Bundle'} - ${bundle['price']}: {cards}")
+            if not bundles:
+                print("  (none)")
+            print_border()
+            action = input("Enter a number to buy, (l) to list your own bundle, or Enter to go back: ").strip().lower()
+            try:
+                if action == 'l':
+                    cards_response = main_client.get_my_cards()
+                    my_cards = cards_response.get('cards', [])
+                    for i, card in enumerate(my_cards, start=1):
+                        print(f"  {i}. [{card['rarity'].upper()}] {card['card_name']} x{card['qty']}")
+                    picks = input("Card numbers to bundle (comma-separated, repeat for copies): ").split(',')
+                    selected = [my_cards[int(p) - 1] for p in picks if p.strip()]
+                    price = int(input("Bundle price: $"))
+                    title = input("Title (optional): ").strip()
+                    response = main_client.list_bundle(
+                        [(c['card_name'], c['rarity']) for c in selected], price, title or None
+                    )
+                    print(response.get('message') or f"Error: {response.get('error', response)}")
+                elif action:
+                    bundle = bundles[int(action) - 1]
+                    response = main_client.buy_bundle(bundle['id'])
+                    print(response.get('message') or f"Error: {response.get('error', response)}")
+            except (ValueError, IndexError):
+                print("Invalid input.")
+        elif choice == '8':
             break
         else:
             print("Invalid choice.")
@@ -584,6 +951,7 @@ def auction_room_interface(main_client: MainClient):
     print_info("Commands:")
     print_info("  bid <amount> - Place a bid")
     print_info("  status - Request current auction status")
+    print_info("  time - Show time left on the current auction")
     print_info("  help - Show commands")
     print_info("  exit - Leave auction room")
     print_border()
@@ -601,9 +969,16 @@ def auction_room_interface(main_client: MainClient):
             elif command == 'status':
                 main_client.send_auction_message({"type": "status"})
                 print("Requesting auction status...")
+
+            elif command == 'time':
+                remaining = main_client.auction_countdown.remaining()
+                if remaining is None:
+                    print("No auction running.")
+                else:
+                    print(f"{remaining} seconds remaining")
                 
             elif command == 'help':
-                print("Commands: bid <amount>, status, help, exit")
+                print("Commands: bid <amount>, status, time, help, exit")
                 
             elif command == 'exit':
                 main_client.leave_auction_room()
@@ -696,13 +1071,15 @@ def auction_house_menu(main_client: MainClient):
                 
         elif choice == '3':
             try:
-                room_id = int(input("Enter room ID (0-9): "))
-                if room_id < 0 or room_id > 9:
+                # Rooms open and close with demand, so check against the live list
+                open_rooms = [room['room_id'] for room in main_client.get_auction_rooms().get('rooms', [])]
+                room_id = int(input(f"Enter room ID ({', '.join(map(str, open_rooms))}): "))
+                if room_id not in open_rooms:
                     print("Invalid room ID")
                     continue
                     
                 print(f"Connecting to auction room {room_id}...")
-                response = main_client.join_auction_room(room_id)
+                response = main_client.join_auction_room(room_id, binary=True)
                 
                 if response.get('connected'):
                     auction_room_interface(main_client)
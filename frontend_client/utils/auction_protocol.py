@@ -0,0 +1,125 @@
+# decoder for the binary auction room protocol ("cardpack.auction.bin").
+# Mirrors server_components/auction_utils/binary_protocol.py; keep the
+# layouts in sync. A binary frame is a run of records: intern records define
+# the string behind an id (user uuid / card name), message records are an
+# opcode, a present mask and a null mask followed by the packed fields.
+# Messages come back out as the same dicts the JSON protocol sends, and
+# auction_state_delta records are merged into the last auction_state.
+import struct
+
+SUBPROTOCOL = "cardpack.auction.bin"
+
+INTERN = struct.Struct("!BIH")
+HEADER = struct.Struct("!BHH")
+STR_LEN = struct.Struct("!H")
+
+KINDS = {
+    "ref": struct.Struct("!I"),
+    "int": struct.Struct("!q"),
+    "int32": struct.Struct("!i"),
+    "float": struct.Struct("!d"),
+    "bool": struct.Struct("!?"),
+}
+
+_STATE_FIELDS = [
+    ("room_id", "int32"),
+    ("current_item.card_name", "ref"),
+    ("current_item.seller_uuid", "ref"),
+    ("current_item.buyout", "int"),
+    ("current_item.starting", "int"),
+    ("current_bid", "int"),
+    ("current_winner", "ref"),
+    ("time_remaining", "int32"),
+    ("ends_at", "float"),
+    ("server_time", "float"),
+    ("room_active", "bool"),
+    ("queue_length", "int32"),
+]
+
+# opcode -> (message type, [(field, kind)])
+LAYOUTS = {
+    1: ("auction_state", _STATE_FIELDS),
+    2: ("auction_state_delta", _STATE_FIELDS),
+    3: ("new_bid", [("bidder", "ref"), ("amount", "int"), ("time_remaining", "int32"),
+                    ("bids", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    4: ("timer_update", [("time_remaining", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    5: ("timer_extended", [("new_time", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    6: ("auction_started", [("item.card_name", "ref"), ("item.seller_uuid", "ref"),
+                            ("item.starting_bid", "int"), ("item.buyout_price", "int"),
+                            ("item.time_limit", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    7: ("user_joined", [("user_uuid", "ref"), ("total_participants", "int32")]),
+    8: ("user_left", [("user_uuid", "ref"), ("total_participants", "int32")]),
+    9: ("buyout", [("bidder", "ref"), ("amount", "int")]),
+    10: ("auction_won", [("winner", "ref"), ("final_bid", "int"), ("item", "ref")]),
+    11: ("auction_settled", [("winner", "ref"), ("seller", "ref"), ("amount", "int"), ("card", "ref")]),
+    12: ("auction_settlement_failed", [("reason", "str"), ("winner", "ref"), ("seller", "ref"), ("amount", "int")]),
+    13: ("auction_failed", [("reason", "str")]),
+    14: ("room_idle", [("message", "str")]),
+    15: ("bid_error", [("error", "str")]),
+    16: ("pong", []),
+}
+
+
+def unflatten(flat):
+    """Turn dotted keys back into nested dicts; a nested dict of all None is None."""
+    message = {}
+    for name, value in flat.items():
+        if "." in name:
+            key, sub = name.split(".", 1)
+            message.setdefault(key, {})[sub] = value
+        else:
+            message[name] = value
+    for key, value in message.items():
+        if isinstance(value, dict) and all(v is None for v in value.values()):
+            message[key] = None
+    return message
+
+
+class AuctionDecoder:
+    """Per-connection decoder state: interned strings and the last auction_state."""
+
+    def __init__(self):
+        self.strings = {}
+        self.state = None
+
+    def decode(self, data):
+        """Decode one binary frame into a list of message dicts."""
+        messages = []
+        offset = 0
+        while offset < len(data):
+            if data[offset] == 0:
+                _, ref, length = INTERN.unpack_from(data, offset)
+                offset += INTERN.size
+                self.strings[ref] = data[offset:offset + length].decode('utf-8')
+                offset += length
+                continue
+
+            opcode, present, nulls = HEADER.unpack_from(data, offset)
+            offset += HEADER.size
+            msg_type, fields = LAYOUTS[opcode]
+            flat = {"type": msg_type}
+            for bit, (name, kind) in enumerate(fields):
+                if not present & (1 << bit):
+                    continue
+                if nulls & (1 << bit):
+                    flat[name] = None
+                elif kind == "str":
+                    (length,) = STR_LEN.unpack_from(data, offset)
+                    offset += STR_LEN.size
+                    flat[name] = data[offset:offset + length].decode('utf-8')
+                    offset += length
+                else:
+                    (value,) = KINDS[kind].unpack_from(data, offset)
+                    offset += KINDS[kind].size
+                    flat[name] = self.strings[value] if kind == "ref" else value
+            messages.append(self.message(flat))
+        return messages
+
+    def message(self, flat):
+        """Rebuild the JSON-shaped message; deltas are applied to the last full state."""
+        if flat["type"] == "auction_state":
+            self.state = flat
+        elif flat["type"] == "auction_state_delta":
+            self.state = {**(self.state or {}), **flat, "type": "auction_state"}
+            flat = self.state
+        return unflatten(flat)
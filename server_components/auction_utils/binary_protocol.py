@@ -0,0 +1,177 @@
+# compact binary encoding for auction room messages.
+# Clients that offer the "cardpack.auction.bin" WebSocket subprotocol get
+# binary frames instead of JSON. Each frame holds one or more records:
+#
+#   intern:  !BIH  opcode 0, id, length, then the UTF-8 string
+#   message: !BHH  opcode, present mask, null mask, then the present,
+#                  non-null fields packed in layout order
+#
+# User uuids and card names are interned: a message carries a 4-byte id and
+# each connection is sent the id's string once, right before the first
+# record that uses it. Nested dicts (current_item, item) are flattened into
+# dotted field names. Repeat auction_state snapshots to the same connection
+# go out as auction_state_delta records holding only the fields that changed;
+# the client merges them into the last snapshot it has.
+#
+# The field layouts are mirrored in frontend_client/utils/auction_protocol.py;
+# change both together. A message whose type has no layout (or that carries
+# fields the layout doesn't know) is sent as a JSON text frame instead.
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+SUBPROTOCOL = "cardpack.auction.bin"
+
+INTERN = struct.Struct("!BIH")
+HEADER = struct.Struct("!BHH")
+
+# field kind -> struct code ("str" is a !H length plus the UTF-8 bytes)
+KINDS = {
+    "ref": "I",
+    "int": "q",
+    "int32": "i",
+    "float": "d",
+    "bool": "?",
+}
+
+_STATE_FIELDS = [
+    ("room_id", "int32"),
+    ("current_item.card_name", "ref"),
+    ("current_item.seller_uuid", "ref"),
+    ("current_item.buyout", "int"),
+    ("current_item.starting", "int"),
+    ("current_bid", "int"),
+    ("current_winner", "ref"),
+    ("time_remaining", "int32"),
+    ("ends_at", "float"),
+    ("server_time", "float"),
+    ("room_active", "bool"),
+    ("queue_length", "int32"),
+]
+
+# message type -> (opcode, [(field, kind)]); at most 16 fields per layout
+LAYOUTS = {
+    "auction_state": (1, _STATE_FIELDS),
+    "auction_state_delta": (2, _STATE_FIELDS),
+    "new_bid": (3, [("bidder", "ref"), ("amount", "int"), ("time_remaining", "int32"),
+                    ("bids", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    "timer_update": (4, [("time_remaining", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    "timer_extended": (5, [("new_time", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    "auction_started": (6, [("item.card_name", "ref"), ("item.seller_uuid", "ref"),
+                            ("item.starting_bid", "int"), ("item.buyout_price", "int"),
+                            ("item.time_limit", "int32"), ("ends_at", "float"), ("server_time", "float")]),
+    "user_joined": (7, [("user_uuid", "ref"), ("total_participants", "int32")]),
+    "user_left": (8, [("user_uuid", "ref"), ("total_participants", "int32")]),
+    "buyout": (9, [("bidder", "ref"), ("amount", "int")]),
+    "auction_won": (10, [("winner", "ref"), ("final_bid", "int"), ("item", "ref")]),
+    "auction_settled": (11, [("winner", "ref"), ("seller", "ref"), ("amount", "int"), ("card", "ref")]),
+    "auction_settlement_failed": (12, [("reason", "str"), ("winner", "ref"), ("seller", "ref"), ("amount", "int")]),
+    "auction_failed": (13, [("reason", "str")]),
+    "room_idle": (14, [("message", "str")]),
+    "bid_error": (15, [("error", "str")]),
+    "pong": (16, []),
+}
+
+# top-level keys that hold a flattened dict, per message type
+_NESTED = {
+    msg_type: {name.split(".", 1)[0] for name, _ in fields if "." in name}
+    for msg_type, (_, fields) in LAYOUTS.items()
+}
+_FIELD_NAMES = {msg_type: {name for name, _ in fields} for msg_type, (_, fields) in LAYOUTS.items()}
+
+
+class Interner:
+    """Process-wide string -> id table for uuids and card names. Event loop only."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def id(self, value: str) -> int:
+        ref = self._ids.get(value)
+        if ref is None:
+            ref = len(self._strings)
+            self._ids[value] = ref
+            self._strings.append(value)
+        return ref
+
+    def string(self, ref: int) -> str:
+        return self._strings[ref]
+
+
+interner = Interner()
+
+
+def flatten(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten the nested dicts of a message into dotted keys (None stays None per field)."""
+    nested = _NESTED.get(message.get("type"), ())
+    flat = {}
+    for key, value in message.items():
+        if key in nested and (value is None or isinstance(value, dict)):
+            for name in _FIELD_NAMES[message["type"]]:
+                if name.startswith(key + "."):
+                    flat[name] = value.get(name[len(key) + 1:]) if value else None
+        else:
+            flat[key] = value
+    return flat
+
+
+def encode(message: Dict[str, Any]) -> Optional[Tuple[bytes, Tuple[int, ...]]]:
+    """Pack a message into one record. Returns (record, interned ids used), or
+    None if the message has no binary layout and should go out as JSON."""
+    layout = LAYOUTS.get(message.get("type"))
+    if layout is None:
+        return None
+    opcode, fields = layout
+    flat = flatten(message)
+    if not flat.keys() - {"type"} <= _FIELD_NAMES[message["type"]]:
+        return None
+
+    fmt = [HEADER.format]
+    values = [opcode, 0, 0]
+    present = nulls = 0
+    refs = []
+    for bit, (name, kind) in enumerate(fields):
+        if name not in flat:
+            continue
+        present |= 1 << bit
+        value = flat[name]
+        if value is None:
+            nulls |= 1 << bit
+            continue
+        if kind == "ref":
+            if not isinstance(value, str):
+                return None
+            value = interner.id(value)
+            refs.append(value)
+        elif kind == "str":
+            data = str(value).encode("utf-8")
+            fmt.append(f"H{len(data)}s")
+            values.extend((len(data), data))
+            continue
+        fmt.append(KINDS[kind])
+        values.append(value)
+    values[1], values[2] = present, nulls
+    try:
+        return struct.pack("".join(fmt), *values), tuple(refs)
+    except struct.error:
+        # out-of-range number; JSON has no such limits
+        return None
+
+
+def intern_record(ref: int) -> bytes:
+    data = interner.string(ref).encode("utf-8")
+    return INTERN.pack(0, ref, len(data)) + data
+
+
+def state_delta(previous: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+    """auction_state_delta holding the fields of `state` that differ from `previous`."""
+    before, after = flatten(previous), flatten(state)
+    delta = {
+        name: value for name, value in after.items()
+        if name != "type" and (name not in before or before[name] != value)
+    }
+    delta["type"] = "auction_state_delta"
+    return delta
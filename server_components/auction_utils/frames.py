@@ -0,0 +1,142 @@
+# encode-once WebSocket frames for broadcast fan-out.
+# A broadcast used to call send_json per recipient, re-serializing the same
+# dict for every socket. A Frame serializes the message once, the first time
+# a recipient's writer needs it, and every other recipient sends that same
+# text. Clients that opted in to compression get a zlib-deflated binary frame
+# instead; clients on the binary subprotocol get a packed record (see
+# binary_protocol). Each form is built at most once per message, and only
+# for the recipients that need it.
+import json
+import time
+import zlib
+from typing import Any, Dict, Optional, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+from server_components.auction_utils import binary_protocol
+
+# messages shorter than this go out as plain text even to compressing clients
+COMPRESS_MIN_BYTES = 512
+
+
+class Frame:
+    """A message serialized once, shareable by every recipient's send queue."""
+
+    __slots__ = ("type", "message", "_text", "_compressed", "_binary")
+
+    def __init__(self, message: Union[str, Dict[str, Any]]):
+        # plain strings (e.g. chat lines) are sent as-is
+        if isinstance(message, str):
+            self.type = None
+            self.message = None
+            self._text = message
+        else:
+            self.type = message.get("type")
+            self.message = message
+            self._text = None
+        self._compressed = None
+        self._binary = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            start = time.perf_counter()
+            self._text = json.dumps(self.message, separators=(",", ":"))
+            fanout_stats.encoded(len(self._text), time.perf_counter() - start)
+        return self._text
+
+    def payload(self, compress: bool = False) -> Union[str, bytes]:
+        """Text frame, or deflated bytes for compressing clients when it pays off."""
+        if not compress or len(self.text) < COMPRESS_MIN_BYTES:
+            return self.text
+        if self._compressed is None:
+            self._compressed = zlib.compress(self.text.encode("utf-8"))
+            fanout_stats.compressed += 1
+        return self._compressed
+
+    def binary(self) -> Optional[Tuple[bytes, Tuple[int, ...]]]:
+        """(record, interned ids) for binary-protocol clients, or None to send text."""
+        if self._binary is None:
+            start = time.perf_counter()
+            self._binary = (binary_protocol.encode(self.message) if self.message is not None else None) or False
+            if self._binary:
+                fanout_stats.binary_encoded(len(self._binary[0]), time.perf_counter() - start)
+        return self._binary or None
+
+
+async def send_frame(websocket: WebSocket, frame: Frame, compress: bool = False):
+    payload = frame.payload(compress)
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
+async def send_binary_frame(websocket: WebSocket, frame: Frame, known_refs: Set[int]):
+    """Send a frame on the binary subprotocol, defining any interned ids this
+    connection hasn't seen yet ahead of the record that uses them."""
+    encoded = frame.binary()
+    if encoded is None:
+        await websocket.send_text(frame.text)
+        return
+    record, refs = encoded
+    new_refs = [ref for ref in refs if ref not in known_refs]
+    if new_refs:
+        known_refs.update(new_refs)
+        record = b"".join(binary_protocol.intern_record(ref) for ref in new_refs) + record
+    await websocket.send_bytes(record)
+
+
+class FanoutStats:
+    """Counters for broadcast fan-out (size, encode time, enqueue time)."""
+
+    def __init__(self):
+        self.broadcasts = 0
+        self.recipients = 0
+        self.max_recipients = 0
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+        self.binary_frames = 0
+        self.binary_bytes = 0
+        self.compressed = 0
+        self.encode_seconds = 0.0
+        self.fanout_seconds = 0.0
+
+    def encode(self, message: Union[str, Dict[str, Any]]) -> Frame:
+        # serialization happens lazily, once per format a recipient needs
+        return Frame(message)
+
+    def encoded(self, size: int, seconds: float):
+        self.frames_encoded += 1
+        self.bytes_encoded += size
+        self.encode_seconds += seconds
+
+    def binary_encoded(self, size: int, seconds: float):
+        self.binary_frames += 1
+        self.binary_bytes += size
+        self.encode_seconds += seconds
+
+    def record(self, recipients: int, seconds: float):
+        self.broadcasts += 1
+        self.recipients += recipients
+        self.max_recipients = max(self.max_recipients, recipients)
+        self.fanout_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        broadcasts = self.broadcasts or 1
+        encodes = (self.frames_encoded + self.binary_frames) or 1
+        return {
+            "broadcasts": self.broadcasts,
+            "recipients": self.recipients,
+            "avg_recipients": round(self.recipients / broadcasts, 2),
+            "max_recipients": self.max_recipients,
+            "bytes_encoded": self.bytes_encoded,
+            "binary_frames": self.binary_frames,
+            "binary_bytes": self.binary_bytes,
+            "compressed_frames": self.compressed,
+            "avg_encode_us": round(self.encode_seconds / encodes * 1e6, 2),
+            "avg_fanout_us": round(self.fanout_seconds / broadcasts * 1e6, 2),
+        }
+
+# shared counters for every broadcast path
+fanout_stats = FanoutStats()
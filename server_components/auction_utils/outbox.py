@@ -0,0 +1,115 @@
+# per-connection send queues for auction room sockets.
+# Every connection gets a bounded outbound queue drained by its own writer
+# task, so broadcasting is a non-blocking enqueue and one slow client can't
+# hold up a room. When a client falls behind, its slow-consumer policy decides
+# what happens to messages that are still waiting:
+#   "drop_timer" - a new timer_update replaces any timer_update still queued
+#   "coalesce"   - as above, and auction_state snapshots replace each other too
+#   "disconnect" - nothing is merged; a full queue closes the connection
+# Under every policy a queue that is still full after merging disconnects the
+# client rather than growing without bound.
+# Queues hold shared Frames, so a broadcast is serialized once per wire format
+# no matter how many sockets it goes to. Binary-protocol connections also
+# remember which interned ids they have been sent and the last auction_state,
+# so repeat snapshots can go out as deltas.
+import asyncio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set, Union
+
+from fastapi import WebSocket
+
+from server_components.auction_utils.frames import Frame, send_frame, send_binary_frame
+from server_components.auction_utils.binary_protocol import state_delta
+
+SLOW_CONSUMER_POLICIES = {
+    "drop_timer": {"timer_update"},
+    "coalesce": {"timer_update", "auction_state"},
+    "disconnect": set(),
+}
+
+# close code sent to clients dropped for not keeping up
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+
+class Outbox:
+    """Bounded outbound queue plus writer task for one WebSocket. Event loop only."""
+
+    def __init__(self, websocket: WebSocket, maxsize: int = 64, policy: str = "coalesce",
+                 on_failed: Optional[Callable[[Exception], None]] = None, compress: bool = False,
+                 binary: bool = False):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        # packed binary records for clients on the binary subprotocol,
+        # otherwise JSON text (deflated when large, if the client asked)
+        self.binary = binary
+        self.compress = compress and not binary
+        self._known_refs: Set[int] = set()
+        self._last_state: Optional[Dict[str, Any]] = None
+        self._mergeable = SLOW_CONSUMER_POLICIES[policy]
+        self._queue: Deque[Frame] = deque()
+        self._ready = asyncio.Event()
+        self._on_failed = on_failed
+        self._task = asyncio.get_running_loop().create_task(self._writer())
+        self.sent = 0
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, message: Union[Frame, Dict[str, Any]]) -> bool:
+        """Queue a message. Returns False if the client is too far behind and should be dropped."""
+        if self._task.done():
+            return False
+        frame = message if isinstance(message, Frame) else Frame(message)
+        if frame.type in self._mergeable:
+            # Replace the pending message of the same type in place; the client
+            # only ever needs the latest countdown / snapshot
+            for i, pending in enumerate(self._queue):
+                if pending.type == frame.type:
+                    self._queue[i] = frame
+                    self.merged += 1
+                    return True
+        if len(self._queue) >= self.maxsize:
+            return False
+        self._queue.append(frame)
+        self._ready.set()
+        return True
+
+    def state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """The auction_state message to queue: a delta against the last one for binary clients."""
+        if not self.binary:
+            return state
+        previous, self._last_state = self._last_state, state
+        return state if previous is None else state_delta(previous, state)
+
+    async def _writer(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    if self.binary:
+                        await send_binary_frame(self.websocket, self._queue.popleft(), self._known_refs)
+                    else:
+                        await send_frame(self.websocket, self._queue.popleft(), self.compress)
+                    self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._queue.clear()
+            if self._on_failed:
+                self._on_failed(e)
+
+    async def close(self, code: Optional[int] = None, reason: str = ""):
+        """Stop the writer; with a `code`, also close the socket (e.g. slow consumer)."""
+        self._task.cancel()
+        self._queue.clear()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code, reason=reason)
+            except RuntimeError:
+                # already closed by the client
+                pass
@@ -0,0 +1,66 @@
+# load index for the elastic auction room pool.
+# Each room's load (live auction + queued items) sits in a min-heap keyed by
+# (load, room_id). Rooms report a new load whenever their queue changes; the
+# old heap entry is left in place and skipped when it surfaces, so picking the
+# least loaded room and updating one are both O(log n). Freed room ids go back
+# on a second heap so new rooms reuse the lowest free id. A sharded worker
+# only hands out ids in its own residue class (offset, offset + stride, ...).
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+
+class RoomLoadIndex:
+    """Least-loaded-room lookup with lazy updates. Event loop only."""
+
+    def __init__(self, offset: int = 0, stride: int = 1):
+        self._heap: List[Tuple[int, int]] = []
+        self._loads: Dict[int, int] = {}
+        self._free_ids: List[int] = []
+        self._stride = stride
+        self._next_id = offset
+
+    def __len__(self) -> int:
+        return len(self._loads)
+
+    def allocate_id(self) -> int:
+        if self._free_ids:
+            return heapq.heappop(self._free_ids)
+        room_id = self._next_id
+        self._next_id += self._stride
+        return room_id
+
+    def claim_id(self, room_id: int):
+        """Reserve a specific id (e.g. a room restored at startup)."""
+        if room_id in self._free_ids:
+            self._free_ids.remove(room_id)
+            heapq.heapify(self._free_ids)
+        while self._next_id <= room_id:
+            if self._next_id != room_id:
+                heapq.heappush(self._free_ids, self._next_id)
+            self._next_id += self._stride
+
+    def update(self, room_id: int, load: int):
+        if self._loads.get(room_id) == load:
+            return
+        self._loads[room_id] = load
+        heapq.heappush(self._heap, (load, room_id))
+        # Stale entries pile up under churn; rebuild once they dominate
+        if len(self._heap) > 4 * len(self._loads) + 16:
+            self._heap = [(load, rid) for rid, load in self._loads.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, room_id: int):
+        if self._loads.pop(room_id, None) is not None:
+            heapq.heappush(self._free_ids, room_id)
+
+    def load(self, room_id: int) -> Optional[int]:
+        return self._loads.get(room_id)
+
+    def best(self) -> Optional[Tuple[int, int]]:
+        """(room_id, load) of the least loaded room, lowest id on ties."""
+        while self._heap:
+            load, room_id = self._heap[0]
+            if self._loads.get(room_id) == load:
+                return room_id, load
+            heapq.heappop(self._heap)
+        return None
@@ -0,0 +1,114 @@
+# one timer loop for every auction room.
+# Rooms store absolute deadlines here instead of running their own
+# once-a-second countdown task. Timers live in a single min-heap keyed by
+# (deadline, seq); rescheduling a timer (e.g. the last-10-seconds bid
+# extension) pushes a new entry in O(log n) and the old one is skipped when
+# it reaches the top. One asyncio task sleeps until the earliest deadline and
+# fires whatever is due, so idle rooms cost nothing and nothing drifts.
+import asyncio
+import heapq
+import itertools
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from server_logs.loggers import auction_logger
+
+Callback = Callable[[], Awaitable[Any]]
+
+
+class AuctionScheduler:
+    """Min-heap of absolute deadlines (event loop time) with lazy cancellation.
+
+    Only use from the event loop thread. The runner task starts on the first
+    `schedule` call.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._timers: Dict[Hashable, Tuple[float, int, Callback]] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # callbacks still running; the loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+        self.fired = 0
+
+    @staticmethod
+    def now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def schedule(self, key: Hashable, deadline: float, callback: Callback):
+        """Run `callback()` at `deadline`, replacing any timer already under `key`."""
+        seq = next(self._seq)
+        earliest = self._peek()
+        self._timers[key] = (deadline, seq, callback)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        self._ensure_running()
+        if earliest is None or deadline < earliest:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._timers.pop(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        timer = self._timers.get(key)
+        return timer[0] if timer else None
+
+    def _peek(self) -> Optional[float]:
+        # Drop cancelled / rescheduled entries sitting at the top
+        while self._heap:
+            deadline, seq, key = self._heap[0]
+            timer = self._timers.get(key)
+            if timer is not None and timer[1] == seq:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            earliest = self._peek()
+            self._wakeup.clear()
+            if earliest is None:
+                await self._wakeup.wait()
+                continue
+
+            delay = earliest - self.now()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, key = heapq.heappop(self._heap)
+            _, _, callback = self._timers.pop(key)
+            self.fired += 1
+            # Each callback runs as its own task so a slow one (settlement)
+            # can't hold up other rooms' deadlines.
+            task = asyncio.get_running_loop().create_task(callback())
+            self._running.add(task)
+            task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            #log code
+            auction_logger.error(
+                "auction_timer_callback_failed",
+                error=repr(task.exception())
+            )
+
+    def stats(self) -> Dict[str, int]:
+        return {"timers": len(self._timers), "heap": len(self._heap), "fired": self.fired,
+                "running": len(self._running)}
+
+
+# shared instance used by every AuctionRoom
+auction_scheduler = AuctionScheduler()
@@ -0,0 +1,340 @@
+# auction room sharding across uvicorn worker processes.
+# With AUCTION_SHARDS=N (and uvicorn --workers N) each worker claims one shard
+# id at startup by taking a lock file, and owns the rooms whose
+# room_id % N == shard id. Workers talk over a local broker: every shard
+# listens on a Unix socket in AUCTION_SHARD_DIR. A room socket that lands on
+# the wrong worker is proxied to the owner over that socket, so bids are
+# always handled by the one process that holds the room's state.
+#
+# Broker frames are a 1-byte kind plus a 4-byte big-endian length:
+#   T - UTF-8 text (JSON requests/replies, or a WebSocket text message)
+#   B - raw bytes (a compressed WebSocket message)
+#   C - close, with {"code", "reason"} as the body
+# The first T frame on a connection is the request: {"op": "ping"},
+# {"op": "rooms"}, {"op": "join", "room_id", "user_uuid", "compress",
+# "resync", "binary"} or {"op": "market"}. A "market" connection is one-way:
+# every T frame after the request is a marketplace change committed by the
+# sending worker (see publish()), in commit order. If a change for a peer is
+# lost (full queue, broken connection) that peer is sent {"kind": "resync"}
+# instead, which makes it reload its marketplace state from the database.
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+HEADER = struct.Struct("!cI")
+TEXT, BYTES, CLOSE = b"T", b"B", b"C"
+
+# Marketplace changes waiting to go out to each other shard
+PUBLISH_QUEUE_SIZE = 1024
+RESYNC = json.dumps({"kind": "resync"}).encode("utf-8")
+
+
+async def write_frame(writer: asyncio.StreamWriter, kind: bytes, payload: bytes):
+    writer.write(HEADER.pack(kind, len(payload)) + payload)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+class BrokerWebSocket:
+    """The owner shard's view of a proxied client: enough of the WebSocket
+    interface for AuctionRoom/Outbox and the auction session loop."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    async def accept(self, subprotocol: Optional[str] = None):
+        # the relaying worker accepts the client, with the same subprotocol
+        pass
+
+    async def send_text(self, text: str):
+        await write_frame(self._writer, TEXT, text.encode("utf-8"))
+
+    async def send_bytes(self, data: bytes):
+        await write_frame(self._writer, BYTES, data)
+
+    async def send_json(self, message: Dict[str, Any]):
+        await self.send_text(json.dumps(message))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        try:
+            await write_frame(self._writer, CLOSE, json.dumps({"code": code, "reason": reason}).encode("utf-8"))
+        except (ConnectionError, RuntimeError):
+            pass
+        self._writer.close()
+
+    async def receive_json(self) -> Dict[str, Any]:
+        try:
+            kind, payload = await read_frame(self._reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise WebSocketDisconnect(code=1001)
+        if kind == CLOSE:
+            raise WebSocketDisconnect(code=1000)
+        return json.loads(payload)
+
+
+class ShardBroker:
+    """Shard ownership plus the Unix-socket broker between workers."""
+
+    def __init__(self, count: int = 1, directory: Optional[str] = None):
+        self.count = max(1, count)
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "cardpack-shards")
+        self.shard_id = 0
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._peers: Dict[int, asyncio.Queue] = {}
+        # peers that missed a change and are owed a resync
+        self._dirty: Set[int] = set()
+        self._wake: Dict[int, asyncio.Event] = {}
+        self._publishers = []
+        self.forwarded = 0
+        self.published = 0
+        self.publish_dropped = 0
+        self.resyncs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    def owner(self, room_id: int) -> int:
+        return room_id % self.count
+
+    def is_local(self, room_id: int) -> bool:
+        return self.owner(room_id) == self.shard_id
+
+    def socket_path(self, shard_id: int) -> str:
+        return os.path.join(self.directory, f"shard-{shard_id}.sock")
+
+    def claim(self) -> int:
+        """Take the first free shard id; the lock lasts as long as this process."""
+        # Sharding needs flock and Unix sockets; a single shard (the default)
+        # never gets here, so the server still runs where they're missing
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("AUCTION_SHARDS > 1 needs Unix domain sockets, which this platform lacks")
+        import fcntl
+
+        os.makedirs(self.directory, exist_ok=True)
+        for shard_id in range(self.count):
+            lock_file = open(os.path.join(self.directory, f"shard-{shard_id}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            self._lock_file = lock_file
+            self.shard_id = shard_id
+            return shard_id
+        raise RuntimeError(f"All {self.count} auction shards are taken; run at most AUCTION_SHARDS workers")
+
+    async def start(self, handler: Callable[[Dict[str, Any], asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]):
+        """Serve broker requests for this shard. `handler` gets the request and the stream."""
+        path = self.socket_path(self.shard_id)
+        if os.path.exists(path):
+            # left behind by the previous holder of this shard's lock
+            os.unlink(path)
+
+        async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                kind, payload = await read_frame(reader)
+                request = json.loads(payload)
+                if request.get("op") == "ping":
+                    await write_frame(writer, TEXT, b"{}")
+                else:
+                    await handler(request, reader, writer)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        self._server = await asyncio.start_unix_server(on_connect, path=path)
+        self._loop = asyncio.get_running_loop()
+        for shard_id in range(self.count):
+            if shard_id != self.shard_id:
+                queue = asyncio.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+                self._peers[shard_id] = queue
+                self._wake[shard_id] = asyncio.Event()
+                self._publishers.append(asyncio.create_task(self._publisher(shard_id, queue)))
+
+    async def wait_ready(self, shard_id: int, timeout: float = 60.0):
+        """Wait until `shard_id` has started its broker (e.g. shard 0 at startup)."""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                await self.request(shard_id, {"op": "ping"})
+                return
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise RuntimeError(f"Auction shard {shard_id} did not start within {timeout:.0f}s")
+                await asyncio.sleep(0.2)
+
+    def publish(self, message: Dict[str, Any]):
+        """Send a message to every other shard's "market" stream. Fire-and-forget
+        and safe to call from any thread; a no-op until start()."""
+        loop = self._loop
+        if loop is None or not self._peers:
+            return
+        payload = json.dumps(message).encode("utf-8")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._enqueue(payload)
+        else:
+            loop.call_soon_threadsafe(self._enqueue, payload)
+
+    def _enqueue(self, payload: bytes):
+        for shard_id, queue in self._peers.items():
+            if shard_id in self._dirty:
+                # the pending resync covers this change
+                continue
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.publish_dropped += 1
+                self._mark_dirty(shard_id)
+
+    def _mark_dirty(self, shard_id: int):
+        self._dirty.add(shard_id)
+        self._wake[shard_id].set()
+
+    async def _next_payload(self, shard_id: int, queue: asyncio.Queue) -> bytes:
+        # A resync replaces whatever is still queued: the peer reloads after
+        # all of those changes were committed
+        while True:
+            if shard_id in self._dirty:
+                while not queue.empty():
+                    queue.get_nowait()
+                return RESYNC
+            if not queue.empty():
+                return queue.get_nowait()
+            self._wake[shard_id].clear()
+            getter = asyncio.ensure_future(queue.get())
+            woken = asyncio.ensure_future(self._wake[shard_id].wait())
+            await asyncio.wait([getter, woken], return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if getter.done():
+                if shard_id not in self._dirty:
+                    return getter.result()
+            else:
+                getter.cancel()
+
+    async def _publisher(self, shard_id: int, queue: asyncio.Queue):
+        # One long-lived "market" connection per peer, so its changes stay in
+        # order. Nothing is dropped quietly: a change that can't be delivered
+        # marks the peer dirty, and the resync is retried until it gets through.
+        writer = None
+        delay = 0.5
+        while True:
+            payload = await self._next_payload(shard_id, queue)
+            try:
+                if writer is None:
+                    _, writer = await self.open(shard_id, {"op": "market"})
+                await write_frame(writer, TEXT, payload)
+            except OSError:
+                if writer is not None:
+                    writer.close()
+                writer = None
+                if payload is not RESYNC:
+                    self.publish_dropped += 1
+                self._mark_dirty(shard_id)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            delay = 0.5
+            if payload is RESYNC:
+                self._dirty.discard(shard_id)
+                self.resyncs += 1
+            else:
+                self.published += 1
+
+    async def open(self, shard_id: int, request: Dict[str, Any]) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path(shard_id))
+        await write_frame(writer, TEXT, json.dumps(request).encode("utf-8"))
+        return reader, writer
+
+    async def request(self, shard_id: int, request: Dict[str, Any], timeout: float = 2.0) -> Any:
+        """One request/reply round trip to another shard."""
+        reader, writer = await self.open(shard_id, request)
+        try:
+            _, payload = await asyncio.wait_for(read_frame(reader), timeout)
+            return json.loads(payload)
+        finally:
+            writer.close()
+
+    async def proxy(self, websocket: WebSocket, room_id: int, request: Dict[str, Any],
+                    subprotocol: Optional[str] = None):
+        """Relay a client WebSocket to the shard that owns `room_id`. The client is
+        only accepted once the owner has accepted the join, so a missing room is
+        rejected the same way as on the owner itself."""
+        reader, writer = await self.open(self.owner(room_id), request)
+        self.forwarded += 1
+
+        async def relay(kind: bytes, payload: bytes) -> bool:
+            if kind == TEXT:
+                await websocket.send_text(payload.decode("utf-8"))
+            elif kind == BYTES:
+                await websocket.send_bytes(payload)
+            else:
+                close = json.loads(payload)
+                await websocket.close(code=close["code"], reason=close["reason"])
+                return False
+            return True
+
+        try:
+            kind, payload = await read_frame(reader)
+            if kind != CLOSE:
+                await websocket.accept(subprotocol=subprotocol)
+            if not await relay(kind, payload):
+                writer.close()
+                return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            raise ConnectionResetError("Auction shard closed the connection")
+
+        async def upstream():
+            # client -> owner
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("text") is not None:
+                    await write_frame(writer, TEXT, message["text"].encode("utf-8"))
+
+        async def downstream():
+            # owner -> client
+            while await relay(*await read_frame(reader)):
+                pass
+
+        tasks = [asyncio.create_task(upstream()), asyncio.create_task(downstream())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+        if tasks[1] in done and tasks[1].exception() is not None:
+            # the owner went away mid-session; the client is still connected
+            try:
+                await websocket.close(code=1011, reason="Auction shard connection lost")
+            except RuntimeError:
+                pass
+
+
+# AUCTION_SHARDS must match the number of uvicorn workers
+auction_shards = ShardBroker(
+    count=int(os.getenv("AUCTION_SHARDS", "1")),
+    directory=os.getenv("AUCTION_SHARD_DIR")
+)
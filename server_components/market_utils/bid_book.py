@@ -0,0 +1,115 @@
+# in-memory book of standing buy orders (bids).
+# Mirrors the BuyOrders table. Bids for each (card_name, rarity) live in a
+# list sorted by (-max_price, id), so the front of the list is always the
+# highest bid and, among equal prices, the oldest one (price-time priority).
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Key = Tuple[str, str]
+Entry = Tuple[int, int]
+
+
+class BidBook:
+    """Price-time ordered index of open buy orders.
+
+    The DB helpers that create, fill and cancel BuyOrders rows keep the
+    book in step; `load` rebuilds it at startup.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._orders: Dict[int, Dict[str, Any]] = {}
+        self._by_key: Dict[Key, List[Entry]] = {}
+
+    def load(self, orders: Iterable[Dict[str, Any]]):
+        """Replace the book contents with the given order rows."""
+        with self._lock:
+            self._orders = {}
+            self._by_key = {}
+            for order in orders:
+                self._insert(order)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: int) -> Optional[Dict[str, Any]]:
+        order = self._orders.get(order_id)
+        return dict(order) if order else None
+
+    def add(self, order: Dict[str, Any]):
+        """Index an order. `order` needs id, uuid, card_name, rarity, max_price and remaining."""
+        with self._lock:
+            if order["id"] in self._orders:
+                self._discard(order["id"])
+            self._insert(order)
+
+    def remove(self, order_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._discard(order_id)
+
+    def fill(self, order_id: int, qty: int = 1) -> Optional[Dict[str, Any]]:
+        """Record a fill; the order is dropped once nothing remains. Returns the updated order."""
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return None
+            order["remaining"] -= qty
+            if order["remaining"] <= 0:
+                self._discard(order_id)
+            return dict(order)
+
+    def _insert(self, order: Dict[str, Any]):
+        row = {
+            "id": int(order["id"]),
+            "uuid": order["uuid"],
+            "card_name": order["card_name"],
+            "rarity": order["rarity"],
+            "max_price": int(order["max_price"]),
+            "remaining": int(order["remaining"]),
+        }
+        self._orders[row["id"]] = row
+        bisect.insort(self._by_key.setdefault((row["card_name"], row["rarity"]), []),
+                      (-row["max_price"], row["id"]))
+
+    def _discard(self, order_id: int) -> Optional[Dict[str, Any]]:
+        row = self._orders.pop(order_id, None)
+        if row is None:
+            return None
+        key = (row["card_name"], row["rarity"])
+        bucket = self._by_key.get(key)
+        if bucket is not None:
+            entry = (-row["max_price"], row["id"])
+            idx = bisect.bisect_left(bucket, entry)
+            if idx < len(bucket) and bucket[idx] == entry:
+                del bucket[idx]
+            if not bucket:
+                del self._by_key[key]
+        return row
+
+    def best(self, card_name: str, rarity: str) -> Optional[Dict[str, Any]]:
+        """Highest (then oldest) bid for a (card_name, rarity) pair, or None."""
+        with self._lock:
+            bucket = self._by_key.get((card_name, rarity))
+            if not bucket:
+                return None
+            return dict(self._orders[bucket[0][1]])
+
+    def matching(self, card_name: str, rarity: str, price: int) -> List[Dict[str, Any]]:
+        """Bids willing to pay at least `price`, in price-time priority."""
+        with self._lock:
+            bucket = self._by_key.get((card_name, rarity), [])
+            # entries are (-max_price, id); max_price >= price <=> -max_price <= -price
+            hi = bisect.bisect_right(bucket, (-price, float("inf")))
+            return [dict(self._orders[order_id]) for _, order_id in bucket[:hi]]
+
+    def keys(self) -> List[Key]:
+        with self._lock:
+            return list(self._by_key.keys())
+
+
+# shared instance used by the DB helpers and the server
+bid_book = BidBook()
@@ -0,0 +1,88 @@
+# deadline heap for listing expiry.
+# Listings with a TTL are pushed as (expires_at, listing_id). The sweeper
+# sleeps until the earliest deadline (or until an earlier one is added), then
+# pops everything that is due and expires it in one batched delete. Sold or
+# cancelled listings are dropped lazily: `discard` forgets the deadline and the
+# stale heap entry is skipped when it reaches the top. If the delete fails
+# (e.g. the database is locked) the sweeper puts the batch back and retries.
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class ExpiryHeap:
+    """Min-heap of listing deadlines with lazy removal."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int]] = []
+        self._deadlines: Dict[int, float] = {}
+        # set whenever the earliest deadline may have moved earlier
+        self.changed = threading.Event()
+        # False on workers that don't run the sweeper; add() is then a no-op
+        self.enabled = True
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def load(self, deadlines: List[Tuple[int, float]]):
+        """Replace the contents with (listing_id, expires_at) pairs."""
+        with self._lock:
+            self._deadlines = {listing_id: expires_at for listing_id, expires_at in deadlines}
+            self._heap = [(expires_at, listing_id) for listing_id, expires_at in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        self.changed.set()
+
+    def add(self, listing_id: int, expires_at: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            earliest = self._heap[0][0] if self._heap else None
+            self._deadlines[listing_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, listing_id))
+        if earliest is None or expires_at < earliest:
+            self.changed.set()
+
+    def discard(self, listing_id: int):
+        with self._lock:
+            self._deadlines.pop(listing_id, None)
+
+    def next_deadline(self) -> Optional[float]:
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int) -> List[Tuple[int, float]]:
+        """Remove and return up to `limit` (listing_id, expires_at) pairs that are due."""
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                expires_at, listing_id = heapq.heappop(self._heap)
+                del self._deadlines[listing_id]
+                due.append((listing_id, expires_at))
+        return due
+
+    def restore(self, due: List[Tuple[int, float]]):
+        """Put back a batch from pop_due that could not be expired."""
+        with self._lock:
+            for listing_id, expires_at in due:
+                # sold, cancelled or re-added since; keep the newer state
+                if listing_id in self._deadlines:
+                    continue
+                self._deadlines[listing_id] = expires_at
+                heapq.heappush(self._heap, (expires_at, listing_id))
+
+    def _drop_stale(self):
+        # Pop entries whose listing was discarded or re-added with a new deadline
+        while self._heap:
+            expires_at, listing_id = self._heap[0]
+            if self._deadlines.get(listing_id) == expires_at:
+                return
+            heapq.heappop(self._heap)
+
+
+# shared instance fed by the marketplace DB helpers
+listing_expiry = ExpiryHeap()
@@ -0,0 +1,272 @@
+# live marketplace change feed for /ws/marketplace.
+# The DB helpers publish listing_added / listing_sold / listing_cancelled /
+# listing_expired and price_changed events after they commit. Subscriptions are indexed by
+# (card_name, rarity), by card_name alone, by rarity alone and "everything",
+# so routing an event is four dict lookups rather than a scan of every socket.
+# Sockets that identify their user also receive that user's price alerts.
+# Publishing may happen on a worker thread; routing and delivery always run
+# on the event loop, and each subscriber drains its own queue in order.
+# Queues are bounded: a subscriber that falls FEED_QUEUE_SIZE events behind
+# is unsubscribed and its socket closed, instead of buffering forever.
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from server_components.market_utils.order_book import order_book
+
+Key = Tuple[str, str]
+
+# events a subscriber may have waiting before it is dropped
+FEED_QUEUE_SIZE = 256
+
+
+class Subscriber:
+    """One /ws/marketplace connection and its current filters."""
+
+    def __init__(self, maxsize: int = FEED_QUEUE_SIZE, on_dropped: Optional[Callable[[], None]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.card_names: Set[str] = set()
+        self.rarities: Set[str] = set()
+        # set when the socket identified its user, for personal alerts
+        self.user_uuid: Optional[str] = None
+        # called once if the subscriber is dropped for falling behind
+        self.on_dropped = on_dropped
+        self.dropped = False
+
+    def matches(self, card_name: str, rarity: str) -> bool:
+        return ((not self.card_names or card_name in self.card_names)
+                and (not self.rarities or rarity in self.rarities))
+
+
+class MarketFeed:
+    """Routes marketplace events to the subscribers whose filters match."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._by_key: Dict[Key, Set[Subscriber]] = {}
+        self._by_name: Dict[str, Set[Subscriber]] = {}
+        self._by_rarity: Dict[str, Set[Subscriber]] = {}
+        self._all: Set[Subscriber] = set()
+        self._subscribers: Set[Subscriber] = set()
+        self._by_user: Dict[str, Set[Subscriber]] = {}
+        # last min ask published per key, to detect price_changed
+        self._min_ask: Dict[Key, Optional[int]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach to the server's event loop. Until bound, publishing is a no-op."""
+        self._loop = loop
+        with self._lock:
+            self._min_ask = {
+                key: order_book.ask_range(*key)[0]
+                for key in order_book.matching_keys()
+            }
+
+    # -- subscriptions (event loop only) --
+
+    def subscribe(self, subscriber: Subscriber, card_names: Optional[Iterable[str]] = None,
+                  rarities: Optional[Iterable[str]] = None):
+        """Register a subscriber, or replace its filters if already registered."""
+        self._unindex(subscriber)
+        subscriber.card_names = set(card_names or ())
+        subscriber.rarities = set(rarities or ())
+        self._subscribers.add(subscriber)
+        if subscriber.card_names and subscriber.rarities:
+            for name in subscriber.card_names:
+                for rarity in subscriber.rarities:
+                    self._by_key.setdefault((name, rarity), set()).add(subscriber)
+        elif subscriber.card_names:
+            for name in subscriber.card_names:
+                self._by_name.setdefault(name, set()).add(subscriber)
+        elif subscriber.rarities:
+            for rarity in subscriber.rarities:
+                self._by_rarity.setdefault(rarity, set()).add(subscriber)
+        else:
+            self._all.add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._unindex(subscriber)
+        self._subscribers.discard(subscriber)
+        if subscriber.user_uuid:
+            _discard(self._by_user, subscriber.user_uuid, subscriber)
+
+    def identify(self, subscriber: Subscriber, user_uuid: str):
+        """Deliver `user_uuid`'s personal alerts (see notify_user) to this subscriber."""
+        if subscriber.user_uuid:
+            _discard(self._by_user, subscriber.user_uuid, subscriber)
+        subscriber.user_uuid = user_uuid
+        self._by_user.setdefault(user_uuid, set()).add(subscriber)
+
+    def is_connected(self, user_uuid: str) -> bool:
+        return bool(self._by_user.get(user_uuid))
+
+    def _unindex(self, subscriber: Subscriber):
+        if subscriber not in self._subscribers:
+            return
+        if subscriber.card_names and subscriber.rarities:
+            for name in subscriber.card_names:
+                for rarity in subscriber.rarities:
+                    _discard(self._by_key, (name, rarity), subscriber)
+        elif subscriber.card_names:
+            for name in subscriber.card_names:
+                _discard(self._by_name, name, subscriber)
+        elif subscriber.rarities:
+            for rarity in subscriber.rarities:
+                _discard(self._by_rarity, rarity, subscriber)
+        else:
+            self._all.discard(subscriber)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def matching(self, card_name: str, rarity: str) -> Set[Subscriber]:
+        """Subscribers interested in a (card_name, rarity) pair."""
+        return (self._by_key.get((card_name, rarity), set())
+                | self._by_name.get(card_name, set())
+                | self._by_rarity.get(rarity, set())
+                | self._all)
+
+    # -- publishing (any thread) --
+
+    def listing_added(self, listing: Dict[str, Any]):
+        self._publish("listing_added", listing)
+
+    def listing_cancelled(self, listing: Dict[str, Any]):
+        self._publish("listing_cancelled", listing)
+
+    def listing_expired(self, listing: Dict[str, Any]):
+        self._publish("listing_expired", listing)
+
+    def listing_sold(self, listing: Dict[str, Any], price: Optional[int] = None,
+                     traded_at: Optional[float] = None):
+        self._publish("listing_sold", listing,
+                      last_sale=listing["price"] if price is None else price, traded_at=traded_at)
+
+    def trade(self, card_name: str, rarity: str, price: int, traded_at: Optional[float] = None):
+        """A sale that didn't go through a listing (e.g. an auction)."""
+        if self._loop is None:
+            return
+        event = self._price_event(card_name, rarity, force=True, last_sale=price, traded_at=traded_at)
+        self._dispatch([event])
+
+    def _publish(self, event_type: str, listing: Dict[str, Any], last_sale: Optional[int] = None,
+                 traded_at: Optional[float] = None):
+        # Call after the order book has been updated for this change
+        if self._loop is None:
+            return
+        events = [{
+            "type": event_type,
+            "listing": {
+                "id": listing["id"],
+                "card_name": listing["card_name"],
+                "rarity": listing["rarity"],
+                "price": listing["price"],
+            },
+            "ts": traded_at or time.time(),
+        }]
+        price_event = self._price_event(listing["card_name"], listing["rarity"],
+                                        force=last_sale is not None,
+                                        last_sale=last_sale, traded_at=traded_at)
+        if price_event:
+            events.append(price_event)
+        self._dispatch(events)
+
+    def _price_event(self, card_name: str, rarity: str, force: bool = False,
+                     last_sale: Optional[int] = None,
+                     traded_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        key = (card_name, rarity)
+        ask_range = order_book.ask_range(card_name, rarity)
+        min_ask = ask_range[0] if ask_range else None
+        with self._lock:
+            changed = self._min_ask.get(key) != min_ask
+            if min_ask is None:
+                self._min_ask.pop(key, None)
+            else:
+                self._min_ask[key] = min_ask
+        if not changed and not force:
+            return None
+        event = {
+            "type": "price_changed",
+            "card_name": card_name,
+            "rarity": rarity,
+            "min_ask": min_ask,
+            "depth": order_book.depth(card_name, rarity),
+            "ts": traded_at or time.time(),
+        }
+        if last_sale is not None:
+            event["last_sale"] = last_sale
+        return event
+
+    def notify_user(self, user_uuid: str, event: Dict[str, Any]):
+        """Send a personal event to every socket the user has open."""
+        if self._loop is None:
+            return
+        self._dispatch([dict(event, user_uuid=user_uuid)])
+
+    def _dispatch(self, events: List[Dict[str, Any]]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._route(events)
+        else:
+            loop.call_soon_threadsafe(self._route, events)
+
+    def _route(self, events: List[Dict[str, Any]]):
+        for event in events:
+            self.published += 1
+            if "user_uuid" in event:
+                user_uuid = event.pop("user_uuid")
+                for subscriber in list(self._by_user.get(user_uuid, ())):
+                    self.deliver(subscriber, event)
+                continue
+            if "listing" in event:
+                card_name, rarity = event["listing"]["card_name"], event["listing"]["rarity"]
+            else:
+                card_name, rarity = event["card_name"], event["rarity"]
+            for subscriber in self.matching(card_name, rarity):
+                self.deliver(subscriber, event)
+
+    def deliver(self, subscriber: Subscriber, event: Dict[str, Any]) -> bool:
+        """Queue an event for one subscriber (event loop only). A full queue drops it."""
+        if subscriber.dropped:
+            return False
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscriber.dropped = True
+            self.dropped += 1
+            self.unsubscribe(subscriber)
+            if subscriber.on_dropped:
+                subscriber.on_dropped()
+            return False
+        self.delivered += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def _discard(index: Dict, key, subscriber: Subscriber):
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.discard(subscriber)
+        if not bucket:
+            del index[key]
+
+
+# shared instance fed by the marketplace DB helpers
+market_feed = MarketFeed()
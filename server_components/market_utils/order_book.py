@@ -0,0 +1,299 @@
+# in-memory marketplace order book.
+# Mirrors the Marketplace table so searches never have to scan SQLite. Every
+# listing lives in a per-(card_name, rarity) price-sorted list and in one
+# global price-sorted list. Entries are (price, id) tuples, so ties on price
+# are broken by listing id (oldest first), matching the SQL ordering.
+import bisect
+import heapq
+import threading
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+Key = Tuple[str, str]
+Entry = Tuple[int, int]
+
+
+class OrderBook:
+    """Price-sorted index of active marketplace listings.
+
+    The DB helpers that insert and delete Marketplace rows call `add` and
+    `remove` so the book stays in step with the table. `load` rebuilds it
+    from the table at startup.
+
+    `version` increases on every change, so callers can tell whether
+    anything they derived from the book is stale.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.version = 0
+        self._clear()
+
+    def _clear(self):
+        self._listings: Dict[int, Dict[str, Any]] = {}
+        self._by_key: Dict[Key, List[Entry]] = {}
+        self._global: List[Entry] = []
+        # (card_name -> rarities) and (rarity -> card_names) let filtered
+        # searches find the matching per-key lists without a scan.
+        self._rarities_by_name: Dict[str, Set[str]] = {}
+        self._names_by_rarity: Dict[str, Set[str]] = {}
+
+    def load(self, listings: Iterable[Dict[str, Any]]):
+        """Replace the book contents with the given listing rows."""
+        with self._lock:
+            self._clear()
+            for listing in listings:
+                self._insert(listing)
+            self.loaded = True
+            self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._listings
+
+    def get(self, listing_id: int) -> Optional[Dict[str, Any]]:
+        listing = self._listings.get(listing_id)
+        return dict(listing) if listing else None
+
+    def add(self, listing: Dict[str, Any]):
+        """Index a new listing. `listing` needs id, uuid, card_name, rarity and price."""
+        with self._lock:
+            if listing["id"] in self._listings:
+                self._discard(listing["id"])
+            self._insert(listing)
+            self.version += 1
+
+    def remove(self, listing_id: int) -> Optional[Dict[str, Any]]:
+        """Drop a listing from the book. Returns the removed listing, if any."""
+        with self._lock:
+            row = self._discard(listing_id)
+            if row is not None:
+                self.version += 1
+            return row
+
+    def _insert(self, listing: Dict[str, Any]):
+        row = {
+            "id": int(listing["id"]),
+            "uuid": listing["uuid"],
+            "card_name": listing["card_name"],
+            "rarity": listing["rarity"],
+            "price": int(listing["price"]),
+        }
+        entry = (row["price"], row["id"])
+        key = (row["card_name"], row["rarity"])
+
+        self._listings[row["id"]] = row
+        bisect.insort(self._by_key.setdefault(key, []), entry)
+        bisect.insort(self._global, entry)
+        self._rarities_by_name.setdefault(row["card_name"], set()).add(row["rarity"])
+        self._names_by_rarity.setdefault(row["rarity"], set()).add(row["card_name"])
+
+    def _discard(self, listing_id: int) -> Optional[Dict[str, Any]]:
+        row = self._listings.pop(listing_id, None)
+        if row is None:
+            return None
+        entry = (row["price"], row["id"])
+        key = (row["card_name"], row["rarity"])
+
+        _remove_entry(self._global, entry)
+        bucket = self._by_key.get(key)
+        if bucket is not None:
+            _remove_entry(bucket, entry)
+            if not bucket:
+                # Last listing for this key; drop it from the name/rarity maps.
+                del self._by_key[key]
+                self._rarities_by_name[row["card_name"]].discard(row["rarity"])
+                if not self._rarities_by_name[row["card_name"]]:
+                    del self._rarities_by_name[row["card_name"]]
+                self._names_by_rarity[row["rarity"]].discard(row["card_name"])
+                if not self._names_by_rarity[row["rarity"]]:
+                    del self._names_by_rarity[row["rarity"]]
+        return row
+
+    def best(self, card_name: str, rarity: str) -> Optional[Dict[str, Any]]:
+        """Cheapest listing for a (card_name, rarity) pair, or None."""
+        with self._lock:
+            bucket = self._by_key.get((card_name, rarity))
+            if not bucket:
+                return None
+            return dict(self._listings[bucket[0][1]])
+
+    def ask_range(self, card_name: str, rarity: str) -> Optional[Tuple[int, int]]:
+        """(lowest, highest) asking price for a (card_name, rarity) pair, or None."""
+        with self._lock:
+            bucket = self._by_key.get((card_name, rarity))
+            if not bucket:
+                return None
+            return bucket[0][0], bucket[-1][0]
+
+    def depth(self, card_name: str, rarity: str) -> int:
+        """Number of active listings for a (card_name, rarity) pair."""
+        return len(self._by_key.get((card_name, rarity), ()))
+
+    def card_names(self) -> List[str]:
+        """Distinct card names that currently have at least one listing."""
+        with self._lock:
+            return list(self._rarities_by_name.keys())
+
+    def matching_keys(self, card_names: Optional[List[str]] = None,
+                      rarities: Optional[List[str]] = None) -> List[Key]:
+        """Return the (card_name, rarity) keys that pass the name/rarity filters."""
+        with self._lock:
+            if card_names and rarities:
+                wanted = set(rarities)
+                return [
+                    (name, rarity)
+                    for name in set(card_names)
+                    for rarity in self._rarities_by_name.get(name, ())
+                    if rarity in wanted
+                ]
+            if card_names:
+                return [
+                    (name, rarity)
+                    for name in set(card_names)
+                    for rarity in self._rarities_by_name.get(name, ())
+                ]
+            if rarities:
+                return [
+                    (name, rarity)
+                    for rarity in set(rarities)
+                    for name in self._names_by_rarity.get(rarity, ())
+                ]
+            return list(self._by_key.keys())
+
+    def count(self, card_name: str, rarity: str, price_min: Optional[int] = None,
+              price_max: Optional[int] = None) -> int:
+        """Number of listings for a key inside a price range (two bisects)."""
+        with self._lock:
+            entries = self._by_key.get((card_name, rarity))
+            if not entries:
+                return 0
+            lo, hi = _price_bounds(entries, price_min, price_max)
+            return max(hi - lo, 0)
+
+    def facets(self, card_names: Optional[List[str]] = None,
+               rarities: Optional[List[str]] = None,
+               price_min: Optional[int] = None,
+               price_max: Optional[int] = None,
+               buckets: int = 0) -> Dict[str, Any]:
+        """Facet counts and a price histogram for a search filter.
+
+        Rarity counts ignore the rarity filter and card name counts ignore
+        the card name filter, so each facet shows the alternatives to the
+        current selection. Every count is a pair of bisects per matching key.
+        """
+        with self._lock:
+            rarity_counts: Dict[str, int] = {}
+            for name, rarity in self.matching_keys(card_names, None):
+                n = self.count(name, rarity, price_min, price_max)
+                if n:
+                    rarity_counts[rarity] = rarity_counts.get(rarity, 0) + n
+
+            name_counts: Dict[str, int] = {}
+            for name, rarity in self.matching_keys(None, rarities):
+                n = self.count(name, rarity, price_min, price_max)
+                if n:
+                    name_counts[name] = name_counts.get(name, 0) + n
+
+            keys = self.matching_keys(card_names, rarities) if (card_names or rarities) else None
+            result: Dict[str, Any] = {
+                "rarities": dict(sorted(rarity_counts.items())),
+                "card_names": dict(sorted(name_counts.items())),
+                "total": sum(self.count(n, r, price_min, price_max) for n, r in
+                             (keys if keys is not None else self._by_key.keys())),
+            }
+            if buckets > 0:
+                result["price_histogram"] = self._histogram(keys, price_min, price_max, buckets)
+            return result
+
+    def _histogram(self, keys: Optional[List[Key]], price_min: Optional[int],
+                   price_max: Optional[int], buckets: int) -> List[Dict[str, int]]:
+        sources = [self._by_key[key] for key in keys] if keys is not None else [self._global]
+        sources = [entries for entries in sources if entries]
+        if not sources:
+            return []
+
+        # Default the range to the cheapest / dearest matching listing
+        lo = price_min if price_min is not None else min(entries[0][0] for entries in sources)
+        hi = price_max if price_max is not None else max(entries[-1][0] for entries in sources)
+        if hi < lo:
+            return []
+        width = max(1, -(-(hi - lo + 1) // buckets))
+
+        histogram = []
+        start = lo
+        while start <= hi:
+            end = min(start + width - 1, hi)
+            count = 0
+            for entries in sources:
+                a, b = _price_bounds(entries, start, end)
+                count += max(b - a, 0)
+            histogram.append({"min": start, "max": end, "count": count})
+            start = end + 1
+        return histogram
+
+    def iter_entries(self, card_names: Optional[List[str]] = None,
+                     rarities: Optional[List[str]] = None,
+                     price_min: Optional[int] = None,
+                     price_max: Optional[int] = None,
+                     after: Optional[Entry] = None):
+        """Yield (price, id) entries in ascending order for the given filters.
+
+        Each matching per-key list is narrowed with bisect to the price range
+        and the slices are merged lazily, so callers only pay for what they read.
+        `after` is a keyset cursor: only entries strictly greater are yielded.
+        """
+        if card_names or rarities:
+            sources = [self._by_key[key] for key in self.matching_keys(card_names, rarities)]
+        else:
+            sources = [self._global]
+
+        slices = []
+        for entries in sources:
+            lo, hi = _price_bounds(entries, price_min, price_max)
+            if after is not None:
+                lo = max(lo, bisect.bisect_right(entries, after))
+            if lo < hi:
+                slices.append(_walk(entries, lo, hi))
+
+        if len(slices) == 1:
+            return slices[0]
+        return heapq.merge(*slices)
+
+    def search(self, limit: int = 10, card_names: Optional[List[str]] = None,
+               rarities: Optional[List[str]] = None, price_min: Optional[int] = None,
+               price_max: Optional[int] = None, after: Optional[Entry] = None) -> List[Dict[str, Any]]:
+        """Cheapest `limit` listings matching the filters, like `querey_marketplace`."""
+        with self._lock:
+            entries = self.iter_entries(card_names, rarities, price_min, price_max, after)
+            return [dict(self._listings[listing_id]) for _, listing_id in islice(entries, max(limit, 0))]
+
+
+def _price_bounds(entries: List[Entry], price_min: Optional[int],
+                  price_max: Optional[int]) -> Tuple[int, int]:
+    # [lo, hi) slice of a price-sorted entry list inside the price range
+    lo, hi = 0, len(entries)
+    if price_min is not None:
+        lo = bisect.bisect_left(entries, (price_min, -1))
+    if price_max is not None:
+        hi = bisect.bisect_right(entries, (price_max, float("inf")))
+    return lo, hi
+
+
+def _walk(entries: List[Entry], lo: int, hi: int):
+    # index walk rather than islice, which would step over [0, lo) first
+    for i in range(lo, hi):
+        yield entries[i]
+
+
+def _remove_entry(entries: List[Entry], entry: Entry):
+    idx = bisect.bisect_left(entries, entry)
+    if idx < len(entries) and entries[idx] == entry:
+        del entries[idx]
+
+
+# shared instance used by the DB helpers and the server
+order_book = OrderBook()
@@ -0,0 +1,125 @@
+# rolling market price statistics.
+# Each (card_name, rarity) key keeps one deque of recent trades per window
+# (1h, 24h, 7d) alongside running price*qty and qty sums. Recording a trade
+# appends to every window; reading first evicts trades that have aged out.
+# Both are amortized O(1), so /marketplace/stats never re-aggregates trades.
+# Ask-side numbers (min/max ask, depth) come straight from the order book,
+# the best bid from the bid book.
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from server_components.market_utils.order_book import order_book
+from server_components.market_utils.bid_book import bid_book
+
+Key = Tuple[str, str]
+
+# window name -> length in seconds
+WINDOWS = {
+    "1h": 60 * 60,
+    "24h": 24 * 60 * 60,
+    "7d": 7 * 24 * 60 * 60,
+}
+
+
+class _Window:
+    """Trades inside a trailing time window with running VWAP sums."""
+
+    def __init__(self, length: float):
+        self.length = length
+        self.trades: deque = deque()  # (ts, price, qty)
+        self.pv = 0
+        self.qty = 0
+
+    def add(self, ts: float, price: int, qty: int):
+        self.trades.append((ts, price, qty))
+        self.pv += price * qty
+        self.qty += qty
+
+    def evict(self, now: float):
+        cutoff = now - self.length
+        while self.trades and self.trades[0][0] < cutoff:
+            _, price, qty = self.trades.popleft()
+            self.pv -= price * qty
+            self.qty -= qty
+
+    def vwap(self) -> Optional[float]:
+        if self.qty <= 0:
+            return None
+        return round(self.pv / self.qty, 2)
+
+
+class _KeyStats:
+    def __init__(self):
+        self.windows = {name: _Window(length) for name, length in WINDOWS.items()}
+        self.last_price: Optional[int] = None
+        self.last_ts: Optional[float] = None
+
+
+class PriceStats:
+    """Per-(card_name, rarity) last sale, VWAPs and ask-side summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Key, _KeyStats] = {}
+
+    def load(self, trades: Iterable[Dict[str, Any]]):
+        """Rebuild from trade rows (card_name, rarity, price, qty, traded_at), oldest first."""
+        with self._lock:
+            self._stats = {}
+            for trade in trades:
+                self._record(trade["card_name"], trade["rarity"], trade["price"],
+                             trade.get("qty", 1), trade["traded_at"])
+
+    def record(self, card_name: str, rarity: str, price: int, qty: int = 1,
+               ts: Optional[float] = None):
+        """Add a completed trade (marketplace purchase or auction settlement)."""
+        with self._lock:
+            self._record(card_name, rarity, price, qty, ts if ts is not None else time.time())
+
+    def _record(self, card_name: str, rarity: str, price: int, qty: int, ts: float):
+        stats = self._stats.setdefault((card_name, rarity), _KeyStats())
+        for window in stats.windows.values():
+            window.add(ts, int(price), int(qty))
+        # Trades can be loaded slightly out of order; keep the newest as last sale
+        if stats.last_ts is None or ts >= stats.last_ts:
+            stats.last_price = int(price)
+            stats.last_ts = ts
+
+    def get(self, card_name: str, rarity: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Current statistics for one key. Works for keys with no trades yet."""
+        now = now if now is not None else time.time()
+        result: Dict[str, Any] = {
+            "card_name": card_name,
+            "rarity": rarity,
+            "last_sale": None,
+        }
+        with self._lock:
+            stats = self._stats.get((card_name, rarity))
+            for name in WINDOWS:
+                window = stats.windows[name] if stats else None
+                if window is not None:
+                    window.evict(now)
+                result[f"vwap_{name}"] = window.vwap() if window else None
+                result[f"volume_{name}"] = window.qty if window else 0
+            if stats and stats.last_price is not None:
+                result["last_sale"] = {"price": stats.last_price, "ts": stats.last_ts}
+
+        ask_range = order_book.ask_range(card_name, rarity)
+        result["min_ask"] = ask_range[0] if ask_range else None
+        result["max_ask"] = ask_range[1] if ask_range else None
+        result["depth"] = order_book.depth(card_name, rarity)
+        best_bid = bid_book.best(card_name, rarity)
+        result["best_bid"] = best_bid["max_price"] if best_bid else None
+        return result
+
+    def keys(self) -> List[Key]:
+        """Every key that has traded or is currently listed."""
+        with self._lock:
+            traded = set(self._stats.keys())
+        return sorted(traded.union(order_book.matching_keys()))
+
+
+# shared instance fed by purchases and auction settlements
+price_stats = PriceStats()
@@ -0,0 +1,111 @@
+# cache of /marketplace/search results.
+# Entries are keyed by the normalized search filters and tagged with the
+# marketplace version they were computed at. Any list, buy or cancel bumps the
+# version, which makes every older entry a miss without having to walk the
+# cache. Eviction is plain LRU over an OrderedDict.
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from server_components.market_utils.order_book import order_book
+
+
+def search_key(card_names: Optional[List[str]] = None, rarities: Optional[List[str]] = None,
+               price_min: Optional[int] = None, price_max: Optional[int] = None,
+               limit: int = 10, query: Optional[str] = None, fuzzy: bool = False,
+               offset: int = 0, cursor: Optional[str] = None) -> Tuple:
+    """Normalize search filters so equivalent requests share a cache entry."""
+    return (
+        tuple(sorted(set(card_names))) if card_names else (),
+        tuple(sorted(set(rarities))) if rarities else (),
+        price_min,
+        price_max,
+        limit,
+        " ".join(query.lower().split()) if query else None,
+        bool(fuzzy) if query else False,
+        offset if query else 0,
+        cursor or None,
+    )
+
+
+class SearchCache:
+    """Size-bounded LRU cache invalidated by a version counter.
+
+    Concurrent misses on the same key are coalesced: the first caller runs
+    the loader (off the event loop) and the others await its result. Only
+    use from the event loop thread.
+    """
+
+    def __init__(self, version: Callable[[], int], max_entries: int = 1024):
+        self._version = version
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key if it is current, else None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, value = entry
+        if version != self._version():
+            # Stale; drop it now rather than waiting for LRU eviction
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, version: int):
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, running `loader` in a thread on a miss."""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        version = self._version()
+        inflight_key = (key, version)
+        pending = self._inflight.get(inflight_key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            value = await asyncio.to_thread(loader)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so waiter-less failures don't warn
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            # Tag with the version seen before loading; if the marketplace
+            # changed meanwhile the entry is already stale and will miss.
+            self.put(key, value, version)
+            return value
+        finally:
+            del self._inflight[inflight_key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "version": self._version(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+# shared instance used by /marketplace/search
+search_cache = SearchCache(version=lambda: order_book.version)
@@ -0,0 +1,78 @@
+# price alert rules ("tell me when X is listed at or below $N").
+# Mirrors the WatchRules table. Rules for each (card_name, rarity) live in a
+# list sorted by (max_price, id), so the rules triggered by a listing at price
+# p are exactly the suffix starting at bisect_left((p, -1)): one bisect plus
+# the matches, however many rules the card has.
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+Key = Tuple[str, str]
+Entry = Tuple[int, int]
+
+
+class WatchIndex:
+    """Threshold-sorted index of watch rules per (card_name, rarity)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules: Dict[int, Dict[str, Any]] = {}
+        self._by_key: Dict[Key, List[Entry]] = {}
+
+    def load(self, rules: Iterable[Dict[str, Any]]):
+        with self._lock:
+            self._rules = {}
+            self._by_key = {}
+            for rule in rules:
+                self._insert(rule)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def add(self, rule: Dict[str, Any]):
+        """Index a rule. `rule` needs id, uuid, card_name, rarity and max_price."""
+        with self._lock:
+            self._discard(rule["id"])
+            self._insert(rule)
+
+    def remove(self, rule_id: int):
+        with self._lock:
+            self._discard(rule_id)
+
+    def triggered(self, card_name: str, rarity: str, price: int) -> List[Dict[str, Any]]:
+        """Rules whose threshold is at or above `price`."""
+        with self._lock:
+            entries = self._by_key.get((card_name, rarity))
+            if not entries:
+                return []
+            start = bisect.bisect_left(entries, (price, -1))
+            return [dict(self._rules[rule_id]) for _, rule_id in entries[start:]]
+
+    def _insert(self, rule: Dict[str, Any]):
+        row = {
+            "id": int(rule["id"]),
+            "uuid": rule["uuid"],
+            "card_name": rule["card_name"],
+            "rarity": rule["rarity"],
+            "max_price": int(rule["max_price"]),
+        }
+        self._rules[row["id"]] = row
+        bisect.insort(self._by_key.setdefault((row["card_name"], row["rarity"]), []),
+                      (row["max_price"], row["id"]))
+
+    def _discard(self, rule_id: int):
+        row = self._rules.pop(rule_id, None)
+        if row is None:
+            return
+        key = (row["card_name"], row["rarity"])
+        entries = self._by_key[key]
+        entry = (row["max_price"], row["id"])
+        idx = bisect.bisect_left(entries, entry)
+        if idx < len(entries) and entries[idx] == entry:
+            del entries[idx]
+        if not entries:
+            del self._by_key[key]
+
+
+# shared instance used by the DB helpers
+watch_index = WatchIndex()
@@ -8,8 +8,11 @@ import secrets
 from server_components.card_utils.card import Card
 from dataclasses import dataclass, field
 from collections import deque
-from typing import Dict, Optional, Set
+from typing import Callable, Dict, Optional, Set, Union
 import asyncio
+import functools
+import math
+import time
 import json
 import uuid
 from datetime import datetime
@@ -25,7 +28,8 @@ from server_logs.middleware import RequestLoggingMiddleware
 from server_logs.loggers import server_logger, transaction_logger, marketplace_logger, auction_logger, user_logger
 
 # import dataclasses
-from server_components.server_classes import CreateUser, LoginUser, Email, OpenPackRequest, AddPackRequest
+from server_components.server_classes import CreateUser, LoginUser, Email, OpenPackRequest, AddPackRequest, CollectionPageRequest
+from server_components.utils.pagination import encode_cursor, decode_cursor, page_size, NUMBER, TIMESTAMP, ROW_ID
 
 # import our DB access functions
 from server_components.utils.db_access import (
@@ -35,7 +39,9 @@ from server_components.utils.db_access import (
     create_user_entry,
     add_cards_to_collection,
     get_user_cards,
+    get_user_cards_page,
     get_user_inventory,
+    get_user_inventory_page,
     open_pack_for_user,
     add_pack_to_inventory,
     get_available_packs,
@@ -45,9 +51,60 @@ from server_components.utils.db_access import (
     create_bank_account,
     querey_marketplace,
     add_to_marketplace,
+    add_to_marketplace_bulk,
     remove_from_marketplace,
-    select_card_by_name
+    select_card_by_name,
+    load_marketplace_order_book,
+    purchase_marketplace_listing,
+    purchase_marketplace_listings_bulk,
+    load_bid_book,
+    create_bundle,
+    query_bundles,
+    purchase_bundle,
+    cancel_bundle,
+    load_watch_rules,
+    add_watch_rule,
+    remove_watch_rule,
+    get_watch_rules,
+    get_notifications,
+    expire_lapsed_listings,
+    load_listing_expiry,
+    apply_market_change,
+    detect_search_index,
+    start_listing_expiry_sweeper,
+    create_buy_order,
+    cancel_buy_order,
+    get_user_buy_orders,
+    non_negative_check,
+    MAX_BULK_ITEMS,
+    cancel_marketplace_listing,
+    index_card_catalog,
+    search_card_catalog,
+    search_marketplace_text,
+    listed_card_names_matching,
+    record_auction_events,
+    load_open_auctions,
+    get_available_balances,
+    move_auction_hold,
+    queue_auction_card,
+    settle_auction,
+    release_auction,
+    load_price_stats,
+    get_price_history,
+    start_price_history_compaction,
+    CANDLE_RESOLUTIONS
 )
+from server_components.market_utils.order_book import order_book
+from server_components.market_utils.search_cache import search_cache, search_key
+from server_components.market_utils.price_stats import price_stats
+from server_components.market_utils.expiry import listing_expiry
+from server_components.market_utils.market_feed import market_feed, Subscriber
+from server_components.auction_utils.scheduler import auction_scheduler
+from server_components.auction_utils.room_pool import RoomLoadIndex
+from server_components.auction_utils.outbox import Outbox, SLOW_CONSUMER_CLOSE_CODE
+from server_components.auction_utils.frames import fanout_stats, send_frame
+from server_components.auction_utils.shards import auction_shards, BrokerWebSocket, read_frame, write_frame, TEXT
+from server_components.auction_utils.binary_protocol import SUBPROTOCOL as AUCTION_BINARY_SUBPROTOCOL
 
 app = FastAPI()
 app.include_router(logs_router)
@@ -82,14 +139,78 @@ app.add_middleware(RequestLoggingMiddleware, logger=server_logger)
 # startup functions
 @app.on_event("startup")
 async def startup_event():
-    # Initialize the SQLite DB defined in the schema
-    init_db()
+    # With AUCTION_SHARDS > 1 this worker owns every AUCTION_SHARDS-th room
+    # and serves the other workers over the shard broker. Shard 0 does the
+    # one-off database work (migrations, lapsed listings, compaction, pack
+    # registration); the other workers wait for its broker before loading.
+    primary = True
+    if auction_shards.enabled:
+        shard_id = auction_shards.claim()
+        primary = shard_id == 0
+        auction_house.shard(shard_id, auction_shards.count)
+        server_logger.info("startup_auction_shard_claimed", shard=shard_id, shards=auction_shards.count)
+
+    if primary:
+        # Initialize the SQLite DB defined in the schema
+        init_db()
+
+        # Withdraw listings whose TTL ran out while the server was down
+        expired_count = expire_lapsed_listings()
+        server_logger.info("startup_listings_expired", listings=expired_count)
+    else:
+        await auction_shards.wait_ready(0)
+        detect_search_index()
+
+    # Start taking other workers' marketplace changes before loading, so
+    # none committed while this worker loads are missed
+    if auction_shards.enabled:
+        await auction_shards.start(handle_shard_request)
+
+    # Build the in-memory marketplace order book from the Marketplace table
+    listing_count = load_marketplace_order_book()
+    server_logger.info("startup_order_book_loaded", listings=listing_count)
+
+    # Expire the remaining TTL listings as their deadlines pass
+    if primary:
+        load_listing_expiry()
+        start_listing_expiry_sweeper()
+    else:
+        listing_expiry.enabled = False
+
+    # Price alert rules, matched as listings are added
+    rule_count = load_watch_rules()
+    server_logger.info("startup_watch_rules_loaded", rules=rule_count)
+
+    # Standing buy orders; settles any that cross a listing
+    bid_count = load_bid_book(match_crossed=primary)
+    server_logger.info("startup_bid_book_loaded", orders=bid_count)
+
+    # Rolling price statistics from the last week of trades
+    trade_count = load_price_stats()
+    server_logger.info("startup_price_stats_loaded", trades=trade_count)
+
+    # Trim old raw ticks / fine candles now and then hourly
+    if primary:
+        start_price_history_compaction()
+
+    # Live /ws/marketplace events are routed on this loop
+    market_feed.bind(asyncio.get_running_loop())
+
+    # Resume queued and running auctions from the auction event log
+    auctions = [a for a in load_open_auctions() if auction_shards.is_local(a["room_id"])]
+    auction_count = auction_house.restore(auctions)
+    server_logger.info("startup_auctions_restored", auctions=auction_count)
     
     # Auto-register any new packs from pack_json directory
     from pathlib import Path
     pack_json_dir = Path(__file__).parent / "pack_json"
     if pack_json_dir.exists():
-        results = scan_and_register_packs(pack_json_dir)
+        results = scan_and_register_packs(pack_json_dir) if primary else {"added": [], "errors": []}
+
+        # Index every card name for /cards/search and text marketplace search
+        catalog_count = index_card_catalog(pack_json_dir, rebuild_index=primary)
+        server_logger.info("startup_card_catalog_indexed", cards=catalog_count)
+
         if results["added"]:
             
             #log code
@@ -106,6 +227,12 @@ async def startup_event():
                 errors=results["errors"]
             )
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop room actors and any event log retries still waiting to run
+    for room in auction_house.rooms.values():
+        room.stop_actor()
+
 @app.get("/")
 async def read_root():
     return {"Hello": "World"}
@@ -396,6 +523,14 @@ async def list_available_packs():
     })
 
 
+@app.get("/cards/search")
+async def search_cards(query: str, fuzzy: bool = False, limit: Optional[int] = None):
+    """Search the card catalog by name prefix, optionally typo-tolerant."""
+    return JSONResponse(status_code=200, content={
+        "cards": search_card_catalog(query, fuzzy=fuzzy, limit=page_size(limit))
+    })
+
+
 @app.post("/admin/register_packs")
 async def register_packs_from_directory():
     """
@@ -425,6 +560,7 @@ async def register_packs_from_directory():
         })
     
     results = scan_and_register_packs(pack_json_dir)
+    index_card_catalog(pack_json_dir)
     
     if results["errors"]:
         
@@ -532,11 +668,29 @@ async def open_pack(req: OpenPackRequest):
 
 
 @app.post("/my_cards")
-async def get_my_cards(email: Email):
-    """Get all cards owned by a user."""
-    row = get_user_by_email(email.email)
+async def get_my_cards(req: CollectionPageRequest):
+    """Get all cards owned by a user, or one page of them if limit/cursor is set."""
+    row = get_user_by_email(req.email)
     if not row:
         return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if req.limit is not None or req.cursor:
+        try:
+            after = decode_cursor(req.cursor, (TIMESTAMP, ROW_ID))
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+
+        limit = page_size(req.limit, default=50)
+        cards = get_user_cards_page(row['uuid'], limit, after)
+        next_cursor = None
+        if len(cards) == limit:
+            last = cards[-1]
+            next_cursor = encode_cursor(last['acquired_at'], last['id'])
+        return JSONResponse(status_code=200, content={
+            "cards": cards,
+            "count": len(cards),
+            "next_cursor": next_cursor
+        })
     
     cards = get_user_cards(row['uuid'])
     return JSONResponse(status_code=200, content={
@@ -547,11 +701,29 @@ async def get_my_cards(email: Email):
 
 
 @app.post("/my_packs")
-async def get_my_packs(email: Email):
-    """Get all packs owned by a user."""
-    row = get_user_by_email(email.email)
+async def get_my_packs(req: CollectionPageRequest):
+    """Get all packs owned by a user, or one page of them if limit/cursor is set."""
+    row = get_user_by_email(req.email)
     if not row:
         return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if req.limit is not None or req.cursor:
+        try:
+            after = decode_cursor(req.cursor, (TIMESTAMP, ROW_ID))
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+
+        limit = page_size(req.limit, default=50)
+        packs = get_user_inventory_page(row['uuid'], limit, after)
+        next_cursor = None
+        if len(packs) == limit:
+            last = packs[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return JSONResponse(status_code=200, content={
+            "packs": packs,
+            "count": len(packs),
+            "next_cursor": next_cursor
+        })
     
     packs = get_user_inventory(row['uuid'])
     return JSONResponse(status_code=200, content={
@@ -601,7 +773,7 @@ async def debug_get_balance(req: GetBalanceRequest):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT money FROM Bank WHERE uuid = ?", (row['uuid'],))
+        cursor.execute("SELECT money, reserved FROM Bank WHERE uuid = ?", (row['uuid'],))
         bank_row = cursor.fetchone()
         if not bank_row:
 
@@ -624,7 +796,9 @@ async def debug_get_balance(req: GetBalanceRequest):
         return JSONResponse(status_code=200, content={
             "email": req.email,
             "uuid": row['uuid'],
-            "money": bank_row['money']
+            "money": bank_row['money'],
+            # held for leading auction bids; spendable is money - reserved
+            "reserved": bank_row['reserved']
         })
     finally:
         conn.close()
@@ -824,6 +998,22 @@ class AuctionItem:
     ttl: int  # seconds
     buyout: int
     starting: int
+    # CardsOpened row held in escrow ('auction') while the item is up;
+    # None for auctions queued before cards were escrowed
+    card_id: Optional[int] = None
+    # key for this auction's rows in the AuctionEvents log
+    auction_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def queued_event(self) -> dict:
+        return {
+            "card_name": self.card.card_name,
+            "rarity": self.card.rarity,
+            "card_id": self.card_id,
+            "seller_uuid": self.seller_uuid,
+            "ttl": self.ttl,
+            "buyout": self.buyout,
+            "starting": self.starting
+        }
 
 @dataclass
 class BidMessage:
@@ -831,37 +1021,294 @@ class BidMessage:
     amount: int
     timestamp: datetime
 
+# Outbound queue bound and slow-consumer policy for auction room sockets
+# (see auction_utils/outbox.py for the policies)
+AUCTION_SEND_QUEUE_SIZE = 64
+AUCTION_SLOW_CONSUMER_POLICY = "coalesce"
+# Clients count down locally from `ends_at`; those that connect with
+# resync=true also get a timer_update this often as a drift check
+AUCTION_RESYNC_INTERVAL = 15
+# Background retries for an auction log write that failed
+AUCTION_RECORD_RETRIES = 6
+# Attempts at settling a won auction before its hold is released instead
+AUCTION_SETTLE_ATTEMPTS = 5
+
 class AuctionRoom:
     # AuctionRoom manages a simple in-memory FIFO auction queue. Each room
-    # holds a queue of AuctionItem objects, runs a countdown for the active
-    # item, collects bids, and settles the winner when time expires.
-    def __init__(self, assigned_id: int):
+    # holds a queue of AuctionItem objects, keeps an absolute deadline for the
+    # active item (timers run on the shared auction_scheduler), collects bids,
+    # and settles the winner when time expires.
+    # Everything that changes room state (bid, status, join, leave, end, next)
+    # goes through the room's command queue and runs on one consumer task, so
+    # commands never interleave; bids waiting together are resolved as a batch.
+    def __init__(self, assigned_id: int, on_change: Optional[Callable[["AuctionRoom"], None]] = None):
         self.auc_list = deque([])
         self.id = assigned_id
+        # called when load or participants change, so the house can re-rank the room
+        self.on_change = on_change
         
         self.current_item: Optional[AuctionItem] = None
-        self.time_remaining: int = 0
-        self.timer_task: Optional[asyncio.Task] = None
+        # event loop time at which the current auction ends
+        self.deadline: Optional[float] = None
         
         self.current_bid = 0
         self.current_winning_bidder: Optional[str] = None
         self.bid_history: list[BidMessage] = []
         
-        # WebSocket connections mapped by user_uuid
-        self.active_connections: Dict[str, WebSocket] = {}
+        # Send queues (each wrapping one WebSocket) mapped by user_uuid
+        self.active_connections: Dict[str, Outbox] = {}
+        # users who asked for periodic timer_update resyncs
+        self.resync_users: Set[str] = set()
         
         self.room_active = False
         self.listing_name = self._update_listing_name()
-    
+
+        # Command queue of (kind, kwargs, future), drained by actor_task
+        self.inbox: deque = deque()
+        self._inbox_ready = asyncio.Event()
+        self.actor_task: Optional[asyncio.Task] = None
+        self.commands_processed = 0
+        self.bid_batches = 0
+        self.bids_batched = 0
+        self.max_inbox_depth = 0
+        # background retries of failed event log writes (see _record)
+        self.record_retries: Set[asyncio.Task] = set()
+    
+    @property
+    def time_remaining(self) -> int:
+        """Whole seconds left on the current auction, derived from the deadline"""
+        if self.deadline is None or not self.room_active:
+            return 0
+        return max(0, math.ceil(self.deadline - auction_scheduler.now()))
+
+    @property
+    def load(self) -> int:
+        """Live auction plus queued items"""
+        return len(self.auc_list) + (1 if self.current_item else 0)
+
+    @property
+    def idle(self) -> bool:
+        return (not self.current_item and not self.auc_list
+                and not self.active_connections and not self.inbox
+                and not self.record_retries)
+
+    # -- command queue --
+
+    def post(self, kind: str, **kwargs) -> asyncio.Future:
+        """Queue a command for the room; the future resolves to its result"""
+        future = asyncio.get_running_loop().create_future()
+        self.inbox.append((kind, kwargs, future))
+        self.max_inbox_depth = max(self.max_inbox_depth, len(self.inbox))
+        self._inbox_ready.set()
+        if self.actor_task is None or self.actor_task.done():
+            self.actor_task = asyncio.create_task(self._run_actor())
+        return future
+
+    async def submit(self, kind: str, **kwargs):
+        """Queue a command and wait for it to run"""
+        return await self.post(kind, **kwargs)
+
+    def stop_actor(self):
+        if self.actor_task and not self.actor_task.done():
+            self.actor_task.cancel()
+        self.actor_task = None
+        for task in list(self.record_retries):
+            task.cancel()
+
+    async def _run_actor(self):
+        handlers = {
+            "join": self.connect,
+            "leave": self.disconnect,
+            "status": self.send_current_state,
+            "end": self._end_if_active,
+            "next": self._start_next_if_idle,
+        }
+        while True:
+            await self._inbox_ready.wait()
+            self._inbox_ready.clear()
+            while self.inbox:
+                kind, kwargs, future = self.inbox.popleft()
+                if kind == "bid":
+                    # Take every bid queued right behind this one and resolve them together
+                    batch = [(kwargs, future)]
+                    while self.inbox and self.inbox[0][0] == "bid":
+                        _, more_kwargs, more_future = self.inbox.popleft()
+                        batch.append((more_kwargs, more_future))
+                    futures = [f for _, f in batch]
+                    call = self.place_bids([(kw["user_uuid"], kw["amount"]) for kw, _ in batch])
+                    if len(batch) > 1:
+                        self.bid_batches += 1
+                        self.bids_batched += len(batch)
+                else:
+                    futures = [future]
+                    call = handlers[kind](**kwargs)
+                self.commands_processed += len(futures)
+
+                try:
+                    result = await call
+                except Exception as e:
+                    #log code
+                    auction_logger.error(
+                        "auction_room_command_failed",
+                        room_id=self.id,
+                        command=kind,
+                        error=str(e)
+                    )
+                    for f in futures:
+                        if not f.done():
+                            f.set_exception(e)
+                    continue
+
+                results = result if kind == "bid" else [result]
+                for f, r in zip(futures, results):
+                    # The caller may have gone away (socket closed) while waiting
+                    if not f.done():
+                        f.set_result(r)
+
+    async def _end_if_active(self):
+        # A buyout may already have ended this auction, and a bid resolved
+        # while this was queued may have extended it (its timer is rearmed)
+        if self.room_active and self.deadline is not None and auction_scheduler.now() >= self.deadline:
+            await self.end_current_auction()
+
+    async def _start_next_if_idle(self):
+        # An item listed during the post-auction pause may already be running
+        if not self.current_item:
+            await self.start_next_auction()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+
+    @property
+    def ends_at(self) -> Optional[float]:
+        """Unix timestamp at which the current auction ends"""
+        if self.deadline is None or not self.room_active:
+            return None
+        return time.time() + (self.deadline - auction_scheduler.now())
+
+    def _timing(self) -> dict:
+        # server_time lets clients correct for clock skew when counting down
+        return {"ends_at": self.ends_at, "server_time": time.time()}
+
+    async def _record(self, item: AuctionItem, *events, release: bool = False) -> bool:
+        """Append (kind, payload) events for `item` to the durable auction log.
+        With release=True the auction ends unsold in the same transaction: any
+        hold is released and the card goes back to the seller. If the write
+        fails it is retried in the background; returns whether the first
+        attempt succeeded."""
+        rows = [(item.auction_id, self.id, kind, payload) for kind, payload in events]
+        if release:
+            write = functools.partial(release_auction, item.auction_id, item.card_id)
+        else:
+            write = record_auction_events
+        if await asyncio.to_thread(write, rows):
+            return True
+
+        #log code
+        auction_logger.error(
+            "auction_event_record_failed",
+            room_id=self.id,
+            auction_id=item.auction_id,
+            kinds=[kind for kind, _ in events],
+            retrying=True
+        )
+        task = asyncio.create_task(self._retry_record(write, rows))
+        self.record_retries.add(task)
+        task.add_done_callback(self._retry_done)
+        return False
+
+    def _retry_done(self, task: asyncio.Task):
+        self.record_retries.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            #log code
+            auction_logger.error(
+                "auction_event_record_retry_failed",
+                room_id=self.id,
+                error=repr(task.exception())
+            )
+        # a room isn't idle (retirable) while a retry is pending
+        if self.on_change:
+            self.on_change(self)
+
+    async def _retry_record(self, write: Callable[[list], bool], rows: list):
+        delay = 1.0
+        for attempt in range(1, AUCTION_RECORD_RETRIES + 1):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Room stopped (shutdown or re-sharding) before the write went through
+                #log code
+                auction_logger.error(
+                    "auction_event_record_lost",
+                    room_id=self.id,
+                    auction_id=rows[0][0],
+                    kinds=[kind for _, _, kind, _ in rows],
+                    cancelled=True
+                )
+                raise
+            if await asyncio.to_thread(write, rows):
+
+                #log code
+                auction_logger.info(
+                    "auction_event_record_recovered",
+                    room_id=self.id,
+                    auction_id=rows[0][0],
+                    attempts=attempt
+                )
+                return
+            delay = min(delay * 2, 30)
+
+        # Out of retries: a restart will replay this auction from stale events
+        #log code
+        auction_logger.error(
+            "auction_event_record_lost",
+            room_id=self.id,
+            auction_id=rows[0][0],
+            kinds=[kind for _, _, kind, _ in rows]
+        )
+
+    def restore(self, item: AuctionItem, ends_at: float, current_bid: int,
+                winner_uuid: Optional[str]):
+        """Resume an auction replayed from the log; an overdue one ends right away"""
+        self.current_item = item
+        self.current_bid = current_bid
+        self.current_winning_bidder = winner_uuid
+        self.bid_history = []
+        self.room_active = True
+        self.listing_name = self._update_listing_name()
+        self.deadline = auction_scheduler.now() + max(0.0, ends_at - time.time())
+        self._schedule_timers()
+        self._changed()
+
     def _update_listing_name(self) -> str:
         if self.current_item:
             return f"Auction Room {self.id} | Selling {self.current_item.card.card_name}"
         return f"Auction Room {self.id} | Open"
     
-    async def connect(self, websocket: WebSocket, user_uuid: str):
+    async def connect(self, websocket: WebSocket, user_uuid: str, compress: bool = False,
+                      resync: bool = False, binary: bool = False):
         """Add a new WebSocket connection to the room"""
-        await websocket.accept()
-        self.active_connections[user_uuid] = websocket
+        if binary:
+            await websocket.accept(subprotocol=AUCTION_BINARY_SUBPROTOCOL)
+        else:
+            await websocket.accept()
+        previous = self.active_connections.get(user_uuid)
+        if previous is not None:
+            # Same user joined again from a new socket; stop writing to the old one
+            await previous.close()
+        self.active_connections[user_uuid] = Outbox(
+            websocket,
+            maxsize=AUCTION_SEND_QUEUE_SIZE,
+            policy=AUCTION_SLOW_CONSUMER_POLICY,
+            on_failed=lambda e: self._send_failed(user_uuid, websocket, e),
+            compress=compress,
+            binary=binary
+        )
+        if resync:
+            self.resync_users.add(user_uuid)
+        else:
+            self.resync_users.discard(user_uuid)
         
         #log code
         auction_logger.info(
@@ -870,6 +1317,7 @@ class AuctionRoom:
             user_uuid=user_uuid,
             total_participants=len(self.active_connections)
         )
+        self._changed()
 
         # Send current auction state to new connection
         await self.send_current_state(user_uuid)
@@ -881,10 +1329,17 @@ class AuctionRoom:
             "total_participants": len(self.active_connections)
         }, exclude=user_uuid)
     
-    async def disconnect(self, user_uuid: str):
+    async def disconnect(self, user_uuid: str, websocket: Optional[WebSocket] = None,
+                         close_code: Optional[int] = None, reason: str = ""):
         """Remove a WebSocket connection"""
-        if user_uuid in self.active_connections:
-            del self.active_connections[user_uuid]
+        outbox = self.active_connections.get(user_uuid)
+        # Already gone, or the user has since reconnected on another socket
+        if outbox is None or (websocket is not None and outbox.websocket is not websocket):
+            return
+        del self.active_connections[user_uuid]
+        self.resync_users.discard(user_uuid)
+        await outbox.close(close_code, reason)
+        self._changed()
         
         #log code
         auction_logger.info(
@@ -902,7 +1357,8 @@ class AuctionRoom:
     
     async def send_current_state(self, user_uuid: str):
         """Send current auction state to a specific user"""
-        if user_uuid not in self.active_connections:
+        outbox = self.active_connections.get(user_uuid)
+        if outbox is None:
             return
             
         state = {
@@ -918,48 +1374,97 @@ class AuctionRoom:
             "current_bid": self.current_bid,
             "current_winner": self.current_winning_bidder,
             "time_remaining": self.time_remaining,
+            **self._timing(),
             "room_active": self.room_active,
             "queue_length": len(self.auc_list)
         }
         
-        await self.active_connections[user_uuid].send_json(state)
-    
-    async def broadcast(self, message: dict, exclude: Optional[str] = None):
-        """Broadcast message to all connected clients"""
-        disconnected = []
-        for user_uuid, websocket in self.active_connections.items():
-            if exclude and user_uuid == exclude:
-                continue
-            try:
-                await websocket.send_json(message)
-            except:
-                disconnected.append(user_uuid)
-        
-        # Clean up disconnected clients
-        for user_uuid in disconnected:
-            await self.disconnect(user_uuid)
-    
-    async def countdown_timer(self):
-        """Background task to handle auction timer"""
-        while self.time_remaining > 0:
-            await asyncio.sleep(1)
-            self.time_remaining -= 1
-            
-            # Broadcast timer update every 5 seconds or when under 10 seconds
-            if self.time_remaining % 5 == 0 or self.time_remaining <= 10:
-                await self.broadcast({
-                    "type": "timer_update",
-                    "time_remaining": self.time_remaining
-                })
-        
+        # Binary-protocol clients only get the fields that changed since their last snapshot
+        await self.send_to(user_uuid, outbox.state(state))
+
+    async def send_to(self, user_uuid: str, message: dict):
+        """Queue a message for one connected user"""
+        outbox = self.active_connections.get(user_uuid)
+        if outbox is not None and not outbox.put(message):
+            await self._drop_slow_consumer(user_uuid)
+    
+    async def broadcast(self, message: dict, exclude: Optional[str] = None,
+                        only: Optional[Set[str]] = None):
+        """Broadcast message to all connected clients (or just the users in `only`)"""
+        # Encode once, then enqueue the same frame everywhere; each
+        # connection's writer task does the actual send
+        frame = fanout_stats.encode(message)
+        start = time.perf_counter()
+        targets = [
+            (user_uuid, outbox) for user_uuid, outbox in self.active_connections.items()
+            if user_uuid != exclude and (only is None or user_uuid in only)
+        ]
+        slow = [user_uuid for user_uuid, outbox in targets if not outbox.put(frame)]
+        recipients = len(targets)
+        fanout_stats.record(recipients, time.perf_counter() - start)
+        for user_uuid in slow:
+            await self._drop_slow_consumer(user_uuid)
+
+    async def _drop_slow_consumer(self, user_uuid: str):
+        #log code
+        auction_logger.warning(
+            "auction_room_slow_consumer_dropped",
+            room_id=self.id,
+            user_uuid=user_uuid,
+            policy=AUCTION_SLOW_CONSUMER_POLICY
+        )
+        self.post("leave", user_uuid=user_uuid, close_code=SLOW_CONSUMER_CLOSE_CODE, reason="Too far behind")
+
+    def _send_failed(self, user_uuid: str, websocket: WebSocket, error: Exception):
+        # Called from a writer task whose socket errored (usually a closed client)
+        #log code
+        auction_logger.info(
+            "auction_room_send_failed",
+            room_id=self.id,
+            user_uuid=user_uuid,
+            error=str(error)
+        )
+        self.post("leave", user_uuid=user_uuid, websocket=websocket)
+    
+    def _schedule_timers(self):
+        """(Re)arm this room's end and timer_update timers from self.deadline"""
+        auction_scheduler.schedule((self.id, "end"), self.deadline, self._on_deadline)
+        self._schedule_tick()
+
+    def _cancel_timers(self):
+        auction_scheduler.cancel((self.id, "end"))
+        auction_scheduler.cancel((self.id, "tick"))
+
+    def _schedule_tick(self):
+        # Low-frequency resync; clients render the countdown from ends_at
+        when = auction_scheduler.now() + AUCTION_RESYNC_INTERVAL
+        if when < self.deadline:
+            auction_scheduler.schedule((self.id, "tick"), when, self._on_tick)
+        else:
+            auction_scheduler.cancel((self.id, "tick"))
+
+    async def _on_tick(self):
+        if not self.room_active:
+            return
+        self._schedule_tick()
+        if not self.resync_users:
+            return
+        await self.broadcast({
+            "type": "timer_update",
+            "time_remaining": self.time_remaining,
+            **self._timing()
+        }, only=self.resync_users)
+
+    async def _on_deadline(self):
         # Auction ended
-        await self.end_current_auction()
+        await self.submit("end")
     
     async def start_next_auction(self):
         """Start the next auction from the queue"""
         if not self.auc_list:
             self.room_active = False
             self.current_item = None
+            self._changed()
 
             #log code
             auction_logger.info(
@@ -989,19 +1494,16 @@ class AuctionRoom:
     async def setup(self, auction_item: AuctionItem):
         """Setup a new auction"""
         self.current_item = auction_item
-        self.time_remaining = auction_item.ttl
         self.current_bid = auction_item.starting
         self.current_winning_bidder = None
         self.bid_history = []
         self.room_active = True
         self.listing_name = self._update_listing_name()
         
-        # Cancel previous timer if exists
-        if self.timer_task and not self.timer_task.done():
-            self.timer_task.cancel()
-        
-        # Start countdown timer
-        self.timer_task = asyncio.create_task(self.countdown_timer())
+        # Replaces any timers left over from the previous item
+        self.deadline = auction_scheduler.now() + auction_item.ttl
+        self._schedule_timers()
+        await self._record(auction_item, ("started", {"ends_at": self.ends_at}))
         
         #log code
         auction_logger.info(
@@ -1024,11 +1526,100 @@ class AuctionRoom:
                 "starting_bid": auction_item.starting,
                 "buyout_price": auction_item.buyout,
                 "time_limit": auction_item.ttl
-            }
+            },
+            **self._timing()
         })
     
     async def place_bid(self, user_uuid: str, amount: int) -> dict:
         """Handle a bid from a user"""
+        return (await self.place_bids([(user_uuid, amount)]))[0]
+
+    async def place_bids(self, bids: list) -> list:
+        """Resolve a batch of (user_uuid, amount) bids in arrival order, then broadcast once"""
+        results = []
+        events = []
+        bought_out = extended = False
+        item = self.current_item
+        before = (self.current_bid, self.current_winning_bidder, self.deadline, len(self.bid_history))
+
+        # Spendable money per bidder; the leader's hold on this auction counts as theirs
+        available = {}
+        if item:
+            available = await asyncio.to_thread(get_available_balances, [user_uuid for user_uuid, _ in bids])
+            if self.current_winning_bidder in available:
+                available[self.current_winning_bidder] += self.current_bid
+
+        for user_uuid, amount in bids:
+            if bought_out:
+                results.append({"success": False, "error": "Auction already bought out"})
+                continue
+            result = self._apply_bid(user_uuid, amount, available)
+            bought_out = result.get("buyout", False)
+            extended = result.pop("extended", False) or extended
+            results.append(result)
+            if result["success"]:
+                events.append((item.auction_id, self.id, "bid",
+                               {"bidder_uuid": user_uuid, "amount": self.current_bid}))
+        if extended:
+            events.append((item.auction_id, self.id, "extended", {"ends_at": self.ends_at}))
+
+        if events:
+            # Hold the leader's funds and log the bids in one transaction,
+            # before anyone is told about them
+            held = await asyncio.to_thread(
+                move_auction_hold, item.auction_id, self.current_winning_bidder, self.current_bid, events
+            )
+            if not held:
+                # Balance changed since we checked; undo the whole batch
+                leader = self.current_winning_bidder
+                self.current_bid, self.current_winning_bidder, deadline, history_len = before
+                del self.bid_history[history_len:]
+                if extended:
+                    self.deadline = deadline
+                    self._schedule_timers()
+
+                #log code
+                auction_logger.warning(
+                    "bid_failed_hold",
+                    room_id=self.id,
+                    user_uuid=leader
+                )
+                return [
+                    {"success": False, "error": "Insufficient funds"} if result["success"] else result
+                    for result in results
+                ]
+
+        if bought_out:
+            await self.broadcast({
+                "type": "buyout",
+                "bidder": self.current_winning_bidder,
+                "amount": self.current_bid
+            })
+            await self.end_current_auction()
+            return results
+
+        accepted = sum(1 for result in results if result["success"])
+        if not accepted:
+            return results
+        if extended:
+            await self.broadcast({
+                "type": "timer_extended",
+                "new_time": 10,
+                **self._timing()
+            })
+        # Only the bid left standing matters to watchers
+        await self.broadcast({
+            "type": "new_bid",
+            "bidder": self.current_winning_bidder,
+            "amount": self.current_bid,
+            "time_remaining": self.time_remaining,
+            "bids": accepted,
+            **self._timing()
+        })
+        return results
+
+    def _apply_bid(self, user_uuid: str, amount: int, available: Dict[str, int]) -> dict:
+        """Validate one bid against state and spendable funds and apply it (no awaits)"""
 
         #log code
         auction_logger.info(
@@ -1048,6 +1639,18 @@ class AuctionRoom:
             )
 
             return {"success": False, "error": "No active auction"}
+
+        # The end timer may have fired while this batch was waiting on the
+        # database; its "end" is queued behind us, so don't extend past it
+        if self.deadline is not None and auction_scheduler.now() >= self.deadline:
+
+            #log code
+            auction_logger.warning(
+                "bid_failed_auction_over",
+                room_id=self.id,
+                user_uuid=user_uuid
+            )
+            return {"success": False, "error": "Auction has ended"}
         
         if not self.current_item:
             #log code
@@ -1082,6 +1685,18 @@ class AuctionRoom:
                 current_bid=self.current_bid
             )
             return {"success": False, "error": f"Bid must be higher than current bid of {self.current_bid}"}
+
+        # Validate: the bidder can cover what would be held for them
+        if min(amount, self.current_item.buyout) > available.get(user_uuid, 0):
+
+            #log code
+            auction_logger.warning(
+                "bid_failed_insufficient_funds",
+                room_id=self.id,
+                user_uuid=user_uuid,
+                amount=amount
+            )
+            return {"success": False, "error": "Insufficient funds"}
         
         # Check for buyout
         if amount >= self.current_item.buyout:
@@ -1096,13 +1711,6 @@ class AuctionRoom:
                 amount=self.current_item.buyout,
                 card_name=self.current_item.card.card_name
             )
-
-            await self.broadcast({
-                "type": "buyout",
-                "bidder": user_uuid,
-                "amount": self.current_item.buyout
-            })
-            await self.end_current_auction()
             return {"success": True, "buyout": True}
         
         # Regular bid
@@ -1111,8 +1719,10 @@ class AuctionRoom:
         self.bid_history.append(BidMessage(user_uuid, amount, datetime.now()))
         
         # Extend timer if bid placed in last 10 seconds
-        if self.time_remaining < 10:
-            self.time_remaining = 10
+        extended = self.time_remaining < 10
+        if extended:
+            self.deadline = auction_scheduler.now() + 10
+            self._schedule_timers()
 
             #log code
             auction_logger.info(
@@ -1120,11 +1730,6 @@ class AuctionRoom:
                 room_id=self.id,
                 user_uuid=user_uuid
             )
-
-            await self.broadcast({
-                "type": "timer_extended",
-                "new_time": 10
-            })
         #log code
         auction_logger.info(
             "bid_success",
@@ -1133,15 +1738,7 @@ class AuctionRoom:
             amount=amount,
             card_name=self.current_item.card.card_name
         )
-
-        await self.broadcast({
-            "type": "new_bid",
-            "bidder": user_uuid,
-            "amount": amount,
-            "time_remaining": self.time_remaining
-        })
-        
-        return {"success": True, "buyout": False}
+        return {"success": True, "buyout": False, "extended": extended}
     
     async def end_current_auction(self):
         """End the current auction and process the winner"""
@@ -1155,8 +1752,8 @@ class AuctionRoom:
             winner_uuid=self.current_winning_bidder
         )    
         
-        if self.timer_task and not self.timer_task.done():
-            self.timer_task.cancel()
+        self._cancel_timers()
+        self.deadline = None
         
         # Capture current state locally so we can reset the room immediately
         curr_item = self.current_item
@@ -1167,6 +1764,7 @@ class AuctionRoom:
         self.current_item = None
         self.room_active = False
         self.listing_name = self._update_listing_name()
+        self._changed()
 
         if curr_winner and curr_item:
             # Broadcast that the auction was won
@@ -1177,126 +1775,11 @@ class AuctionRoom:
                 "item": curr_item.card.card_name
             })
 
-            # Attempt to transfer funds from winner -> seller, then transfer card ownership
-            seller_uuid = curr_item.seller_uuid
-            winner_uuid = curr_winner
-            final_amount = int(curr_bid)
-
-            try:
-                # Local import to avoid circular imports at module level
-                from server_components.utils.db_access import exchange_money, change_card_ownership
-
-                # Winner pays seller
-                paid = exchange_money(winner_uuid, seller_uuid, final_amount)
-                if not paid:
-
-                    #log code
-                    auction_logger.error(
-                        "auction_settlement_failed_insufficient_funds",
-                        room_id=self.id,
-                        winner_uuid=winner_uuid,
-                        seller_uuid=seller_uuid,
-                        amount=final_amount,
-                        card_name=curr_item.card.card_name
-                    )
-
-                    # Insufficient funds — notify participants
-                    await self.broadcast({
-                        "type": "auction_settlement_failed",
-                        "reason": "Insufficient funds from winner",
-                        "winner": winner_uuid,
-                        "seller": seller_uuid,
-                        "amount": final_amount
-                    })
-                else:
-                    # Transfer the card from seller -> winner
-                    transfer_ok = change_card_ownership(seller_uuid, winner_uuid, curr_item.card)
-                    if transfer_ok:
-
-                        #log code
-                        auction_logger.info(
-                            "auction_settled",
-                            room_id=self.id,
-                            winner_uuid=winner_uuid,
-                            seller_uuid=seller_uuid,
-                            amount=final_amount,
-                            card_name=curr_item.card.card_name
-                        )
-                        await self.broadcast({
-                            "type": "auction_settled",
-                            "winner": winner_uuid,
-                            "seller": seller_uuid,
-                            "amount": final_amount,
-                            "card": curr_item.card.card_name
-                        })
-                    else:
-                        #log code
-                        auction_logger.error(
-                            "auction_settlement_failed_card_transfer",
-                            room_id=self.id,
-                            winner_uuid=winner_uuid,
-                            seller_uuid=seller_uuid,
-                            amount=final_amount,
-                            card_name=curr_item.card.card_name
-                        )
-
-                        # If card transfer failed, refund the winner
-                        exchange_money(seller_uuid, winner_uuid, final_amount)
-
-                        #log code
-                        auction_logger.info(
-                            "auction_refund_issued",
-                            room_id=self.id,
-                            winner_uuid=winner_uuid,
-                            amount=final_amount
-                        )
-
-                        await self.broadcast({
-                            "type": "auction_settlement_failed",
-                            "reason": "Card transfer failed; buyer refunded",
-                            "winner": winner_uuid,
-                            "seller": seller_uuid,
-                            "amount": final_amount
-                        })
-            except Exception as e:
-                #log code
-                auction_logger.error(
-                    "auction_settlement_exception",
-                    room_id=self.id,
-                    winner_uuid=winner_uuid,
-                    seller_uuid=seller_uuid,
-                    amount=final_amount,
-                    card_name=curr_item.card.card_name,
-                    error=str(e)
-                )
-                # On unexpected error, attempt best-effort refund if necessary and notify
-                try:
-                    from server_components.utils.db_access import exchange_money
-                    # Attempt refund (may fail silently)
-                    exchange_money(seller_uuid, winner_uuid, final_amount)
-                    #log code
-                    auction_logger.info(
-                        "auction_refund_attempted",
-                        room_id=self.id,
-                        winner_uuid=winner_uuid,
-                        amount=final_amount
-                    )
-
-                except Exception as refund_error:
-
-                    #log code
-                    auction_logger.error(
-                        "auction_refund_failed",
-                        room_id=self.id,
-                        winner_uuid=winner_uuid,
-                        amount=final_amount,
-                        error=str(refund_error)
-                    )
-                await self.broadcast({
-                    "type": "auction_settlement_failed",
-                    "reason": f"Unexpected error during settlement: {e}"
-                })
+            await self._settle(curr_item, curr_winner, int(curr_bid))
         else:
+            if curr_item:
+                await self._record(curr_item, ("ended", {"winner_uuid": None, "final_bid": curr_bid}), release=True)
+
             #log code
             auction_logger.info(
                 "auction_ended_no_bids",
@@ -1310,13 +1793,102 @@ class AuctionRoom:
                 "reason": "No bids received"
             })
         
-        # Start next auction after delay
-        await asyncio.sleep(5)
-        await self.start_next_auction()
-    
+        # Start next auction after delay, without holding up the room's command queue
+        auction_scheduler.schedule((self.id, "next"), auction_scheduler.now() + 5,
+                                   lambda: self.submit("next"))
+    
+    async def _settle(self, item: AuctionItem, winner_uuid: str, final_amount: int, attempt: int = 1):
+        """Settle a won auction against the winner's hold. A failed transaction
+        (e.g. the database is busy) is retried with backoff; after the last
+        attempt the auction ends unsold so the winner's funds and the seller's
+        card don't stay locked."""
+        seller_uuid = item.seller_uuid
+        ended = ("ended", {"winner_uuid": winner_uuid, "final_bid": final_amount})
+
+        # One off-loop transaction against the winner's hold; it also
+        # writes the 'ended' event, so a crash can't settle twice
+        result = await asyncio.to_thread(
+            settle_auction,
+            item.auction_id,
+            item.card_id,
+            seller_uuid,
+            item.card.card_name,
+            item.card.rarity,
+            [(item.auction_id, self.id, *ended)]
+        )
+        if result["success"]:
+            #log code
+            auction_logger.info(
+                "auction_settled",
+                room_id=self.id,
+                winner_uuid=winner_uuid,
+                seller_uuid=seller_uuid,
+                amount=final_amount,
+                card_name=item.card.card_name,
+                attempts=attempt
+            )
+            await self.broadcast({
+                "type": "auction_settled",
+                "winner": winner_uuid,
+                "seller": seller_uuid,
+                "amount": final_amount,
+                "card": item.card.card_name
+            })
+            return
+
+        if result["reason"] == "error" and attempt < AUCTION_SETTLE_ATTEMPTS:
+            delay = min(2 ** attempt, 60)
+
+            #log code
+            auction_logger.warning(
+                "auction_settlement_retry",
+                room_id=self.id,
+                auction_id=item.auction_id,
+                attempt=attempt,
+                retry_in=delay,
+                error=result["error"]
+            )
+            auction_scheduler.schedule(
+                (self.id, "settle", item.auction_id), auction_scheduler.now() + delay,
+                lambda: self._settle(item, winner_uuid, final_amount, attempt + 1)
+            )
+            return
+
+        if result["reason"] == "error":
+            # Out of attempts: give the winner their money back and end the auction
+            await self._record(item, ended, release=True)
+            result = {"success": False, "reason": "abandoned", "error": result["error"]}
+        elif result["reason"] == "no_hold":
+            # Nothing to settle against (e.g. the log predates holds); don't replay it
+            await self._record(item, ended, release=True)
+
+        #log code
+        auction_logger.error(
+            "auction_settlement_failed",
+            room_id=self.id,
+            winner_uuid=winner_uuid,
+            seller_uuid=seller_uuid,
+            amount=final_amount,
+            card_name=item.card.card_name,
+            reason=result["reason"],
+            error=result["error"],
+            attempts=attempt
+        )
+        await self.broadcast({
+            "type": "auction_settlement_failed",
+            "reason": {
+                "card_missing": "Card transfer failed; buyer's funds released",
+                "abandoned": "Settlement failed; buyer's funds released",
+            }.get(result["reason"], result["error"]),
+            "winner": winner_uuid,
+            "seller": seller_uuid,
+            "amount": final_amount
+        })
+
     def add_to_auc_queue(self, item: AuctionItem):
         """Add an item to the auction queue"""
         self.auc_list.append(item)
+        self._changed()
 
         #log code
         auction_logger.info(
@@ -1338,16 +1910,98 @@ class AuctionRoom:
             )
 
             # Start auction if room is idle
-            asyncio.create_task(self.start_next_auction())
+            self.post("next")
 
 
+# Elastic room pool: the house keeps at least MIN_AUCTION_ROOMS rooms, opens
+# another (up to MAX_AUCTION_ROOMS) when every room already has an item
+# waiting behind its live auction, and retires extra rooms once they have sat
+# empty with nobody connected for ROOM_IDLE_GRACE seconds.
+MIN_AUCTION_ROOMS = 4
+MAX_AUCTION_ROOMS = 64
+ROOM_SPAWN_LOAD = 2
+ROOM_IDLE_GRACE = 60
+
 class AuctionHouse:
-    def __init__(self):
+    def __init__(self, min_rooms: int = MIN_AUCTION_ROOMS, max_rooms: int = MAX_AUCTION_ROOMS):
+        self.min_rooms = min_rooms
+        self.max_rooms = max_rooms
         self.rooms: Dict[int, AuctionRoom] = {}
-        # Initialize 10 rooms
-        for i in range(10):
-            self.rooms[i] = AuctionRoom(i)
-    
+        self.index = RoomLoadIndex()
+        for _ in range(min_rooms):
+            self._create_room()
+
+    def shard(self, shard_id: int, count: int):
+        """Own only the rooms where room_id % count == shard_id. Call before restore()."""
+        for room in self.rooms.values():
+            room.stop_actor()
+        self.rooms = {}
+        self.index = RoomLoadIndex(offset=shard_id, stride=count)
+        for _ in range(self.min_rooms):
+            self._create_room()
+
+    def _create_room(self) -> AuctionRoom:
+        room = AuctionRoom(self.index.allocate_id(), on_change=self.room_changed)
+        self.rooms[room.id] = room
+        self.index.update(room.id, room.load)
+        return room
+
+    def restore(self, auctions: list) -> int:
+        """Rebuild rooms from load_open_auctions(). Returns the number restored."""
+        for auction in auctions:
+            room = self.rooms.get(auction["room_id"])
+            if room is None:
+                self.index.claim_id(auction["room_id"])
+                room = AuctionRoom(auction["room_id"], on_change=self.room_changed)
+                self.rooms[room.id] = room
+            item = AuctionItem(
+                card=Card(auction["card_name"], auction["rarity"]),
+                seller_uuid=auction["seller_uuid"],
+                ttl=auction["ttl"],
+                buyout=auction["buyout"],
+                starting=auction["starting"],
+                card_id=auction.get("card_id"),
+                auction_id=auction["auction_id"]
+            )
+            if auction["ends_at"] is not None and not room.current_item:
+                room.restore(item, auction["ends_at"], auction["current_bid"], auction["winner_uuid"])
+            else:
+                room.auc_list.append(item)
+            self.index.update(room.id, room.load)
+        # Rooms with only queued items start their next auction as usual
+        for room in self.rooms.values():
+            if room.auc_list and not room.current_item:
+                room.post("next")
+        return len(auctions)
+
+    def room_changed(self, room: AuctionRoom):
+        """Re-rank a room after its queue or participants change"""
+        if self.rooms.get(room.id) is not room:
+            return
+        self.index.update(room.id, room.load)
+        key = (room.id, "retire")
+        if room.idle and len(self.rooms) > self.min_rooms:
+            auction_scheduler.schedule(key, auction_scheduler.now() + ROOM_IDLE_GRACE,
+                                       lambda: self._retire(room))
+        else:
+            auction_scheduler.cancel(key)
+
+    async def _retire(self, room: AuctionRoom):
+        if self.rooms.get(room.id) is not room or not room.idle or len(self.rooms) <= self.min_rooms:
+            return
+        del self.rooms[room.id]
+        self.index.remove(room.id)
+        room.on_change = None
+        room.bid_history = []
+        room.stop_actor()
+
+        #log code
+        auction_logger.info(
+            "auction_room_retired",
+            room_id=room.id,
+            total_rooms=len(self.rooms)
+        )
+
     def get_room_status(self) -> list:
         """Get status of all auction rooms"""
         return [
@@ -1358,21 +2012,29 @@ class AuctionHouse:
                 "current_bid": room.current_bid if room.current_item else None,
                 "participants": len(room.active_connections),
                 "queue_length": len(room.auc_list),
+                "pending_commands": len(room.inbox),
                 "time_remaining": room.time_remaining if room.room_active else None
             }
-            for room in self.rooms.values()
+            for room in sorted(self.rooms.values(), key=lambda r: r.id)
         ]
     
     def get_available_room(self) -> Optional[int]:
         """Find the best room to add a new auction item"""
-        # Prioritize rooms with shortest queues
-        sorted_rooms = sorted(
-            self.rooms.values(),
-            key=lambda r: len(r.auc_list)
-        )
-        if sorted_rooms:
-            return sorted_rooms[0].id
-        return None
+        # Least loaded room; open a new one if even that one is backed up
+        best = self.index.best()
+        if best is None or (best[1] >= ROOM_SPAWN_LOAD and len(self.rooms) < self.max_rooms):
+            if len(self.rooms) >= self.max_rooms:
+                return None
+            room = self._create_room()
+
+            #log code
+            auction_logger.info(
+                "auction_room_created",
+                room_id=room.id,
+                total_rooms=len(self.rooms)
+            )
+            return room.id
+        return best[0]
 
 
 auction_house = AuctionHouse()
@@ -1380,8 +2042,53 @@ auction_house = AuctionHouse()
 @app.get("/auction/rooms")
 async def get_auction_rooms():
     """REST endpoint to get all auction room statuses"""
+    rooms = auction_house.get_room_status()
+    # Other workers' rooms, asked over the shard broker
+    for shard_id in range(auction_shards.count):
+        if shard_id == auction_shards.shard_id:
+            continue
+        try:
+            rooms.extend(await auction_shards.request(shard_id, {"op": "rooms"}))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+
+            #log code
+            auction_logger.warning(
+                "auction_shard_unreachable",
+                shard=shard_id,
+                error=str(e)
+            )
+    rooms.sort(key=lambda r: r["room_id"])
+    return {
+        "rooms": rooms
+    }
+
+@app.get("/auction/stats")
+async def get_auction_stats():
+    """Broadcast fan-out, command queue, room and timer counters"""
+    rooms = list(auction_house.rooms.values())
     return {
-        "rooms": auction_house.get_room_status()
+        "rooms": len(rooms),
+        "participants": sum(len(room.active_connections) for room in rooms),
+        "binary_participants": sum(
+            1 for room in rooms for outbox in room.active_connections.values() if outbox.binary
+        ),
+        "timers": auction_scheduler.stats(),
+        "fanout": fanout_stats.snapshot(),
+        "shard": {
+            "id": auction_shards.shard_id,
+            "count": auction_shards.count,
+            "forwarded_sockets": auction_shards.forwarded,
+            "market_changes_published": auction_shards.published,
+            "market_changes_dropped": auction_shards.publish_dropped,
+            "market_resyncs": auction_shards.resyncs
+        },
+        "commands": {
+            "queued": sum(len(room.inbox) for room in rooms),
+            "max_depth": max((room.max_inbox_depth for room in rooms), default=0),
+            "processed": sum(room.commands_processed for room in rooms),
+            "bid_batches": sum(room.bid_batches for room in rooms),
+            "bids_batched": sum(room.bids_batched for room in rooms)
+        }
     }
 
 from pydantic import BaseModel
@@ -1439,10 +2146,36 @@ async def list_item(request: ListItemRequest):
         seller_uuid=request.seller_uuid,
         ttl=request.time_limit,
         buyout=request.buyout_price,
-        starting=request.starting_bid
+        starting=request.starting_bid,
+        card_id=card["id"]
     )
     
     room = auction_house.rooms[room_id]
+    # Only accept the item once its card is in escrow and it is in the durable log
+    queued = await asyncio.to_thread(queue_auction_card, card["id"], [
+        (auction_item.auction_id, room_id, "queued", auction_item.queued_event())
+    ])
+    if not queued["success"] and queued["reason"] == "card_taken":
+
+        #log code
+        auction_logger.warning(
+            "auction_list_item_card_taken",
+            seller_uuid=request.seller_uuid,
+            card_name=request.card_name,
+            card_id=card["id"]
+        )
+        raise HTTPException(status_code=409, detail="Card is already listed")
+    if not queued["success"]:
+
+        #log code
+        auction_logger.error(
+            "auction_list_item_not_recorded",
+            seller_uuid=request.seller_uuid,
+            card_name=request.card_name,
+            room_id=room_id
+        )
+        raise HTTPException(status_code=503, detail="Auction house is busy, try again")
+
     room.add_to_auc_queue(auction_item)
     
     #log code
@@ -1464,9 +2197,47 @@ async def list_item(request: ListItemRequest):
 async def websocket_auction_room(
     websocket: WebSocket,
     room_id: int,
-    user_uuid: str
+    user_uuid: str,
+    compress: bool = False,
+    resync: bool = False
 ):
-    """WebSocket endpoint for auction room"""
+    """WebSocket endpoint for auction room. With `compress=true`, large messages
+    arrive as zlib-deflated binary frames; `resync=true` adds a periodic
+    timer_update on top of the ends_at deadlines. Clients that offer the
+    binary subprotocol get packed binary messages instead of JSON. Rooms owned
+    by another worker are proxied to it over the shard broker."""
+    binary = AUCTION_BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    if not auction_shards.is_local(room_id):
+        try:
+            await auction_shards.proxy(websocket, room_id, {
+                "op": "join",
+                "room_id": room_id,
+                "user_uuid": user_uuid,
+                "compress": compress,
+                "resync": resync,
+                "binary": binary
+            }, subprotocol=AUCTION_BINARY_SUBPROTOCOL if binary else None)
+        except OSError as e:
+
+            #log code
+            auction_logger.error(
+                "auction_ws_shard_unreachable",
+                room_id=room_id,
+                user_uuid=user_uuid,
+                shard=auction_shards.owner(room_id),
+                error=str(e)
+            )
+
+            await websocket.close(code=1013, reason="Auction shard unavailable")
+        return
+
+    await run_auction_session(websocket, room_id, user_uuid, compress, resync, binary)
+
+
+async def run_auction_session(websocket: WebSocket, room_id: int, user_uuid: str,
+                              compress: bool = False, resync: bool = False, binary: bool = False):
+    """Join a local room and relay the client's commands to it until they leave.
+    `websocket` is the client's socket, or a BrokerWebSocket for a proxied one."""
     if room_id not in auction_house.rooms:
 
         #log code
@@ -1480,7 +2251,8 @@ async def websocket_auction_room(
         return
     
     room = auction_house.rooms[room_id]
-    await room.connect(websocket, user_uuid)
+    await room.submit("join", websocket=websocket, user_uuid=user_uuid, compress=compress, resync=resync,
+                      binary=binary)
     
     try:
         while True:
@@ -1488,22 +2260,23 @@ async def websocket_auction_room(
             data = await websocket.receive_json()
             
             if data["type"] == "bid":
-                result = await room.place_bid(
+                result = await room.submit(
+                    "bid",
                     user_uuid=user_uuid,
                     amount=data["amount"]
                 )
                 
                 if not result["success"]:
-                    await websocket.send_json({
+                    await room.send_to(user_uuid, {
                         "type": "bid_error",
                         "error": result["error"]
                     })
 
             elif data["type"] == "status":
-                await room.send_current_state(user_uuid)
+                await room.submit("status", user_uuid=user_uuid)
             
             elif data["type"] == "ping":
-                await websocket.send_json({"type": "pong"})
+                await room.send_to(user_uuid, {"type": "pong"})
                 
     except WebSocketDisconnect:
 
@@ -1514,7 +2287,7 @@ async def websocket_auction_room(
             user_uuid=user_uuid
         )
         
-        await room.disconnect(user_uuid)
+        await room.submit("leave", user_uuid=user_uuid, websocket=websocket)
     
     except Exception as e:
         
@@ -1526,7 +2299,29 @@ async def websocket_auction_room(
             error=str(e)
         )
         
-        await room.disconnect(user_uuid)
+        await room.submit("leave", user_uuid=user_uuid, websocket=websocket)
+
+
+async def handle_shard_request(request: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Serve another worker: list this shard's rooms, host a proxied room
+    socket, or apply its marketplace changes"""
+    if request.get("op") == "rooms":
+        await write_frame(writer, TEXT, json.dumps(auction_house.get_room_status()).encode("utf-8"))
+
+    elif request.get("op") == "join":
+        await run_auction_session(
+            BrokerWebSocket(reader, writer),
+            request["room_id"],
+            request["user_uuid"],
+            request.get("compress", False),
+            request.get("resync", False),
+            request.get("binary", False)
+        )
+
+    elif request.get("op") == "market":
+        while True:
+            _, payload = await read_frame(reader)
+            await asyncio.to_thread(apply_market_change, json.loads(payload))
 
 
 class MarketListRequest(BaseModel):
@@ -1534,24 +2329,107 @@ class MarketListRequest(BaseModel):
     card_name: str
     rarity: str
     price: int
+    # Optional lifetime; the listing is withdrawn when it runs out
+    ttl_seconds: int | None = None
 
 class MarketBuyRequest(BaseModel):
     email: str
     listing_id: int
 
+class MarketListItem(BaseModel):
+    card_name: str
+    rarity: str
+    price: int
+    ttl_seconds: int | None = None
+
+class MarketListBulkRequest(BaseModel):
+    email: str
+    items: list[MarketListItem]
+
+class MarketBuyBulkRequest(BaseModel):
+    email: str
+    listing_ids: list[int]
+
+class MarketBidRequest(BaseModel):
+    email: str
+    card_name: str
+    rarity: str
+    max_price: int
+    quantity: int = 1
+
+class MarketUserRequest(BaseModel):
+    email: str
+
+class BundleCard(BaseModel):
+    card_name: str
+    rarity: str
+
+class BundleListRequest(BaseModel):
+    email: str
+    cards: list[BundleCard]
+    price: int
+    title: str | None = None
+
+class BundleBuyRequest(BaseModel):
+    email: str
+    bundle_id: int
+
+class BundleSearchRequest(BaseModel):
+    card_name: str | None = None
+    price_max: int | None = None
+    limit: int = 10
+    cursor: str | None = None
+
+class WatchRuleRequest(BaseModel):
+    email: str
+    card_name: str
+    rarity: str
+    max_price: int
+
+class WatchRuleRemoveRequest(BaseModel):
+    email: str
+    rule_id: int
+
+class NotificationsRequest(BaseModel):
+    email: str
+    unread_only: bool = True
+    mark_read: bool = True
+    limit: int = 50
+
+class MarketBidCancelRequest(BaseModel):
+    email: str
+    order_id: int
+
+class MarketCancelRequest(BaseModel):
+    email: str
+    listing_id: int
+
 class MarketSearchRequest(BaseModel):
     card_names: list[str] | None = None
     rarities: list[str] | None = None
     price_min: int | None = None
     price_max: int | None = None
     limit: int = 10
+    # Free-text card name search: words are prefix-matched, fuzzy also
+    # matches close spellings. Text results are ranked and use offset paging.
+    query: str | None = None
+    fuzzy: bool = False
+    offset: int = 0
+    # Opaque keyset cursor from a previous response's next_cursor
+    # (price-ordered searches only)
+    cursor: str | None = None
+    # Also return counts per rarity / card name and a price histogram
+    # with this many buckets for the current filter
+    facets: bool = False
+    histogram_buckets: int = 10
 
 
 @app.post("/marketplace/list")
 async def marketplace_list(req: MarketListRequest):
     """List a card for sale on the marketplace."""
-    # Endpoint: validate ownership then insert a marketplace row. This is a
-    # convenience listing model (no reservation of a specific card row).
+    # Endpoint: validate ownership then insert a marketplace row. The listing
+    # holds one specific CardsOpened row in escrow until it is bought or
+    # cancelled, so the same card can't be sold or auctioned twice.
 
     #log code
     marketplace_logger.info(
@@ -1573,9 +2451,9 @@ async def marketplace_list(req: MarketListRequest):
 
         return JSONResponse(status_code=404, content={"error": "User not found"})
     
-    # Check user owns this card
-    card = select_card_by_name(user['uuid'], req.card_name)
-    if not card or card['rarity'] != req.rarity:
+    # Check user owns a copy of this card that isn't already listed
+    card = select_card_by_name(user['uuid'], req.card_name, req.rarity)
+    if not card:
 
         #log code
         marketplace_logger.warning(
@@ -1598,8 +2476,16 @@ async def marketplace_list(req: MarketListRequest):
 
         return JSONResponse(status_code=400, content={"error": "Price must be positive"})
     
-    success = add_to_marketplace(user['uuid'], req.card_name, req.rarity, req.price)
-    if success:
+    if req.ttl_seconds is not None and req.ttl_seconds <= 0:
+        return JSONResponse(status_code=400, content={"error": "ttl_seconds must be positive"})
+
+    # Off the loop: matching a standing bid takes the matching lock, which a
+    # buy order being filled on a worker thread may be holding
+    listing_id = await asyncio.to_thread(
+        add_to_marketplace, user['uuid'], req.card_name, req.rarity, req.price,
+        card_id=card['id'], ttl=req.ttl_seconds
+    )
+    if listing_id:
 
         #log code
         marketplace_logger.info(
@@ -1607,10 +2493,32 @@ async def marketplace_list(req: MarketListRequest):
             user_uuid=user["uuid"],
             card_name=req.card_name,
             rarity=req.rarity,
-            price=req.price
+            price=req.price,
+            listing_id=listing_id,
+            card_id=card["id"]
         )
 
-        return JSONResponse(status_code=201, content={"message": "Card listed successfully"})
+        # A standing bid may have bought it straight away
+        if order_book.loaded and listing_id not in order_book:
+
+            #log code
+            marketplace_logger.info(
+                "marketplace_list_matched_bid",
+                user_uuid=user["uuid"],
+                listing_id=listing_id
+            )
+
+            return JSONResponse(status_code=201, content={
+                "message": "Card sold to a standing buy order",
+                "listing_id": listing_id,
+                "sold": True
+            })
+
+        return JSONResponse(status_code=201, content={
+            "message": "Card listed successfully",
+            "listing_id": listing_id,
+            "sold": False
+        })
     
     #log code
     marketplace_logger.error(
@@ -1623,10 +2531,464 @@ async def marketplace_list(req: MarketListRequest):
     return JSONResponse(status_code=500, content={"error": "Failed to list card"})
 
 
+@app.post("/marketplace/list_bulk")
+async def marketplace_list_bulk(req: MarketListBulkRequest):
+    """List many cards in one request."""
+    # All items go through one transaction (see add_to_marketplace_bulk); each
+    # item still succeeds or fails on its own and gets its own result.
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_list_bulk_attempt",
+        email=req.email,
+        item_count=len(req.items)
+    )
+
+    if not req.items:
+        return JSONResponse(status_code=400, content={"error": "No items to list"})
+    if len(req.items) > MAX_BULK_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"At most {MAX_BULK_ITEMS} items per request"})
+
+    user = get_user_by_email(req.email)
+    if not user:
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_list_bulk_user_not_found",
+            email=req.email
+        )
+
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if any(item.ttl_seconds is not None and item.ttl_seconds <= 0 for item in req.items):
+        return JSONResponse(status_code=400, content={"error": "ttl_seconds must be positive"})
+
+    items = [item.model_dump() for item in req.items]
+    results = await asyncio.to_thread(add_to_marketplace_bulk, user['uuid'], items)
+
+    listed = 0
+    for index, (item, result) in enumerate(zip(items, results)):
+        result["index"] = index
+        result["card_name"] = item["card_name"]
+        result["rarity"] = item["rarity"]
+        if result["success"]:
+            listed += 1
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_list_bulk_done",
+        user_uuid=user["uuid"],
+        item_count=len(items),
+        listed=listed
+    )
+
+    return JSONResponse(status_code=200, content={
+        "listed": listed,
+        "failed": len(items) - listed,
+        "results": results
+    })
+
+
+@app.post("/marketplace/cancel")
+async def marketplace_cancel(req: MarketCancelRequest):
+    """Cancel one of your listings and return the card from escrow."""
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_cancel_attempt",
+        email=req.email,
+        listing_id=req.listing_id
+    )
+
+    user = get_user_by_email(req.email)
+    if not user:
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_cancel_user_not_found",
+            email=req.email
+        )
+
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if not cancel_marketplace_listing(user['uuid'], req.listing_id):
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_cancel_listing_not_found",
+            user_uuid=user["uuid"],
+            listing_id=req.listing_id
+        )
+
+        return JSONResponse(status_code=404, content={"error": "Listing not found"})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_cancel_success",
+        user_uuid=user["uuid"],
+        listing_id=req.listing_id
+    )
+
+    return JSONResponse(status_code=200, content={"message": "Listing cancelled"})
+
+
+@app.post("/marketplace/bid")
+async def marketplace_bid(req: MarketBidRequest):
+    """Place a standing buy order for a card."""
+    # The bid is matched against the cheapest listings at or below max_price
+    # right away (each fill at the listing's price); whatever is left rests in
+    # the bid book and is matched against new listings as they arrive.
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bid_attempt",
+        email=req.email,
+        card_name=req.card_name,
+        rarity=req.rarity,
+        max_price=req.max_price,
+        quantity=req.quantity
+    )
+
+    if req.max_price <= 0:
+        return JSONResponse(status_code=400, content={"error": "Price must be positive"})
+    if req.quantity <= 0 or req.quantity > MAX_BULK_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"Quantity must be between 1 and {MAX_BULK_ITEMS}"})
+
+    user = get_user_by_email(req.email)
+    if not user:
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_bid_user_not_found",
+            email=req.email
+        )
+
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    # Funds are checked again at each fill; this just rejects hopeless bids
+    if not non_negative_check(-req.max_price, user['uuid']):
+        return JSONResponse(status_code=400, content={"error": "Insufficient funds"})
+
+    result = await asyncio.to_thread(
+        create_buy_order, user['uuid'], req.card_name, req.rarity, req.max_price, req.quantity
+    )
+    if result is None:
+
+        #log code
+        marketplace_logger.error(
+            "marketplace_bid_failed",
+            user_uuid=user["uuid"],
+            card_name=req.card_name,
+            rarity=req.rarity
+        )
+
+        return JSONResponse(status_code=500, content={"error": "Failed to place buy order"})
+
+    fills = []
+    for fill in result["fills"]:
+        listing = fill["listing"]
+
+        #log code
+        transaction_logger.info(
+            "marketplace_purchase",
+            buyer_uuid=user["uuid"],
+            buyer_email=req.email,
+            seller_uuid=listing["uuid"],
+            card_name=listing["card_name"],
+            rarity=listing["rarity"],
+            price=fill["price"],
+            listing_id=listing["id"],
+            order_id=result["order_id"]
+        )
+
+        fills.append({"listing_id": listing["id"], "price": fill["price"]})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bid_placed",
+        user_uuid=user["uuid"],
+        order_id=result["order_id"],
+        filled=len(fills),
+        remaining=result["remaining"]
+    )
+
+    return JSONResponse(status_code=201, content={
+        "message": "Buy order placed",
+        "order_id": result["order_id"],
+        "fills": fills,
+        "remaining": result["remaining"]
+    })
+
+
+@app.post("/marketplace/bid/cancel")
+async def marketplace_bid_cancel(req: MarketBidCancelRequest):
+    """Cancel one of your standing buy orders."""
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bid_cancel_attempt",
+        email=req.email,
+        order_id=req.order_id
+    )
+
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if not cancel_buy_order(user['uuid'], req.order_id):
+        return JSONResponse(status_code=404, content={"error": "Buy order not found"})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bid_cancel_success",
+        user_uuid=user["uuid"],
+        order_id=req.order_id
+    )
+
+    return JSONResponse(status_code=200, content={"message": "Buy order cancelled"})
+
+
+@app.post("/marketplace/my_bids")
+async def marketplace_my_bids(req: MarketUserRequest):
+    """List your open buy orders."""
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    orders = get_user_buy_orders(user['uuid'])
+    return JSONResponse(status_code=200, content={"orders": orders, "count": len(orders)})
+
+
+@app.post("/marketplace/bundle/list")
+async def marketplace_bundle_list(req: BundleListRequest):
+    """List several cards together at one price."""
+    # Every card is escrowed in one transaction; if any is missing nothing
+    # is listed (see create_bundle).
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bundle_list_attempt",
+        email=req.email,
+        card_count=len(req.cards),
+        price=req.price
+    )
+
+    if len(req.cards) < 2:
+        return JSONResponse(status_code=400, content={"error": "A bundle needs at least 2 cards"})
+    if len(req.cards) > MAX_BULK_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"At most {MAX_BULK_ITEMS} cards per bundle"})
+    if req.price <= 0:
+        return JSONResponse(status_code=400, content={"error": "Price must be positive"})
+
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    result = await asyncio.to_thread(
+        create_bundle, user['uuid'], [card.model_dump() for card in req.cards], req.price, req.title
+    )
+    if not result["success"]:
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_bundle_list_failed",
+            user_uuid=user["uuid"],
+            error=result["error"]
+        )
+
+        status_code = 500 if result["item"] is None else 400
+        return JSONResponse(status_code=status_code, content={"error": result["error"], "item": result["item"]})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bundle_list_success",
+        user_uuid=user["uuid"],
+        bundle_id=result["bundle_id"],
+        card_count=len(req.cards),
+        price=req.price
+    )
+
+    return JSONResponse(status_code=201, content={
+        "message": "Bundle listed successfully",
+        "bundle_id": result["bundle_id"]
+    })
+
+
+@app.post("/marketplace/bundles")
+async def marketplace_bundles(req: BundleSearchRequest):
+    """Browse bundles, cheapest first."""
+    try:
+        after = decode_cursor(req.cursor, (NUMBER, ROW_ID))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+    limit = page_size(req.limit)
+
+    bundles = query_bundles(limit, card_name=req.card_name, price_max=req.price_max, after=after)
+    next_cursor = None
+    if len(bundles) == limit:
+        next_cursor = encode_cursor(bundles[-1]['price'], bundles[-1]['id'])
+
+    return JSONResponse(status_code=200, content={
+        "bundles": bundles,
+        "count": len(bundles),
+        "next_cursor": next_cursor
+    })
+
+
+@app.post("/marketplace/bundle/buy")
+async def marketplace_bundle_buy(req: BundleBuyRequest):
+    """Buy every card in a bundle in one purchase."""
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bundle_buy_attempt",
+        email=req.email,
+        bundle_id=req.bundle_id
+    )
+
+    buyer = get_user_by_email(req.email)
+    if not buyer:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    result = await asyncio.to_thread(purchase_bundle, buyer['uuid'], req.bundle_id)
+    if not result["success"]:
+        status_code = {
+            "unavailable": 404,
+            "busy": 409,
+            "own_listing": 400,
+            "insufficient_funds": 400,
+            "seller_missing": 409,
+            "card_missing": 409,
+        }.get(result["reason"], 500)
+
+        #log code
+        marketplace_logger.warning(
+            f"marketplace_bundle_buy_{result['reason']}",
+            user_uuid=buyer["uuid"],
+            bundle_id=req.bundle_id
+        )
+
+        return JSONResponse(status_code=status_code, content={"error": result["error"]})
+
+    bundle = result["bundle"]
+
+    #log code
+    transaction_logger.info(
+        "marketplace_bundle_purchase",
+        buyer_uuid=buyer["uuid"],
+        buyer_email=req.email,
+        seller_uuid=bundle["uuid"],
+        bundle_id=req.bundle_id,
+        card_count=bundle["card_count"],
+        price=bundle["price"]
+    )
+
+    return JSONResponse(status_code=200, content={
+        "message": "Purchase successful",
+        "bundle_id": req.bundle_id,
+        "cards": bundle["cards"],
+        "price": bundle["price"]
+    })
+
+
+@app.post("/marketplace/bundle/cancel")
+async def marketplace_bundle_cancel(req: BundleBuyRequest):
+    """Cancel one of your bundles and return its cards from escrow."""
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if not await asyncio.to_thread(cancel_bundle, user['uuid'], req.bundle_id):
+        return JSONResponse(status_code=404, content={"error": "Bundle not found"})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_bundle_cancel_success",
+        user_uuid=user["uuid"],
+        bundle_id=req.bundle_id
+    )
+
+    return JSONResponse(status_code=200, content={"message": "Bundle cancelled"})
+
+
+@app.post("/marketplace/watch")
+async def marketplace_watch(req: WatchRuleRequest):
+    """Get an alert whenever a card is listed at or below a target price."""
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_watch_attempt",
+        email=req.email,
+        card_name=req.card_name,
+        rarity=req.rarity,
+        max_price=req.max_price
+    )
+
+    if req.max_price <= 0:
+        return JSONResponse(status_code=400, content={"error": "Price must be positive"})
+
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    rule_id = add_watch_rule(user['uuid'], req.card_name, req.rarity, req.max_price)
+    if rule_id is None:
+        return JSONResponse(status_code=500, content={"error": "Failed to add watch"})
+
+    return JSONResponse(status_code=201, content={"message": "Watching card", "rule_id": rule_id})
+
+
+@app.post("/marketplace/watch/remove")
+async def marketplace_watch_remove(req: WatchRuleRemoveRequest):
+    """Stop watching a card."""
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    if not remove_watch_rule(user['uuid'], req.rule_id):
+        return JSONResponse(status_code=404, content={"error": "Watch not found"})
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_watch_removed",
+        user_uuid=user["uuid"],
+        rule_id=req.rule_id
+    )
+
+    return JSONResponse(status_code=200, content={"message": "Watch removed"})
+
+
+@app.post("/marketplace/watchlist")
+async def marketplace_watchlist(req: MarketUserRequest):
+    """List your watch rules."""
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    rules = get_watch_rules(user['uuid'])
+    return JSONResponse(status_code=200, content={"rules": rules, "count": len(rules)})
+
+
+@app.post("/notifications")
+async def notifications_inbox(req: NotificationsRequest):
+    """Alerts that arrived while you weren't connected to /ws/marketplace."""
+    user = get_user_by_email(req.email)
+    if not user:
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    notifications = get_notifications(
+        user['uuid'],
+        unread_only=req.unread_only,
+        mark_read=req.mark_read,
+        limit=page_size(req.limit, default=50)
+    )
+    return JSONResponse(status_code=200, content={"notifications": notifications, "count": len(notifications)})
+
+
 @app.post("/marketplace/search")
 async def marketplace_search(req: MarketSearchRequest):
     """Search marketplace listings."""
-    # Simple search wrapper around DB helper; returns listing rows.
+    # Search wrapper around the DB helper (order book backed); returns listing rows.
 
     #log code
     marketplace_logger.info(
@@ -1635,16 +2997,43 @@ async def marketplace_search(req: MarketSearchRequest):
         rarities=req.rarities,
         price_min=req.price_min,
         price_max=req.price_max,
-        limit=req.limit
+        limit=req.limit,
+        query=req.query,
+        fuzzy=req.fuzzy
     )
 
-    listings = querey_marketplace(
-        ammount=req.limit,
-        card_names=req.card_names,
-        rarities=req.rarities,
-        price_min=req.price_min,
-        price_max=req.price_max
+    try:
+        after = decode_cursor(req.cursor, (NUMBER, ROW_ID))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+    limit = page_size(req.limit)
+
+    # Identical searches share one cached result until the marketplace changes
+    key = search_key(
+        req.card_names, req.rarities, req.price_min, req.price_max, limit,
+        query=req.query, fuzzy=req.fuzzy, offset=req.offset, cursor=req.cursor
     )
+    if req.query:
+        loader = lambda: search_marketplace_text(
+            req.query,
+            fuzzy=req.fuzzy,
+            card_names=req.card_names,
+            rarities=req.rarities,
+            price_min=req.price_min,
+            price_max=req.price_max,
+            limit=limit,
+            offset=req.offset
+        )
+    else:
+        loader = lambda: querey_marketplace(
+            ammount=limit,
+            card_names=req.card_names,
+            rarities=req.rarities,
+            price_min=req.price_min,
+            price_max=req.price_max,
+            after=after
+        )
+    listings = await search_cache.get_or_load(key, loader)
 
     #log code
     marketplace_logger.info(
@@ -1652,15 +3041,98 @@ async def marketplace_search(req: MarketSearchRequest):
         results_count=len(listings)
     )
 
-    return JSONResponse(status_code=200, content={"listings": listings, "count": len(listings)})
+    # Price-ordered results page by (price, id); ranked text results use offset
+    next_cursor = None
+    if not req.query and len(listings) == limit:
+        next_cursor = encode_cursor(listings[-1]['price'], listings[-1]['id'])
+
+    content = {
+        "listings": listings,
+        "count": len(listings),
+        "next_cursor": next_cursor
+    }
+    if req.facets and order_book.loaded:
+        content["facets"] = _search_facets(req)
+
+    return JSONResponse(status_code=200, content=content)
+
+
+def _search_facets(req: MarketSearchRequest) -> dict:
+    # Counted straight from the order book index; a text query is first
+    # resolved to the listed card names it matches.
+    card_names = req.card_names
+    if req.query:
+        matched = listed_card_names_matching(req.query, req.fuzzy)
+        card_names = [n for n in matched if not req.card_names or n in req.card_names]
+        if not card_names:
+            return {"rarities": {}, "card_names": {}, "total": 0, "price_histogram": []}
+    buckets = max(0, min(req.histogram_buckets, 50))
+    facets = order_book.facets(card_names, req.rarities, req.price_min, req.price_max, buckets)
+    if req.query:
+        # Names outside the query aren't alternatives to offer
+        facets["card_names"] = {n: c for n, c in facets["card_names"].items() if n in card_names}
+    return facets
+
+
+@app.get("/marketplace/stats")
+async def marketplace_stats(card_name: Optional[str] = None, rarity: Optional[str] = None):
+    """
+    Rolling price statistics per (card_name, rarity): last sale, 1h/24h/7d
+    VWAP and volume, min/max ask and listing depth. Filter by card_name
+    and/or rarity, or omit both for every traded or listed card.
+    """
+    if card_name and rarity:
+        keys = [(card_name, rarity)]
+    else:
+        keys = [
+            key for key in price_stats.keys()
+            if (not card_name or key[0] == card_name) and (not rarity or key[1] == rarity)
+        ]
+    stats = [price_stats.get(name, rar) for name, rar in keys]
+    return JSONResponse(status_code=200, content={"stats": stats, "count": len(stats)})
+
+
+@app.get("/marketplace/history")
+async def marketplace_history(
+    card_name: str,
+    rarity: str,
+    resolution: str = "1h",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 500
+):
+    """
+    OHLC price history for one card from the minute/hour/day rollups.
+    `since`/`until` are unix timestamps.
+    """
+    if resolution not in CANDLE_RESOLUTIONS:
+        return JSONResponse(status_code=400, content={
+            "error": f"Invalid resolution. Allowed: {list(CANDLE_RESOLUTIONS.keys())}"
+        })
+
+    candles = get_price_history(
+        card_name,
+        rarity,
+        resolution=resolution,
+        since=since,
+        until=until,
+        limit=max(1, min(limit, 1000))
+    )
+    return JSONResponse(status_code=200, content={
+        "card_name": card_name,
+        "rarity": rarity,
+        "resolution": resolution,
+        "candles": candles,
+        "count": len(candles)
+    })
 
 
 @app.post("/marketplace/buy")
 async def marketplace_buy(req: MarketBuyRequest):
     """Buy a card from the marketplace."""
-    # Buy flow (minimal): 1) get listing, 2) transfer money, 3) transfer one
-    # matching card from seller -> buyer, 4) remove the listing. This approach
-    # transfers the first matching card instance
+    # Buy flow: the listing is claimed, paid for and the card transferred in a
+    # single DB transaction (see purchase_marketplace_listing). Losing a race
+    # for the same listing returns 409 instead of charging twice.
 
     #log code
     marketplace_logger.info(
@@ -1680,15 +3152,8 @@ async def marketplace_buy(req: MarketBuyRequest):
 
         return JSONResponse(status_code=404, content={"error": "User not found"})
     
-    # Get the listing
-    from server_components.utils.db_access import get_db_connection
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Marketplace WHERE id = ?", (req.listing_id,))
-    listing = cursor.fetchone()
-    conn.close()
-    
-    if not listing:
+    # Cheap pre-check against the order book before taking the write lock
+    if order_book.loaded and req.listing_id not in order_book:
 
         #log code
         marketplace_logger.warning(
@@ -1698,47 +3163,35 @@ async def marketplace_buy(req: MarketBuyRequest):
         )
         return JSONResponse(status_code=404, content={"error": "Listing not found"})
     
-    listing = dict(listing)
-    seller_uuid = listing['uuid']
-    
-    if buyer['uuid'] == seller_uuid:
+    result = purchase_marketplace_listing(buyer['uuid'], req.listing_id)
+
+    if not result["success"]:
+        status_code = {
+            "unavailable": 409,
+            "busy": 409,
+            "own_listing": 400,
+            "insufficient_funds": 400,
+            "seller_missing": 409,
+            "card_missing": 409,
+        }.get(result["reason"], 500)
 
         #log code
         marketplace_logger.warning(
-            "marketplace_buy_own_listing",
+            f"marketplace_buy_{result['reason']}",
             user_uuid=buyer["uuid"],
             listing_id=req.listing_id
         )
 
-        return JSONResponse(status_code=400, content={"error": "Cannot buy your own listing"})
+        return JSONResponse(status_code=status_code, content={"error": result["error"]})
     
-    # Transfer money (buyer -> seller)
-    if not exchange_money(buyer['uuid'], seller_uuid, listing['price']):
-
-        #log code
-        marketplace_logger.warning(
-            "marketplace_buy_insufficient_funds",
-            buyer_uuid=buyer["uuid"],
-            seller_uuid=seller_uuid,
-            price=listing["price"]
-        )
+    listing = result["listing"]
 
-        return JSONResponse(status_code=400, content={"error": "Insufficient funds"})
-    
-    # Transfer card ownership
-    card = Card(listing['card_name'], listing['rarity'])
-    from server_components.utils.db_access import change_card_ownership
-    change_card_ownership(seller_uuid, buyer['uuid'], card)
-    
-    # Remove listing
-    remove_from_marketplace(seller_uuid, listing['card_name'], listing['rarity'], listing['price'])
-    
     #log code
     transaction_logger.info(
         "marketplace_purchase",
         buyer_uuid=buyer["uuid"],
         buyer_email=req.email,
-        seller_uuid=seller_uuid,
+        seller_uuid=listing["uuid"],
         card_name=listing["card_name"],
         rarity=listing["rarity"],
         price=listing["price"],
@@ -1752,6 +3205,202 @@ async def marketplace_buy(req: MarketBuyRequest):
     })  
 
 
+@app.post("/marketplace/buy_bulk")
+async def marketplace_buy_bulk(req: MarketBuyBulkRequest):
+    """Buy many marketplace listings in one request."""
+    # One transaction for the whole basket with a savepoint per listing, so a
+    # listing that was already sold (or that the buyer can no longer afford)
+    # is reported on its own without undoing the rest.
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_buy_bulk_attempt",
+        email=req.email,
+        listing_ids=req.listing_ids
+    )
+
+    if not req.listing_ids:
+        return JSONResponse(status_code=400, content={"error": "No listings to buy"})
+    if len(req.listing_ids) > MAX_BULK_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"At most {MAX_BULK_ITEMS} listings per request"})
+    if len(set(req.listing_ids)) != len(req.listing_ids):
+        return JSONResponse(status_code=400, content={"error": "Duplicate listing ids"})
+
+    buyer = get_user_by_email(req.email)
+    if not buyer:
+
+        #log code
+        marketplace_logger.warning(
+            "marketplace_buy_bulk_user_not_found",
+            email=req.email
+        )
+
+        return JSONResponse(status_code=404, content={"error": "User not found"})
+
+    results = await asyncio.to_thread(purchase_marketplace_listings_bulk, buyer['uuid'], req.listing_ids)
+
+    items = []
+    spent = 0
+    for index, (listing_id, result) in enumerate(zip(req.listing_ids, results)):
+        if not result["success"]:
+            items.append({
+                "index": index,
+                "listing_id": listing_id,
+                "success": False,
+                "reason": result["reason"],
+                "error": result["error"]
+            })
+            continue
+
+        listing = result["listing"]
+        spent += listing["price"]
+
+        #log code
+        transaction_logger.info(
+            "marketplace_purchase",
+            buyer_uuid=buyer["uuid"],
+            buyer_email=req.email,
+            seller_uuid=listing["uuid"],
+            card_name=listing["card_name"],
+            rarity=listing["rarity"],
+            price=listing["price"],
+            listing_id=listing_id,
+            bulk=True
+        )
+
+        items.append({
+            "index": index,
+            "listing_id": listing_id,
+            "success": True,
+            "card_name": listing["card_name"],
+            "rarity": listing["rarity"],
+            "price": listing["price"]
+        })
+
+    bought = sum(1 for item in items if item["success"])
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_buy_bulk_done",
+        user_uuid=buyer["uuid"],
+        requested=len(req.listing_ids),
+        bought=bought,
+        spent=spent
+    )
+
+    return JSONResponse(status_code=200, content={
+        "bought": bought,
+        "failed": len(items) - bought,
+        "spent": spent,
+        "results": items
+    })
+
+
+
+def _split_filter(value: str | None) -> list[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def _feed_subscribed(card_names: list[str], rarities: list[str]) -> dict:
+    # Current asks for every listed key the subscriber matches, so clients
+    # start from a known state and then just apply events. Queued like any
+    # other event so it can't overtake events routed after it.
+    snapshot = []
+    for name, rarity in sorted(order_book.matching_keys(card_names or None, rarities or None)):
+        ask_range = order_book.ask_range(name, rarity)
+        if ask_range:
+            snapshot.append({
+                "card_name": name,
+                "rarity": rarity,
+                "min_ask": ask_range[0],
+                "depth": order_book.depth(name, rarity)
+            })
+    return {
+        "type": "subscribed",
+        "card_names": card_names,
+        "rarities": rarities,
+        "snapshot": snapshot
+    }
+
+
+# live marketplace feed: listing_added / listing_sold / listing_cancelled /
+# price_changed events, filtered by card names and rarities.
+@app.websocket("/ws/marketplace")
+async def websocket_marketplace_feed(websocket: WebSocket, card_names: str | None = None,
+                                     rarities: str | None = None, email: str | None = None):
+    """Push marketplace changes instead of having clients poll /marketplace/search.
+
+    Filters come from the comma-separated `card_names` / `rarities` query
+    params and can be changed later by sending
+    {"action": "subscribe", "card_names": [...], "rarities": [...]}.
+    With `email` the socket also receives that user's price alerts.
+    """
+    await websocket.accept()
+
+    def too_slow():
+        #log code
+        marketplace_logger.warning(
+            "marketplace_feed_slow_consumer_dropped"
+        )
+        asyncio.create_task(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Too far behind"))
+
+    subscriber = Subscriber(on_dropped=too_slow)
+    names, rarity_list = _split_filter(card_names), _split_filter(rarities)
+    market_feed.subscribe(subscriber, names, rarity_list)
+    if email:
+        user = get_user_by_email(email)
+        if user:
+            market_feed.identify(subscriber, user['uuid'])
+
+    #log code
+    marketplace_logger.info(
+        "marketplace_feed_connected",
+        card_names=names,
+        rarities=rarity_list,
+        subscribers=len(market_feed)
+    )
+
+    async def sender():
+        while True:
+            event = await subscriber.queue.get()
+            await websocket.send_json(event)
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        market_feed.deliver(subscriber, _feed_subscribed(names, rarity_list))
+
+        while True:
+            data = await websocket.receive_json()
+            if data.get("action") != "subscribe":
+                market_feed.deliver(subscriber, {"type": "error", "message": "Unknown action"})
+                continue
+
+            names = [n for n in (data.get("card_names") or []) if isinstance(n, str)]
+            rarity_list = [r for r in (data.get("rarities") or []) if isinstance(r, str)]
+            if subscriber.dropped:
+                continue
+            market_feed.subscribe(subscriber, names, rarity_list)
+            market_feed.deliver(subscriber, _feed_subscribed(names, rarity_list))
+
+    except WebSocketDisconnect:
+
+        #log code
+        marketplace_logger.info(
+            "marketplace_feed_disconnected"
+        )
+
+    except Exception as e:
+
+        #log code
+        marketplace_logger.error(
+            "marketplace_feed_error",
+            error=str(e)
+        )
+
+    finally:
+        market_feed.unsubscribe(subscriber)
+        sender_task.cancel()
+
 
 class ConnectionManager:
     def __init__(self):
@@ -1762,11 +3411,19 @@ class ConnectionManager:
         self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        # broadcast() may already have dropped it after a failed send
+        self.active_connections.discard(websocket)
+
+    async def broadcast(self, message: Union[str, dict]):
+        # Encode once and send the same frame to every connection
+        frame = fanout_stats.encode(message)
+        start = time.perf_counter()
+        for connection in list(self.active_connections):
+            try:
+                await send_frame(connection, frame)
+            except (WebSocketDisconnect, RuntimeError):
+                self.active_connections.discard(connection)
+        fanout_stats.record(len(self.active_connections), time.perf_counter() - start)
 
 # joining the live trade waiting room.
 @app.websocket("/ws/trade_waiting_room")
@@ -13,6 +13,13 @@ class LoginUser(BaseModel):
 class Email(BaseModel):
     email: str
 
+class CollectionPageRequest(BaseModel):
+    email: str
+    # Set limit and/or cursor to page through individual rows instead of
+    # getting the whole (grouped) collection back at once
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+
 class OpenPackRequest(BaseModel):
     email: str
     pack_name: Optional[str] = None  # If None, opens most recent pack
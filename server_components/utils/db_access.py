@@ -1,17 +1,28 @@
 import sqlite3
 from pathlib import Path
-from typing import Optional, Dict, Any, TYPE_CHECKING
+from typing import Optional, Dict, Any, Callable, Set, TYPE_CHECKING
 import datetime
 import threading
 import time
+import re
+import difflib
+import json
+
+from server_components.market_utils.order_book import order_book
+from server_components.market_utils.price_stats import price_stats, WINDOWS
+from server_components.market_utils.market_feed import market_feed
+from server_components.market_utils.bid_book import bid_book
+from server_components.market_utils.expiry import listing_expiry
+from server_components.market_utils.watchlist import watch_index
+from server_components.auction_utils.shards import auction_shards
 
 if TYPE_CHECKING:
     from ..card_utils.card import Card
 
 DB_PATH = Path("./db/CardPack_DB.db")
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+def get_db_connection(timeout: float = 5.0):
+    conn = sqlite3.connect(DB_PATH, timeout=timeout)
     conn.row_factory = sqlite3.Row  # Allows accessing columns by name
     return conn
 
@@ -92,6 +103,7 @@ def init_db():
     );
     """)
 
+    # card_id points at the CardsOpened row held in escrow for this listing
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS Marketplace (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -100,10 +112,210 @@ def init_db():
         rarity TEXT NOT NULL,
         price INTEGER NOT NULL,
         created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(uuid) REFERENCES Users(uuid)
+        card_id INTEGER,
+        FOREIGN KEY(uuid) REFERENCES Users(uuid),
+        FOREIGN KEY(card_id) REFERENCES CardsOpened(id)
+    );
+    """)
+
+    # Completed trades (marketplace purchases and auction settlements).
+    # traded_at is a unix timestamp so windows can be computed cheaply.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS MarketTrades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        card_name TEXT NOT NULL,
+        rarity TEXT NOT NULL,
+        price INTEGER NOT NULL,
+        qty INTEGER NOT NULL DEFAULT 1,
+        source TEXT NOT NULL,
+        buyer_uuid TEXT,
+        seller_uuid TEXT,
+        traded_at REAL NOT NULL
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_market_trades_key_time
+    ON MarketTrades(card_name, rarity, traded_at)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_market_trades_time
+    ON MarketTrades(traded_at)
+    """)
+
+    # Standing buy orders: pay up to max_price for `remaining` more copies of
+    # a card. Rows are deleted once filled or cancelled.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS BuyOrders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL,
+        card_name TEXT NOT NULL,
+        rarity TEXT NOT NULL,
+        max_price INTEGER NOT NULL,
+        remaining INTEGER NOT NULL DEFAULT 1,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (uuid) REFERENCES Users(uuid)
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_buy_orders_owner
+    ON BuyOrders(uuid)
+    """)
+
+    # Bundle listings: one parent row with a price, and one child row per
+    # card held in escrow ('bundle') until the bundle is bought or cancelled.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS MarketBundles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL,
+        title TEXT,
+        price INTEGER NOT NULL,
+        card_count INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (uuid) REFERENCES Users(uuid)
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS MarketBundleItems (
+        bundle_id INTEGER NOT NULL,
+        card_id INTEGER NOT NULL UNIQUE,
+        card_name TEXT NOT NULL,
+        rarity TEXT NOT NULL,
+        PRIMARY KEY (bundle_id, card_id),
+        FOREIGN KEY (bundle_id) REFERENCES MarketBundles(id),
+        FOREIGN KEY (card_id) REFERENCES CardsOpened(id)
+    ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_market_bundles_price
+    ON MarketBundles(price, id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_market_bundle_items_card
+    ON MarketBundleItems(card_name, rarity)
+    """)
+
+    # Price alerts: notify uuid when card_name/rarity is listed at or below
+    # max_price. Alerts for users who aren't connected wait in Notifications.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS WatchRules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL,
+        card_name TEXT NOT NULL,
+        rarity TEXT NOT NULL,
+        max_price INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (uuid) REFERENCES Users(uuid)
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_watch_rules_owner
+    ON WatchRules(uuid)
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        read_at REAL,
+        FOREIGN KEY (uuid) REFERENCES Users(uuid)
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_notifications_owner
+    ON Notifications(uuid, id)
+    """)
+
+    # Append-only auction log (queued / started / bid / extended / ended).
+    # Auctions without an 'ended' event are rebuilt from it at startup.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AuctionEvents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        auction_id TEXT NOT NULL,
+        room_id INTEGER NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('queued', 'started', 'bid', 'extended', 'ended')),
+        payload TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_auction_events_auction
+    ON AuctionEvents(auction_id, kind)
+    """)
+    # Funds held for the leading bid of each running auction. Bank.reserved
+    # is the sum of a user's holds; spending checks money - reserved.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS AuctionHolds (
+        auction_id TEXT PRIMARY KEY,
+        uuid TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (uuid) REFERENCES Users(uuid)
     );
     """)
 
+    # OHLC rollups of MarketTrades at minute, hour and day resolution,
+    # updated in the same transaction as the trade they summarize.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS PriceCandles (
+        card_name TEXT NOT NULL,
+        rarity TEXT NOT NULL,
+        resolution TEXT NOT NULL,
+        bucket_start INTEGER NOT NULL,
+        open INTEGER NOT NULL,
+        high INTEGER NOT NULL,
+        low INTEGER NOT NULL,
+        close INTEGER NOT NULL,
+        volume INTEGER NOT NULL,
+        trade_count INTEGER NOT NULL,
+        PRIMARY KEY (card_name, rarity, resolution, bucket_start)
+    ) WITHOUT ROWID;
+    """)
+    _backfill_price_candles(cursor)
+
+    # Escrow columns for databases created before listings reserved cards.
+    # CardsOpened.escrow is NULL for a free card, or names what holds it
+    # ('marketplace', 'bundle' or 'auction').
+    _add_column_if_missing(cursor, "CardsOpened", "escrow", "TEXT")
+    _add_column_if_missing(cursor, "Marketplace", "card_id", "INTEGER")
+    # Optional listing TTL (unix timestamp); NULL lists until sold or cancelled
+    _add_column_if_missing(cursor, "Marketplace", "expires_at", "REAL")
+    # Money held for leading auction bids (see AuctionHolds)
+    _add_column_if_missing(cursor, "Bank", "reserved", "INTEGER NOT NULL DEFAULT 0")
+
+    # One listing per card, and fast lookup of a user's free copies
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_marketplace_card_id
+    ON Marketplace(card_id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_cards_opened_owner
+    ON CardsOpened(uuid, card_name, rarity)
+    """)
+
+    # Keyset pagination indexes for /my_cards, /my_packs and price-ordered search
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_cards_opened_acquired
+    ON CardsOpened(uuid, acquired_at, id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_inventory_created
+    ON Inventory(uuid, created_at, id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_marketplace_price
+    ON Marketplace(price, id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_marketplace_expires
+    ON Marketplace(expires_at) WHERE expires_at IS NOT NULL
+    """)
+
+    _escrow_legacy_listings(cursor)
+
+    _init_search_index(cursor)
+
     # Seed default packs if table is empty
     cursor.execute("SELECT COUNT(*) as count FROM Packs")
     if cursor.fetchone()['count'] == 0:
@@ -118,6 +330,105 @@ def init_db():
     conn.close()
 
 
+def _add_column_if_missing(cursor, table: str, column: str, decl: str):
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row['name'] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _escrow_legacy_listings(cursor):
+    """
+    Attach a concrete card to listings created before escrow existed.
+    Listings whose seller no longer has a free matching card could never be
+    bought, so they are removed.
+    """
+    cursor.execute("SELECT id, uuid, card_name, rarity FROM Marketplace WHERE card_id IS NULL")
+    for listing in cursor.fetchall():
+        cursor.execute("""
+            SELECT id FROM CardsOpened
+            WHERE uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+            ORDER BY id
+            LIMIT 1
+        """, (listing['uuid'], listing['card_name'], listing['rarity']))
+        card = cursor.fetchone()
+        if card:
+            cursor.execute("UPDATE CardsOpened SET escrow = 'marketplace' WHERE id = ?", (card['id'],))
+            cursor.execute("UPDATE Marketplace SET card_id = ? WHERE id = ?", (card['id'], listing['id']))
+        else:
+            print(f"Removing listing {listing['id']}: seller no longer owns {listing['card_name']}")
+            cursor.execute("DELETE FROM Marketplace WHERE id = ?", (listing['id'],))
+
+
+# Set by init_db; False when this SQLite build lacks FTS5, in which case text
+# search falls back to LIKE prefix matching.
+FTS5_ENABLED = False
+
+def _init_search_index(cursor):
+    """
+    Create the FTS5 tables used for card name search.
+    MarketplaceFTS is an external-content index over Marketplace kept in sync
+    by triggers; CardCatalogFTS holds every card defined in the pack JSONs.
+    """
+    global FTS5_ENABLED
+    try:
+        cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS MarketplaceFTS USING fts5(
+            card_name,
+            content='Marketplace',
+            content_rowid='id'
+        );
+        """)
+        cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS CardCatalogFTS USING fts5(
+            card_name,
+            rarity UNINDEXED,
+            pack_name UNINDEXED
+        );
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 unavailable, text search will use LIKE: {e}")
+        FTS5_ENABLED = False
+        return
+
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS marketplace_fts_insert AFTER INSERT ON Marketplace BEGIN
+        INSERT INTO MarketplaceFTS(rowid, card_name) VALUES (new.id, new.card_name);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS marketplace_fts_delete AFTER DELETE ON Marketplace BEGIN
+        INSERT INTO MarketplaceFTS(MarketplaceFTS, rowid, card_name) VALUES ('delete', old.id, old.card_name);
+    END;
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS marketplace_fts_update AFTER UPDATE OF card_name ON Marketplace BEGIN
+        INSERT INTO MarketplaceFTS(MarketplaceFTS, rowid, card_name) VALUES ('delete', old.id, old.card_name);
+        INSERT INTO MarketplaceFTS(rowid, card_name) VALUES (new.id, new.card_name);
+    END;
+    """)
+    # Resync with rows written before the index/triggers existed
+    cursor.execute("INSERT INTO MarketplaceFTS(MarketplaceFTS) VALUES ('rebuild')")
+    FTS5_ENABLED = True
+
+
+def detect_search_index() -> bool:
+    """
+    Set FTS5_ENABLED from the existing schema, for workers that skip init_db
+    because another worker already ran it. Returns FTS5_ENABLED.
+    """
+    global FTS5_ENABLED
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'MarketplaceFTS'").fetchone()
+        FTS5_ENABLED = row is not None
+    except Exception as e:
+        print(f"Error checking search index: {e}")
+        FTS5_ENABLED = False
+    finally:
+        conn.close()
+    return FTS5_ENABLED
+
+
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -288,13 +599,16 @@ def add_cards_to_collection(user_uuid: str, cards: list) -> bool:
 def get_user_cards(user_uuid: str) -> list:
     """
     Retrieve all cards owned by a user, grouped by card name and rarity.
-    Returns list of dicts with card_name, rarity, qty, and latest acquired_at.
+    Returns list of dicts with card_name, rarity, qty, listed (copies held in
+    escrow), and latest acquired_at.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("""
-            SELECT card_name, rarity, COUNT(*) as qty, MAX(acquired_at) as acquired_at
+            SELECT card_name, rarity, COUNT(*) as qty,
+                   SUM(CASE WHEN escrow IS NOT NULL THEN 1 ELSE 0 END) as listed,
+                   MAX(acquired_at) as acquired_at
             FROM CardsOpened
             WHERE uuid = ?
             GROUP BY card_name, rarity
@@ -309,6 +623,64 @@ def get_user_cards(user_uuid: str) -> list:
         conn.close()
 
 
+def get_user_cards_page(user_uuid: str, limit: int, after: Optional[tuple] = None) -> list:
+    """
+    One page of a user's individual cards, newest first.
+    `after` is the (acquired_at, id) of the last card on the previous page;
+    the seek uses idx_cards_opened_acquired so deep pages stay cheap.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql = """
+            SELECT id, card_name, rarity, acquired_at, escrow
+            FROM CardsOpened
+            WHERE uuid = ?
+        """
+        params = [user_uuid]
+        if after is not None:
+            sql += " AND (acquired_at, id) < (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY acquired_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        cursor.execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting user cards page: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def get_user_inventory_page(user_uuid: str, limit: int, after: Optional[tuple] = None) -> list:
+    """
+    One page of a user's packs, newest first, keyed on (created_at, id).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql = """
+            SELECT id, pack_name, qty, pack_path, created_at
+            FROM Inventory
+            WHERE uuid = ? AND qty > 0
+        """
+        params = [user_uuid]
+        if after is not None:
+            sql += " AND (created_at, id) < (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        cursor.execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting user inventory page: {e}")
+        return []
+    finally:
+        conn.close()
+
+
 def get_user_inventory(user_uuid: str) -> list:
     """
     Retrieve all packs owned by a user.
@@ -332,39 +704,40 @@ def get_user_inventory(user_uuid: str) -> list:
         conn.close()
 
 
-def select_card_by_name(user_uuid: str, card_name:str):
+def select_card_by_name(user_uuid: str, card_name:str, rarity: Optional[str] = None):
+    """
+    Find one of the user's cards by name (and rarity, if given) that is not
+    held in escrow. Returns a dict with id, card_name, rarity and uuid, or None.
+    """
     conn = get_db_connection()  
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT card_name, rarity, acquired_at
+        sql = """
+            SELECT id, card_name, rarity, acquired_at
             FROM CardsOpened
-            WHERE uuid = ?
-            ORDER BY card_name
-        """, (user_uuid,))
+            WHERE uuid = ? AND card_name = ? AND escrow IS NULL
+        """
+        params = [user_uuid, card_name]
+        if rarity is not None:
+            sql += " AND rarity = ?"
+            params.append(rarity)
+        sql += " ORDER BY id LIMIT 1"
 
-        all_cards = cursor.fetchall()
-
-        cursor.execute("""
-            SELECT card_name, rarity, acquired_at
-            FROM CardsOpened
-            WHERE uuid = ? AND card_name = ?
-        """, (user_uuid, card_name))
-        
+        cursor.execute(sql, params)
         row = cursor.fetchone()
-        print(row)
 
         if row:
             # Convert row to dictionary for easier access
             return {
-                "card_name": row[0],
-                "rarity": row[1],
+                "id": row['id'],
+                "card_name": row['card_name'],
+                "rarity": row['rarity'],
                 "uuid": user_uuid
             }
         return None  # Return None if no card found
     except Exception as e:
         print(f"Error getting card{e}")
-        return []
+        return None
     finally:
         conn.close()
 
@@ -385,7 +758,8 @@ def change_card_ownership(seller_uuid: str, buyer_uuid: str, card: "Card"):
         # check that seller owns this card
         cursor.execute("""
             SELECT id FROM CardsOpened
-            WHERE uuid = ? AND card_name = ? AND rarity = ?
+            WHERE uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+            LIMIT 1
         """, (seller_uuid, card_name, card_rarity))
         
         row = cursor.fetchone()
@@ -669,13 +1043,14 @@ def non_negative_check(amount: int, account_uuid: str) -> bool:
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT money FROM Bank WHERE uuid = ?", (account_uuid,))
+        cursor.execute("SELECT money, reserved FROM Bank WHERE uuid = ?", (account_uuid,))
         row = cursor.fetchone()
         if not row:
             print("Bank account not found.")
             return False
         
-        current_money = row["money"]
+        # Money held for auction bids can't be spent elsewhere
+        current_money = row["money"] - row["reserved"]
         return current_money + amount >= 0
     except Exception as e:
         print(f"Error in non_negative_check: {e}")
@@ -724,10 +1099,21 @@ def reset_daily_logins():
 # Start the background reset
 reset_daily_logins()
 
-def querey_marketplace(ammount:int = 10, card_names: list[str] = None, rarities: list[str] = None, price_min: int = None, price_max: int = None):
+def querey_marketplace(ammount:int = 10, card_names: list[str] = None, rarities: list[str] = None, price_min: int = None, price_max: int = None, after: tuple = None):
     # Query marketplace listings with optional filters. Returns up to `ammount` rows.
-    conn = get_db_connection()  
-    cursor = conn.cursor()
+    # `after` is a (price, id) keyset cursor; only listings past it are returned.
+    # Served from the in-memory order book once it has been loaded at startup;
+    # the SQL path below is only used before that (e.g. scripts, tests).
+    if order_book.loaded:
+        return order_book.search(
+            limit=ammount,
+            card_names=card_names,
+            rarities=rarities,
+            price_min=price_min,
+            price_max=price_max,
+            after=tuple(after) if after is not None else None
+        )
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -753,10 +1139,14 @@ def querey_marketplace(ammount:int = 10, card_names: list[str] = None, rarities:
             clauses.append("price <= ?")
             params.append(price_max)
 
+        if after is not None:
+            clauses.append("(price, id) > (?, ?)")
+            params.extend(after)
+
         if clauses:
             sql += " WHERE " + " AND ".join(clauses)
 
-        sql += " ORDER BY price ASC LIMIT ?"
+        sql += " ORDER BY price ASC, id ASC LIMIT ?"
         params.append(ammount)
 
         cursor.execute(sql, params)
@@ -769,54 +1159,1947 @@ def querey_marketplace(ammount:int = 10, card_names: list[str] = None, rarities:
         conn.close()
 
 
-def add_to_marketplace(seller_uuid: str, card_name: str, rarity: str, price: int) -> bool:
+def load_marketplace_order_book() -> int:
+    """
+    Rebuild the in-memory order book from the Marketplace table.
+    Called once at startup. Returns the number of listings loaded.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        cursor.execute("SELECT id, uuid, card_name, rarity, price FROM Marketplace")
+        order_book.load(dict(r) for r in cursor.fetchall())
+        return len(order_book)
+    except Exception as e:
+        print(f"Error loading marketplace order book: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def _list_card(cursor, seller_uuid: str, card_name: str, rarity: str, price: int,
+               card_id: Optional[int] = None, expires_at: Optional[float] = None) -> Optional[int]:
+    """
+    Reserve a card in escrow and insert its listing using an open cursor.
+    Returns the new listing id, or None if the seller has no free copy.
+    Does not commit.
+    """
+    # Reserve the card first; the escrow IS NULL guard means the same card
+    # can't be listed (or auctioned) twice.
+    if card_id is None:
         cursor.execute("""
-            INSERT INTO Marketplace (uuid, card_name, rarity, price)
-            VALUES (?, ?, ?, ?)
-        """, (seller_uuid, card_name, rarity, price))
+            UPDATE CardsOpened
+            SET escrow = 'marketplace'
+            WHERE id = (
+                SELECT id FROM CardsOpened
+                WHERE uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+                ORDER BY id
+                LIMIT 1
+            )
+            RETURNING id
+        """, (seller_uuid, card_name, rarity))
+    else:
+        cursor.execute("""
+            UPDATE CardsOpened
+            SET escrow = 'marketplace'
+            WHERE id = ? AND uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+            RETURNING id
+        """, (card_id, seller_uuid, card_name, rarity))
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    cursor.execute("""
+        INSERT INTO Marketplace (uuid, card_name, rarity, price, card_id, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (seller_uuid, card_name, rarity, price, row['id'], expires_at))
+    return cursor.lastrowid
+
+
+def add_to_marketplace(seller_uuid: str, card_name: str, rarity: str, price: int, card_id: Optional[int] = None,
+                       ttl: Optional[float] = None) -> Optional[int]:
+    """
+    List a card on the marketplace, holding a specific CardsOpened row in
+    escrow until the listing is bought or cancelled. If card_id is None the
+    seller's oldest free copy is used. With `ttl` (seconds) the listing
+    expires and the card is released after that long.
+    Returns the new listing id, or None if the seller has no free copy of the card.
+    """
+    expires_at = time.time() + ttl if ttl else None
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        listing_id = _list_card(cursor, seller_uuid, card_name, rarity, price, card_id, expires_at)
+        if listing_id is None:
+            conn.rollback()
+            return None
         conn.commit()
-        return True
     except Exception as e:
         print(f"Error adding to Marketplace: {e}")
-        return False
+        conn.rollback()
+        return None
     finally:
         conn.close()
 
+    _publish_new_listings([{
+        "id": listing_id,
+        "uuid": seller_uuid,
+        "card_name": card_name,
+        "rarity": rarity,
+        "price": price,
+        "expires_at": expires_at
+    }])
+    return listing_id
 
-def remove_from_marketplace(user_uuid: str, card_name: str, rarity: str, price:int) -> bool:
+
+def _publish_new_listings(listings: list):
     """
-    Remove a listing from the marketplace by card_name and rarity owned by user_uuid.
-    Removes the first matching listing.
+    Post-commit side effects of new listings: index them, announce them, then
+    try standing bids and price alerts. The listings exist either way, so a
+    failure here is logged rather than reported as a failed listing.
+    """
+    for listing in listings:
+        order_book.add(listing)
+        if listing["expires_at"]:
+            listing_expiry.add(listing["id"], listing["expires_at"])
+        market_feed.listing_added(listing)
+        auction_shards.publish({"kind": "listing_added", "listing": listing})
+    for listing in listings:
+        try:
+            match_listing(listing)
+        except Exception as e:
+            print(f"Error matching listing {listing['id']} against buy orders: {e}")
+    try:
+        notify_watchers(listings)
+    except Exception as e:
+        print(f"Error notifying watchers of new listings: {e}")
+
+
+# Serializes changes from other workers, so a listing re-read from the
+# database can't be indexed after its removal has already been applied
+_market_sync_lock = threading.Lock()
+
+def apply_market_change(change: Dict[str, Any]):
+    """
+    Apply a marketplace change committed by another shard worker (see
+    auction_shards.publish) to this worker's in-memory state and feed.
+    Listings, buy orders and watch rules are re-read from the database
+    instead of trusted from the message, since changes from different
+    workers can arrive out of order. A "resync" (sent when changes for this
+    worker were lost) reloads all of that state from the database.
     """
-    # Select-by-id then delete to avoid SQLite's lack of DELETE ... LIMIT
+    if change["kind"] == "resync":
+        with _market_sync_lock:
+            load_marketplace_order_book()
+            if listing_expiry.enabled:
+                load_listing_expiry()
+            load_bid_book(match_crossed=False)
+            load_watch_rules()
+            load_price_stats()
+        return
+
     conn = get_db_connection()
+    try:
+        with _market_sync_lock:
+            kind = change["kind"]
+            if kind == "listing_added":
+                listing = change["listing"]
+                row = conn.execute("""
+                    SELECT id, uuid, card_name, rarity, price, expires_at
+                    FROM Marketplace WHERE id = ?
+                """, (listing["id"],)).fetchone()
+                # Already gone (sold, cancelled or expired) if the row is missing;
+                # its removal is on the way, so don't announce it
+                if row:
+                    order_book.add(dict(row))
+                    if row["expires_at"]:
+                        listing_expiry.add(row["id"], row["expires_at"])
+                    market_feed.listing_added(listing)
+
+            elif kind == "listing_removed":
+                listing = change["listing"]
+                order_book.remove(listing["id"])
+                listing_expiry.discard(listing["id"])
+                if change["reason"] == "sold":
+                    price_stats.record(listing["card_name"], listing["rarity"], change["price"],
+                                       ts=change["traded_at"])
+                    market_feed.listing_sold(listing, price=change["price"], traded_at=change["traded_at"])
+                elif change["reason"] == "expired":
+                    market_feed.listing_expired(listing)
+                else:
+                    market_feed.listing_cancelled(listing)
+
+            elif kind == "trade":
+                price_stats.record(change["card_name"], change["rarity"], change["price"], ts=change["traded_at"])
+                market_feed.trade(change["card_name"], change["rarity"], change["price"],
+                                  traded_at=change["traded_at"])
+
+            elif kind == "buy_order":
+                row = conn.execute("""
+                    SELECT id, uuid, card_name, rarity, max_price, remaining
+                    FROM BuyOrders WHERE id = ?
+                """, (change["id"],)).fetchone()
+                if row:
+                    bid_book.add(dict(row))
+                else:
+                    bid_book.remove(change["id"])
+
+            elif kind == "watch_rule":
+                row = conn.execute("""
+                    SELECT id, uuid, card_name, rarity, max_price
+                    FROM WatchRules WHERE id = ?
+                """, (change["id"],)).fetchone()
+                if row:
+                    watch_index.add(dict(row))
+                else:
+                    watch_index.remove(change["id"])
+    except Exception as e:
+        print(f"Error applying marketplace change from another worker: {e}")
+    finally:
+        conn.close()
+
+
+# Most items accepted by one bulk list/buy request
+MAX_BULK_ITEMS = 100
+
+def add_to_marketplace_bulk(seller_uuid: str, items: list) -> list:
+    """
+    List many cards in one transaction. `items` is a list of dicts with
+    card_name, rarity, price and optionally ttl_seconds. Each item succeeds or fails on its own (a
+    savepoint per item); successful ones are committed together.
+
+    Returns one result per item, in order:
+    {"success": True, "listing_id": id} or {"success": False, "error": msg}.
+    """
+    conn = get_db_connection(timeout=PURCHASE_LOCK_TIMEOUT)
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
     cursor = conn.cursor()
+    results = []
+    listed = []
     try:
-        # SQLite does not support LIMIT on DELETE, so select the id first then delete by id
-        cursor.execute("""
-            SELECT id FROM Marketplace
-            WHERE uuid = ? AND card_name = ? AND rarity = ? AND price = ?
-            ORDER BY created_at ASC
-            LIMIT 1
-        """, (user_uuid, card_name, rarity, price))
+        cursor.execute("BEGIN IMMEDIATE")
+        for item in items:
+            if item['price'] <= 0:
+                results.append({"success": False, "error": "Price must be positive"})
+                continue
 
+            cursor.execute("SAVEPOINT bulk_item")
+            expires_at = time.time() + item['ttl_seconds'] if item.get('ttl_seconds') else None
+            listing_id = _list_card(cursor, seller_uuid, item['card_name'], item['rarity'], item['price'],
+                                    expires_at=expires_at)
+            if listing_id is None:
+                cursor.execute("ROLLBACK TO bulk_item")
+                cursor.execute("RELEASE bulk_item")
+                results.append({"success": False, "error": "You don't own an unlisted copy of this card"})
+                continue
+            cursor.execute("RELEASE bulk_item")
+            results.append({"success": True, "listing_id": listing_id})
+            listed.append({
+                "id": listing_id,
+                "uuid": seller_uuid,
+                "card_name": item['card_name'],
+                "rarity": item['rarity'],
+                "price": item['price'],
+                "expires_at": expires_at
+            })
+        cursor.execute("COMMIT")
+    except Exception as e:
+        print(f"Error bulk adding to Marketplace: {e}")
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        error = "Marketplace is busy, try again" if isinstance(e, sqlite3.OperationalError) else "Listing failed"
+        return [{"success": False, "error": error} for _ in items]
+    finally:
+        conn.close()
+
+    _publish_new_listings(listed)
+    return results
+
+
+def cancel_marketplace_listing(user_uuid: str, listing_id: int) -> bool:
+    """
+    Cancel one of the user's listings and release its card from escrow.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM Marketplace
+            WHERE id = ? AND uuid = ?
+            RETURNING id, uuid, card_name, rarity, price, card_id
+        """, (listing_id, user_uuid))
         row = cursor.fetchone()
         if not row:
             return False
 
-        listing_id = row['id']
-        cursor.execute("DELETE FROM Marketplace WHERE id = ?", (listing_id,))
+        cursor.execute("UPDATE CardsOpened SET escrow = NULL WHERE id = ?", (row['card_id'],))
         conn.commit()
-        return cursor.rowcount > 0
+        order_book.remove(listing_id)
+        listing_expiry.discard(listing_id)
+        market_feed.listing_cancelled(dict(row))
+        auction_shards.publish({"kind": "listing_removed", "reason": "cancelled", "listing": dict(row)})
+        return True
     except Exception as e:
-        print(f"Error removing card from marketplace: {e}")
+        print(f"Error cancelling marketplace listing: {e}")
+        conn.rollback()
         return False
     finally:
         conn.close()
 
+
+def expire_listings(listing_ids: list[int], now: Optional[float] = None) -> Optional[int]:
+    """
+    Expire a batch of listings in one transaction: delete the rows whose
+    deadline has passed and release their cards from escrow. Listings that
+    were sold, cancelled or given a later deadline are left alone.
+    Returns the number of listings expired, or None if the batch failed.
+    """
+    if not listing_ids:
+        return 0
+    now = now if now is not None else time.time()
+    placeholders = ",".join("?" * len(listing_ids))
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            DELETE FROM Marketplace
+            WHERE id IN ({placeholders}) AND expires_at IS NOT NULL AND expires_at <= ?
+            RETURNING id, uuid, card_name, rarity, price, card_id
+        """, (*listing_ids, now))
+        expired = [dict(r) for r in cursor.fetchall()]
+        if expired:
+            card_ids = [listing['card_id'] for listing in expired]
+            cursor.execute(f"""
+                UPDATE CardsOpened
+                SET escrow = NULL
+                WHERE id IN ({",".join("?" * len(card_ids))})
+            """, card_ids)
+        conn.commit()
+    except Exception as e:
+        print(f"Error expiring listings: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+    for listing in expired:
+        order_book.remove(listing['id'])
+        market_feed.listing_expired(listing)
+        auction_shards.publish({"kind": "listing_removed", "reason": "expired", "listing": listing})
+    return len(expired)
+
+
+def expire_lapsed_listings(batch_size: int = 500, retries: int = 3) -> int:
+    """
+    Expire every listing whose deadline passed while the server was down.
+    Called once at startup, before the order book is loaded. A batch that
+    fails is retried with backoff; if it still fails the rest are left to the
+    expiry sweeper, which picks them up as soon as it starts.
+    Returns the number of listings expired.
+    """
+    now = time.time()
+    total = 0
+    failures = 0
+    while True:
+        conn = get_db_connection()
+        try:
+            rows = conn.execute("""
+                SELECT id FROM Marketplace
+                WHERE expires_at IS NOT NULL AND expires_at <= ?
+                LIMIT ?
+            """, (now, batch_size)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return total
+        expired = expire_listings([r['id'] for r in rows], now)
+        if expired is None:
+            failures += 1
+            if failures > retries:
+                print(f"Giving up on expiring lapsed listings after {retries} retries; "
+                      f"{total} expired, the rest are left to the sweeper")
+                return total
+            time.sleep(0.5 * 2 ** (failures - 1))
+            continue
+        if expired == 0:
+            # Nothing in the batch was still due (changed since the SELECT)
+            return total
+        failures = 0
+        total += expired
+
+
+def load_listing_expiry() -> int:
+    """Load the deadlines of listings with a TTL into the expiry heap."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT id, expires_at FROM Marketplace
+            WHERE expires_at IS NOT NULL
+        """).fetchall()
+        listing_expiry.load([(r['id'], r['expires_at']) for r in rows])
+        return len(rows)
+    except Exception as e:
+        print(f"Error loading listing expiry: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def start_listing_expiry_sweeper(max_sleep: float = 60, batch_size: int = 500):
+    """
+    Expire listings as their deadlines pass, in batches of up to batch_size.
+    Sleeps until the earliest deadline (at most max_sleep) and wakes early if
+    an earlier one is added. A batch that fails is put back and retried with
+    backoff. Runs in a background thread.
+    """
+    def sweep_once() -> bool:
+        # Returns False if the batch failed and should be retried later
+        now = time.time()
+        due = listing_expiry.pop_due(now, batch_size)
+        if due:
+            try:
+                expired = expire_listings([listing_id for listing_id, _ in due], now)
+            except Exception:
+                listing_expiry.restore(due)
+                raise
+            if expired is None:
+                listing_expiry.restore(due)
+                return False
+            return True
+
+        listing_expiry.changed.clear()
+        deadline = listing_expiry.next_deadline()
+        timeout = max_sleep if deadline is None else min(max(deadline - time.time(), 0), max_sleep)
+        listing_expiry.changed.wait(timeout)
+        return True
+
+    def sweep_loop():
+        backoff = 1.0
+        while True:
+            try:
+                ok = sweep_once()
+            except Exception as e:
+                print(f"Error in listing expiry sweeper: {e}")
+                ok = False
+            if ok:
+                backoff = 1.0
+                continue
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_sleep)
+
+    thread = threading.Thread(target=sweep_loop, daemon=True)
+    thread.start()
+
+
+def remove_from_marketplace(user_uuid: str, card_name: str, rarity: str, price:int) -> bool:
+    """
+    Remove a listing from the marketplace by card_name and rarity owned by user_uuid.
+    Removes the oldest matching listing and releases its card from escrow.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # SQLite does not support LIMIT on DELETE, so select the id first then delete by id
+        cursor.execute("""
+            SELECT id FROM Marketplace
+            WHERE uuid = ? AND card_name = ? AND rarity = ? AND price = ?
+            ORDER BY id ASC
+            LIMIT 1
+        """, (user_uuid, card_name, rarity, price))
+
+        row = cursor.fetchone()
+        if not row:
+            return False
+    finally:
+        conn.close()
+
+    return cancel_marketplace_listing(user_uuid, row['id'])
+
+# Card names from the catalog, used for fuzzy matching. Filled by index_card_catalog.
+_catalog_names: list[str] = []
+
+def index_card_catalog(pack_json_dir: Path, rebuild_index: bool = True) -> int:
+    """
+    Rebuild CardCatalogFTS from the pack JSON files. With rebuild_index=False
+    only the in-memory name list is refreshed (the table is shared, so one
+    worker rebuilds it). Returns the number of catalog entries indexed.
+    """
+    import json
+    global _catalog_names
+
+    entries = []
+    for json_file in pack_json_dir.glob("*/*.json"):
+        try:
+            with open(json_file, 'r') as f:
+                pack_data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Skipping {json_file.name} in card catalog: {e}")
+            continue
+        pack_name = pack_data.get('pack_name', json_file.stem)
+        for card_name, info in pack_data.get('card_distribution', {}).items():
+            rarity = (info.get('rarity') if isinstance(info, dict) else None) or 'common'
+            entries.append((card_name, rarity, pack_name))
+
+    _catalog_names = sorted({card_name for card_name, _, _ in entries})
+    if not FTS5_ENABLED or not rebuild_index:
+        return len(entries)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM CardCatalogFTS")
+        cursor.executemany("""
+            INSERT INTO CardCatalogFTS (card_name, rarity, pack_name) VALUES (?, ?, ?)
+        """, entries)
+        conn.commit()
+        return len(entries)
+    except Exception as e:
+        print(f"Error indexing card catalog: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def _fts_prefix_query(text: str) -> Optional[str]:
+    # "fire dra" -> '"fire"* "dra"*' (every word must prefix-match)
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _close_card_names(text: str, limit: int = 5, cutoff: float = 0.7) -> list[str]:
+    """
+    Catalog (and currently listed) names that loosely match `text`, for
+    typo-tolerant search. Compares against the whole name and each word in it.
+    """
+    text = text.lower().strip()
+    if not text:
+        return []
+    scored = []
+    for name in set(_catalog_names).union(order_book.card_names()):
+        lowered = name.lower()
+        candidates = [lowered] + lowered.split()
+        score = max(difflib.SequenceMatcher(None, text, c).ratio() for c in candidates)
+        if score >= cutoff:
+            scored.append((score, name))
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return [name for _, name in scored[:limit]]
+
+
+def _fts_name_query(text: str, fuzzy: bool) -> Optional[str]:
+    match = _fts_prefix_query(text)
+    if fuzzy:
+        # OR in exact phrases for close catalog names so typos still hit
+        phrases = ['"' + name.replace('"', '""') + '"' for name in _close_card_names(text)]
+        if phrases:
+            match = " OR ".join(([f"({match})"] if match else []) + phrases)
+    return match
+
+
+def listed_card_names_matching(query: str, fuzzy: bool = False) -> list[str]:
+    """
+    Listed card names that a text search would match, resolved in memory
+    from the order book (every query word must prefix a word in the name,
+    plus close names if fuzzy). Used to scope search facets to a query.
+    """
+    words = [w.lower() for w in re.findall(r"\w+", query)]
+    names = set()
+    for name in order_book.card_names():
+        name_words = re.findall(r"\w+", name.lower())
+        if words and all(any(nw.startswith(w) for nw in name_words) for w in words):
+            names.add(name)
+    if fuzzy:
+        listed = set(order_book.card_names())
+        names.update(name for name in _close_card_names(query) if name in listed)
+    return sorted(names)
+
+
+def search_card_catalog(query: str, fuzzy: bool = False, limit: int = 10) -> list:
+    """
+    Search the card catalog by name prefix (and close matches if fuzzy).
+    Returns list of dicts with card_name, rarity and pack_name, best match first.
+    """
+    match = _fts_name_query(query, fuzzy)
+    if not match:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if FTS5_ENABLED:
+            cursor.execute("""
+                SELECT card_name, rarity, pack_name
+                FROM CardCatalogFTS
+                WHERE CardCatalogFTS MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (match, limit))
+            return [dict(r) for r in cursor.fetchall()]
+        # No FTS5: fall back to the in-memory name list
+        names = [n for n in _catalog_names if n.lower().startswith(query.lower().strip())]
+        if fuzzy:
+            names += [n for n in _close_card_names(query) if n not in names]
+        return [{"card_name": n, "rarity": None, "pack_name": None} for n in names[:limit]]
+    except Exception as e:
+        print(f"Error searching card catalog: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def search_marketplace_text(query: str, fuzzy: bool = False, card_names: list[str] = None,
+                            rarities: list[str] = None, price_min: int = None, price_max: int = None,
+                            limit: int = 10, offset: int = 0) -> list:
+    """
+    Search active listings by card name text. Words are prefix-matched
+    ("drag" finds "Fire Dragon"); with fuzzy=True close catalog names are
+    matched too. The usual rarity and price filters apply. Results are ordered
+    by relevance, then price, and paginated with limit/offset.
+    """
+    match = _fts_name_query(query, fuzzy)
+    if not match:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if FTS5_ENABLED:
+            sql = """
+                SELECT m.id, m.uuid, m.card_name, m.rarity, m.price
+                FROM MarketplaceFTS
+                JOIN Marketplace m ON m.id = MarketplaceFTS.rowid
+                WHERE MarketplaceFTS MATCH ?
+            """
+            params = [match]
+        else:
+            sql = """
+                SELECT m.id, m.uuid, m.card_name, m.rarity, m.price
+                FROM Marketplace m
+                WHERE m.card_name LIKE ?
+            """
+            params = [query.strip() + "%"]
+
+        if card_names:
+            placeholders = ",".join("?" for _ in card_names)
+            sql += f" AND m.card_name IN ({placeholders})"
+            params.extend(card_names)
+
+        if rarities:
+            placeholders = ",".join("?" for _ in rarities)
+            sql += f" AND m.rarity IN ({placeholders})"
+            params.extend(rarities)
+
+        if price_min is not None:
+            sql += " AND m.price >= ?"
+            params.append(price_min)
+
+        if price_max is not None:
+            sql += " AND m.price <= ?"
+            params.append(price_max)
+
+        order = "MarketplaceFTS.rank, " if FTS5_ENABLED else ""
+        sql += f" ORDER BY {order}m.price ASC, m.id ASC LIMIT ? OFFSET ?"
+        params.extend([limit, max(offset, 0)])
+
+        cursor.execute(sql, params)
+        return [dict(r) for r in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error searching marketplace text: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+# Candle resolution -> bucket length in seconds
+CANDLE_RESOLUTIONS = {"1m": 60, "1h": 60 * 60, "1d": 24 * 60 * 60}
+
+# How long each kind of history is kept, in seconds (None = forever). Raw
+# ticks must outlive the longest rolling stats window (7d).
+HISTORY_RETENTION = {
+    "raw": 30 * 24 * 60 * 60,
+    "1m": 7 * 24 * 60 * 60,
+    "1h": 180 * 24 * 60 * 60,
+    "1d": None,
+}
+
+
+def _update_candles(cursor, card_name: str, rarity: str, price: int, qty: int, traded_at: float):
+    # Trades arrive in time order, so the newest one is always the close
+    for resolution, length in CANDLE_RESOLUTIONS.items():
+        bucket_start = int(traded_at // length) * length
+        cursor.execute("""
+            INSERT INTO PriceCandles (card_name, rarity, resolution, bucket_start,
+                                      open, high, low, close, volume, trade_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (card_name, rarity, resolution, bucket_start) DO UPDATE SET
+                high = MAX(high, excluded.high),
+                low = MIN(low, excluded.low),
+                close = excluded.close,
+                volume = volume + excluded.volume,
+                trade_count = trade_count + 1
+        """, (card_name, rarity, resolution, bucket_start, price, price, price, price, qty))
+
+
+def _backfill_price_candles(cursor):
+    """Build candles for trades recorded before PriceCandles existed."""
+    cursor.execute("SELECT 1 FROM PriceCandles LIMIT 1")
+    if cursor.fetchone():
+        return
+    cursor.execute("""
+        SELECT card_name, rarity, price, qty, traded_at
+        FROM MarketTrades
+        ORDER BY traded_at ASC, id ASC
+    """)
+    for trade in cursor.fetchall():
+        _update_candles(cursor, trade['card_name'], trade['rarity'], trade['price'],
+                        trade['qty'], trade['traded_at'])
+
+
+def _insert_trade(cursor, card_name: str, rarity: str, price: int, source: str,
+                  buyer_uuid: Optional[str], seller_uuid: Optional[str], traded_at: float):
+    cursor.execute("""
+        INSERT INTO MarketTrades (card_name, rarity, price, qty, source, buyer_uuid, seller_uuid, traded_at)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+    """, (card_name, rarity, price, source, buyer_uuid, seller_uuid, traded_at))
+    _update_candles(cursor, card_name, rarity, price, 1, traded_at)
+
+
+def get_price_history(card_name: str, rarity: str, resolution: str = "1h",
+                      since: Optional[float] = None, until: Optional[float] = None,
+                      limit: int = 500) -> list:
+    """
+    OHLC candles for one card, oldest first, read straight from PriceCandles.
+    `since`/`until` are unix timestamps; when `since` is omitted the most
+    recent `limit` candles are returned.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql = """
+            SELECT bucket_start, open, high, low, close, volume, trade_count
+            FROM PriceCandles
+            WHERE card_name = ? AND rarity = ? AND resolution = ?
+        """
+        params = [card_name, rarity, resolution]
+        if since is not None:
+            sql += " AND bucket_start >= ?"
+            params.append(int(since // CANDLE_RESOLUTIONS[resolution]) * CANDLE_RESOLUTIONS[resolution])
+        if until is not None:
+            sql += " AND bucket_start <= ?"
+            params.append(until)
+
+        # Without a start point take the newest candles, then flip to oldest first
+        newest_first = since is None
+        sql += " ORDER BY bucket_start " + ("DESC" if newest_first else "ASC") + " LIMIT ?"
+        params.append(limit)
+
+        cursor.execute(sql, params)
+        rows = [dict(r) for r in cursor.fetchall()]
+        return rows[::-1] if newest_first else rows
+    except Exception as e:
+        print(f"Error getting price history: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def compact_price_history(now: Optional[float] = None) -> Dict[str, int]:
+    """
+    Drop raw ticks and fine-grained candles past their retention period.
+    Coarser candles already summarize whatever is removed.
+    Returns the number of rows deleted per kind.
+    """
+    now = now if now is not None else time.time()
+    deleted = {}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        raw_keep = HISTORY_RETENTION["raw"]
+        cursor.execute("DELETE FROM MarketTrades WHERE traded_at < ?", (now - raw_keep,))
+        deleted["raw"] = cursor.rowcount
+
+        for resolution in CANDLE_RESOLUTIONS:
+            keep = HISTORY_RETENTION.get(resolution)
+            if keep is None:
+                continue
+            cursor.execute("""
+                DELETE FROM PriceCandles
+                WHERE resolution = ? AND bucket_start < ?
+            """, (resolution, now - keep))
+            deleted[resolution] = cursor.rowcount
+
+        conn.commit()
+        return deleted
+    except Exception as e:
+        print(f"Error compacting price history: {e}")
+        return deleted
+    finally:
+        conn.close()
+
+
+def start_price_history_compaction(interval: float = 60 * 60):
+    """
+    Run compact_price_history every `interval` seconds.
+    Runs in a background thread.
+    """
+    def compact_loop():
+        while True:
+            deleted = compact_price_history()
+            if any(deleted.values()):
+                print(f"Price history compacted: {deleted}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=compact_loop, daemon=True)
+    thread.start()
+
+
+def record_trade(card_name: str, rarity: str, price: int, source: str,
+                 buyer_uuid: Optional[str] = None, seller_uuid: Optional[str] = None) -> bool:
+    """
+    Record a completed trade that was settled outside purchase_marketplace_listing
+    (e.g. an auction) and feed it to the rolling price statistics.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        traded_at = time.time()
+        _insert_trade(cursor, card_name, rarity, price, source, buyer_uuid, seller_uuid, traded_at)
+        conn.commit()
+        price_stats.record(card_name, rarity, price, ts=traded_at)
+        market_feed.trade(card_name, rarity, price, traded_at=traded_at)
+        auction_shards.publish({"kind": "trade", "card_name": card_name, "rarity": rarity,
+                                "price": price, "traded_at": traded_at})
+        return True
+    except Exception as e:
+        print(f"Error recording trade: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def load_price_stats() -> int:
+    """
+    Rebuild the rolling price statistics from the trades inside the longest
+    window. Called once at startup. Returns the number of trades loaded.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        since = time.time() - max(WINDOWS.values())
+        cursor.execute("""
+            SELECT card_name, rarity, price, qty, traded_at
+            FROM MarketTrades
+            WHERE traded_at >= ?
+            ORDER BY traded_at ASC
+        """, (since,))
+        trades = [dict(r) for r in cursor.fetchall()]
+        price_stats.load(trades)
+        return len(trades)
+    except Exception as e:
+        print(f"Error loading price stats: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+# How long a purchase waits for the write lock before giving up. Kept short so
+# buyers racing for the same listing get a quick "busy" instead of queueing.
+PURCHASE_LOCK_TIMEOUT = 0.25
+
+def _purchase_listing(cursor, buyer_uuid: str, listing_id: int,
+                      price: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Claim, pay for and transfer one listing using an open cursor inside a
+    transaction. Does not commit or roll back; on failure the caller must
+    undo the partial work (ROLLBACK or ROLLBACK TO a savepoint).
+
+    `price` settles at something other than the asking price (a standing bid
+    that crosses a new listing trades at the bid).
+    """
+    def fail(reason: str, error: str) -> Dict[str, Any]:
+        return {"success": False, "reason": reason, "error": error}
+
+    cursor.execute("""
+        DELETE FROM Marketplace
+        WHERE id = ?
+        RETURNING id, uuid, card_name, rarity, price, card_id
+    """, (listing_id,))
+    row = cursor.fetchone()
+    if not row:
+        return fail("unavailable", "Listing is no longer available")
+
+    listing = dict(row)
+    seller_uuid = listing['uuid']
+    if price is None:
+        price = listing['price']
+
+    if seller_uuid == buyer_uuid:
+        return fail("own_listing", "Cannot buy your own listing")
+
+    # Debit only if the buyer can cover the price
+    cursor.execute("""
+        UPDATE Bank
+        SET money = money - ?
+        WHERE uuid = ? AND money - reserved >= ?
+    """, (price, buyer_uuid, price))
+    if cursor.rowcount != 1:
+        return fail("insufficient_funds", "Insufficient funds")
+
+    cursor.execute("""
+        UPDATE Bank
+        SET money = money + ?
+        WHERE uuid = ?
+    """, (price, seller_uuid))
+    if cursor.rowcount != 1:
+        return fail("seller_missing", "Seller bank account not found")
+
+    # The listing's card is already in escrow, so this is a primary-key update
+    cursor.execute("""
+        UPDATE CardsOpened
+        SET uuid = ?, escrow = NULL
+        WHERE id = ? AND uuid = ?
+    """, (buyer_uuid, listing['card_id'], seller_uuid))
+    if cursor.rowcount != 1:
+        return fail("card_missing", "Seller no longer owns this card")
+
+    traded_at = time.time()
+    _insert_trade(cursor, listing['card_name'], listing['rarity'], price,
+                  "marketplace", buyer_uuid, seller_uuid, traded_at)
+    return {"success": True, "listing": listing, "price": price, "traded_at": traded_at}
+
+
+def _after_purchase(result: Dict[str, Any]):
+    # In-memory bookkeeping once a purchase has been committed
+    listing = result["listing"]
+    order_book.remove(listing['id'])
+    listing_expiry.discard(listing['id'])
+    price_stats.record(listing['card_name'], listing['rarity'], result["price"], ts=result["traded_at"])
+    market_feed.listing_sold(listing, price=result["price"], traded_at=result["traded_at"])
+    auction_shards.publish({"kind": "listing_removed", "reason": "sold", "listing": listing,
+                            "price": result["price"], "traded_at": result["traded_at"]})
+
+
+def _lock_error(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def purchase_marketplace_listing(buyer_uuid: str, listing_id: int) -> Dict[str, Any]:
+    """
+    Buy a marketplace listing in a single transaction.
+
+    The listing is claimed with DELETE ... RETURNING, the buyer is debited with
+    a guarded UPDATE (money >= price), the seller is credited and the card held
+    in escrow by the listing is moved to the buyer. If any step fails everything is rolled back.
+
+    Returns {"success": True, "listing": {...}} or
+    {"success": False, "reason": <code>, "error": <message>} where reason is one
+    of "unavailable", "own_listing", "insufficient_funds", "seller_missing",
+    "card_missing", "busy" or "error".
+    """
+    conn = get_db_connection(timeout=PURCHASE_LOCK_TIMEOUT)
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        # Take the write lock up front so the claim, payment and transfer
+        # cannot interleave with another buyer.
+        cursor.execute("BEGIN IMMEDIATE")
+        result = _purchase_listing(cursor, buyer_uuid, listing_id)
+        if not result["success"]:
+            cursor.execute("ROLLBACK")
+            return result
+        cursor.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if _lock_error(e):
+            return {"success": False, "reason": "busy", "error": "Listing is being purchased by someone else, try again"}
+        print(f"Error purchasing listing: {e}")
+        return {"success": False, "reason": "error", "error": "Purchase failed"}
+    finally:
+        conn.close()
+
+    _after_purchase(result)
+    return result
+
+
+def purchase_marketplace_listings_bulk(buyer_uuid: str, listing_ids: list[int]) -> list:
+    """
+    Buy many listings in one transaction, each under its own savepoint so a
+    failed item (sold, unaffordable, ...) doesn't undo the others. Returns one
+    purchase_marketplace_listing-style result per id, in order.
+    """
+    conn = get_db_connection(timeout=PURCHASE_LOCK_TIMEOUT)
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    results = []
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for listing_id in listing_ids:
+            cursor.execute("SAVEPOINT bulk_item")
+            result = _purchase_listing(cursor, buyer_uuid, listing_id)
+            if not result["success"]:
+                cursor.execute("ROLLBACK TO bulk_item")
+            cursor.execute("RELEASE bulk_item")
+            results.append(result)
+        cursor.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if _lock_error(e):
+            failure = {"success": False, "reason": "busy", "error": "Marketplace is busy, try again"}
+        else:
+            print(f"Error bulk purchasing listings: {e}")
+            failure = {"success": False, "reason": "error", "error": "Purchase failed"}
+        return [dict(failure) for _ in listing_ids]
+    finally:
+        conn.close()
+
+    for result in results:
+        if result["success"]:
+            _after_purchase(result)
+    return results
+
+# Serializes matching so two events can't both fill against the same order
+_matching_lock = threading.RLock()
+
+def load_bid_book(match_crossed: bool = True) -> int:
+    """
+    Rebuild the in-memory bid book from BuyOrders and, with match_crossed,
+    match any bids that cross a listing (e.g. if the server stopped
+    mid-match). Called once at startup, after the order book is loaded.
+    Returns the number of open orders.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, uuid, card_name, rarity, max_price, remaining
+            FROM BuyOrders
+            ORDER BY id
+        """)
+        bid_book.load(dict(r) for r in cursor.fetchall())
+    except Exception as e:
+        print(f"Error loading bid book: {e}")
+        return 0
+    finally:
+        conn.close()
+    if not match_crossed:
+        return len(bid_book)
+
+    # Settle any bid that crosses a listing. Both sides were resting, so
+    # these trade at the ask.
+    for card_name, rarity in bid_book.keys():
+        best_bid = bid_book.best(card_name, rarity)
+        if best_bid is None:
+            continue
+        crossed = order_book.search(limit=len(order_book), card_names=[card_name],
+                                    rarities=[rarity], price_max=best_bid['max_price'])
+        for listing in crossed:
+            match_listing(listing, at_ask=True)
+    return len(bid_book)
+
+
+def _fill_buy_order(cursor, order_id: int) -> bool:
+    # Use up one unit of a buy order inside the caller's transaction
+    cursor.execute("""
+        UPDATE BuyOrders
+        SET remaining = remaining - 1
+        WHERE id = ? AND remaining > 0
+        RETURNING remaining
+    """, (order_id,))
+    row = cursor.fetchone()
+    if not row:
+        return False
+    if row['remaining'] == 0:
+        cursor.execute("DELETE FROM BuyOrders WHERE id = ?", (order_id,))
+    return True
+
+
+def _settle_match(order: Dict[str, Any], listing_id: int, price: int) -> Dict[str, Any]:
+    """
+    Fill one unit of a buy order against a listing at `price`, in one
+    transaction: the listing is bought through the normal purchase core and
+    the order's remaining count is decremented.
+    """
+    conn = get_db_connection(timeout=PURCHASE_LOCK_TIMEOUT)
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        result = _purchase_listing(cursor, order['uuid'], listing_id, price=price)
+        if result["success"] and not _fill_buy_order(cursor, order['id']):
+            result = {"success": False, "reason": "order_filled", "error": "Buy order is no longer open"}
+        if not result["success"]:
+            cursor.execute("ROLLBACK")
+            return result
+        cursor.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if _lock_error(e):
+            return {"success": False, "reason": "busy", "error": "Marketplace is busy"}
+        print(f"Error settling buy order: {e}")
+        return {"success": False, "reason": "error", "error": "Settlement failed"}
+    finally:
+        conn.close()
+
+    _after_purchase(result)
+    bid_book.fill(order['id'])
+    _unfunded_orders.discard(order['id'])
+    auction_shards.publish({"kind": "buy_order", "id": order['id']})
+    result["order_id"] = order['id']
+    return result
+
+
+# A match that fails on lock contention or an error leaves a bid and a listing
+# crossed, so it is tried again after 0.5s, 1s, 2s, ... Anything still crossed
+# after that is matched when the next order for the card arrives, or at startup.
+MATCH_RETRIES = 8
+MATCH_RETRY_DELAY = 0.5
+
+def _retry_match_later(match: Callable[..., Any], *args, attempt: int):
+    if attempt > MATCH_RETRIES:
+        print(f"Giving up on {match.__name__}{args} after {MATCH_RETRIES} retries")
+        return
+    timer = threading.Timer(MATCH_RETRY_DELAY * 2 ** (attempt - 1), match, args, {"attempt": attempt + 1})
+    timer.daemon = True
+    timer.start()
+
+
+# Buy orders whose owner has been told they can't cover a match; cleared on a fill
+_unfunded_orders: Set[int] = set()
+
+def _notify_unfunded_order(order: Dict[str, Any], price: int):
+    """
+    Tell a bidder their resting order just missed a match because they can't
+    cover it. The order stays open. Sent once per order until it next fills.
+    """
+    if order['id'] in _unfunded_orders:
+        return
+    _unfunded_orders.add(order['id'])
+    alert = {
+        "type": "buy_order_unfunded",
+        "order_id": order['id'],
+        "card_name": order['card_name'],
+        "rarity": order['rarity'],
+        "price": price,
+        "ts": time.time()
+    }
+    if market_feed.is_connected(order['uuid']):
+        market_feed.notify_user(order['uuid'], alert)
+        return
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            INSERT INTO Notifications (uuid, kind, payload, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (order['uuid'], "buy_order_unfunded", json.dumps(alert), alert["ts"]))
+        conn.commit()
+    except Exception as e:
+        print(f"Error storing notification: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def match_listing(listing: Dict[str, Any], at_ask: bool = False, attempt: int = 1) -> Optional[Dict[str, Any]]:
+    """
+    Try to fill a (new) listing from the standing bids for its card, in
+    price-time priority. The listing is the incoming order, so it trades at
+    the resting bid's price (or at the ask if `at_ask`, for listings that were
+    already resting). Bids their owner can't currently pay for are skipped
+    (the order stays open and its owner is notified). If the database is busy
+    the match is retried in the background.
+    Returns the fill, or None if the listing is still open.
+    """
+    with _matching_lock:
+        for order in bid_book.matching(listing['card_name'], listing['rarity'], listing['price']):
+            if order['uuid'] == listing['uuid']:
+                continue
+            price = listing['price'] if at_ask else order['max_price']
+            result = _settle_match(order, listing['id'], price)
+            if result["success"]:
+                return result
+            if result["reason"] == "insufficient_funds":
+                _notify_unfunded_order(order, price)
+                continue
+            if result["reason"] == "order_filled":
+                continue
+            if result["reason"] in ("busy", "error"):
+                _retry_match_later(match_listing, listing, at_ask, attempt=attempt)
+            # Listing gone (sold, cancelled or expired) or unsellable: nothing to match
+            return None
+    return None
+
+
+def match_buy_order(order_id: int, attempt: int = 1) -> list:
+    """
+    Fill a (new) buy order from the cheapest listings at or under its max
+    price, in price-time priority. The bid is the incoming order, so each fill
+    trades at the listing's asking price. If the buyer can't pay, the order
+    stays open and they are notified; if the database is busy the match is
+    retried in the background. Returns the list of fills.
+    """
+    fills = []
+    with _matching_lock:
+        skipped = set()
+        while True:
+            order = bid_book.get(order_id)
+            if order is None:
+                break
+            candidates = [
+                listing for listing in order_book.search(
+                    limit=len(skipped) + 1,
+                    card_names=[order['card_name']],
+                    rarities=[order['rarity']],
+                    price_max=order['max_price']
+                )
+                if listing['id'] not in skipped
+            ]
+            if not candidates:
+                break
+            listing = candidates[0]
+            if listing['uuid'] == order['uuid']:
+                skipped.add(listing['id'])
+                continue
+
+            result = _settle_match(order, listing['id'], listing['price'])
+            if result["success"]:
+                fills.append(result)
+            elif result["reason"] == "insufficient_funds":
+                _notify_unfunded_order(order, listing['price'])
+                break
+            elif result["reason"] == "unavailable":
+                # Bought by someone else between the search and the claim
+                skipped.add(listing['id'])
+            elif result["reason"] in ("busy", "error"):
+                _retry_match_later(match_buy_order, order_id, attempt=attempt)
+                break
+            else:
+                break
+    return fills
+
+
+def create_buy_order(buyer_uuid: str, card_name: str, rarity: str, max_price: int,
+                     quantity: int = 1) -> Optional[Dict[str, Any]]:
+    """
+    Place a standing bid and immediately match it against existing listings.
+    Returns {"order_id", "fills", "remaining"} or None on error.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO BuyOrders (uuid, card_name, rarity, max_price, remaining, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (buyer_uuid, card_name, rarity, max_price, quantity, time.time()))
+        order_id = cursor.lastrowid
+        conn.commit()
+    except Exception as e:
+        print(f"Error creating buy order: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+    bid_book.add({
+        "id": order_id,
+        "uuid": buyer_uuid,
+        "card_name": card_name,
+        "rarity": rarity,
+        "max_price": max_price,
+        "remaining": quantity
+    })
+    auction_shards.publish({"kind": "buy_order", "id": order_id})
+    fills = match_buy_order(order_id)
+    order = bid_book.get(order_id)
+    return {
+        "order_id": order_id,
+        "fills": fills,
+        "remaining": order['remaining'] if order else 0
+    }
+
+
+def cancel_buy_order(user_uuid: str, order_id: int) -> bool:
+    """Cancel one of the user's open buy orders."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM BuyOrders WHERE id = ? AND uuid = ?", (order_id, user_uuid))
+        if cursor.rowcount != 1:
+            return False
+        conn.commit()
+        bid_book.remove(order_id)
+        _unfunded_orders.discard(order_id)
+        auction_shards.publish({"kind": "buy_order", "id": order_id})
+        return True
+    except Exception as e:
+        print(f"Error cancelling buy order: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def get_user_buy_orders(user_uuid: str) -> list:
+    """All of a user's open buy orders, oldest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, card_name, rarity, max_price, remaining, created_at
+            FROM BuyOrders
+            WHERE uuid = ?
+            ORDER BY id
+        """, (user_uuid,))
+        return [dict(r) for r in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting buy orders: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def load_watch_rules() -> int:
+    """Rebuild the in-memory watch index from WatchRules. Called once at startup."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT id, uuid, card_name, rarity, max_price FROM WatchRules").fetchall()
+        watch_index.load(dict(r) for r in rows)
+        return len(rows)
+    except Exception as e:
+        print(f"Error loading watch rules: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def add_watch_rule(user_uuid: str, card_name: str, rarity: str, max_price: int) -> Optional[int]:
+    """Watch for listings of a card at or below max_price. Returns the rule id."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO WatchRules (uuid, card_name, rarity, max_price, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_uuid, card_name, rarity, max_price, time.time()))
+        rule_id = cursor.lastrowid
+        conn.commit()
+    except Exception as e:
+        print(f"Error adding watch rule: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+    watch_index.add({
+        "id": rule_id,
+        "uuid": user_uuid,
+        "card_name": card_name,
+        "rarity": rarity,
+        "max_price": max_price
+    })
+    auction_shards.publish({"kind": "watch_rule", "id": rule_id})
+    return rule_id
+
+
+def remove_watch_rule(user_uuid: str, rule_id: int) -> bool:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM WatchRules WHERE id = ? AND uuid = ?", (rule_id, user_uuid))
+        if cursor.rowcount != 1:
+            return False
+        conn.commit()
+        watch_index.remove(rule_id)
+        auction_shards.publish({"kind": "watch_rule", "id": rule_id})
+        return True
+    except Exception as e:
+        print(f"Error removing watch rule: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def get_watch_rules(user_uuid: str) -> list:
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT id, card_name, rarity, max_price, created_at
+            FROM WatchRules
+            WHERE uuid = ?
+            ORDER BY id
+        """, (user_uuid,)).fetchall()
+        return [dict(r) for r in rows]
+    except Exception as e:
+        print(f"Error getting watch rules: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def notify_watchers(listings: list) -> int:
+    """
+    Send price alerts for new listings. Triggered rules come from the watch
+    index; users with an open /ws/marketplace socket get the alert live,
+    everyone else gets it in their Notifications inbox (one insert batch).
+    Listings that were already sold to a buy order are skipped.
+    Returns the number of alerts sent.
+    """
+    inbox = []
+    sent = 0
+    now = time.time()
+    for listing in listings:
+        if order_book.loaded and listing['id'] not in order_book:
+            continue
+        for rule in watch_index.triggered(listing['card_name'], listing['rarity'], listing['price']):
+            if rule['uuid'] == listing['uuid']:
+                continue
+            alert = {
+                "type": "price_alert",
+                "rule_id": rule['id'],
+                "max_price": rule['max_price'],
+                "listing": {
+                    "id": listing['id'],
+                    "card_name": listing['card_name'],
+                    "rarity": listing['rarity'],
+                    "price": listing['price']
+                },
+                "ts": now
+            }
+            sent += 1
+            if market_feed.is_connected(rule['uuid']):
+                market_feed.notify_user(rule['uuid'], alert)
+            else:
+                inbox.append((rule['uuid'], "price_alert", json.dumps(alert), now))
+
+    if inbox:
+        conn = get_db_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO Notifications (uuid, kind, payload, created_at)
+                VALUES (?, ?, ?, ?)
+            """, inbox)
+            conn.commit()
+        except Exception as e:
+            print(f"Error storing notifications: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+    return sent
+
+
+def get_notifications(user_uuid: str, unread_only: bool = True, mark_read: bool = True,
+                      limit: int = 50) -> list:
+    """
+    A user's inbox, oldest first. Returned notifications are marked read
+    unless mark_read is False.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT id, kind, payload, created_at, read_at
+            FROM Notifications
+            WHERE uuid = ? {"AND read_at IS NULL" if unread_only else ""}
+            ORDER BY id
+            LIMIT ?
+        """, (user_uuid, limit))
+        rows = cursor.fetchall()
+        notifications = [{
+            "id": r['id'],
+            "kind": r['kind'],
+            "payload": json.loads(r['payload']),
+            "created_at": r['created_at'],
+            "read_at": r['read_at']
+        } for r in rows]
+
+        if mark_read and notifications:
+            ids = [n['id'] for n in notifications if n['read_at'] is None]
+            if ids:
+                cursor.execute(f"""
+                    UPDATE Notifications SET read_at = ?
+                    WHERE id IN ({",".join("?" * len(ids))})
+                """, (time.time(), *ids))
+                conn.commit()
+        return notifications
+    except Exception as e:
+        print(f"Error getting notifications: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def create_bundle(seller_uuid: str, items: list, price: int, title: Optional[str] = None) -> Dict[str, Any]:
+    """
+    List several cards together at one price. `items` is a list of dicts with
+    card_name and rarity (repeat an item to include several copies). Every
+    card is reserved in escrow in one transaction; if the seller is missing
+    any of them nothing is listed.
+
+    Returns {"success": True, "bundle_id": id} or
+    {"success": False, "error": msg, "item": index}.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO MarketBundles (uuid, title, price, card_count, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (seller_uuid, title, price, len(items), time.time()))
+        bundle_id = cursor.lastrowid
+
+        for index, item in enumerate(items):
+            cursor.execute("""
+                UPDATE CardsOpened
+                SET escrow = 'bundle'
+                WHERE id = (
+                    SELECT id FROM CardsOpened
+                    WHERE uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+                    ORDER BY id
+                    LIMIT 1
+                )
+                RETURNING id
+            """, (seller_uuid, item['card_name'], item['rarity']))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return {
+                    "success": False,
+                    "error": f"You don't own an unlisted copy of {item['card_name']} ({item['rarity']})",
+                    "item": index
+                }
+            cursor.execute("""
+                INSERT INTO MarketBundleItems (bundle_id, card_id, card_name, rarity)
+                VALUES (?, ?, ?, ?)
+            """, (bundle_id, row['id'], item['card_name'], item['rarity']))
+
+        conn.commit()
+        return {"success": True, "bundle_id": bundle_id}
+    except Exception as e:
+        print(f"Error creating bundle: {e}")
+        conn.rollback()
+        return {"success": False, "error": "Failed to list bundle", "item": None}
+    finally:
+        conn.close()
+
+
+def _bundle_items(cursor, bundle_ids: list[int]) -> Dict[int, list]:
+    if not bundle_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT bundle_id, card_id, card_name, rarity
+        FROM MarketBundleItems
+        WHERE bundle_id IN ({",".join("?" * len(bundle_ids))})
+        ORDER BY bundle_id, card_name, rarity
+    """, bundle_ids)
+    items: Dict[int, list] = {bundle_id: [] for bundle_id in bundle_ids}
+    for row in cursor.fetchall():
+        items[row['bundle_id']].append({"card_name": row['card_name'], "rarity": row['rarity']})
+    return items
+
+
+def query_bundles(limit: int = 10, card_name: Optional[str] = None, price_max: Optional[int] = None,
+                  after: Optional[list] = None) -> list:
+    """
+    Cheapest bundles first, each with its list of cards. `card_name` keeps
+    bundles containing that card; `after` is a (price, id) keyset cursor.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql = "SELECT b.id, b.uuid, b.title, b.price, b.card_count FROM MarketBundles b WHERE 1 = 1"
+        params: list = []
+        if card_name:
+            sql += " AND EXISTS (SELECT 1 FROM MarketBundleItems i WHERE i.bundle_id = b.id AND i.card_name = ?)"
+            params.append(card_name)
+        if price_max is not None:
+            sql += " AND b.price <= ?"
+            params.append(price_max)
+        if after is not None:
+            sql += " AND (b.price, b.id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY b.price, b.id LIMIT ?"
+        params.append(limit)
+
+        cursor.execute(sql, params)
+        bundles = [dict(r) for r in cursor.fetchall()]
+        items = _bundle_items(cursor, [b['id'] for b in bundles])
+        for bundle in bundles:
+            bundle['cards'] = items[bundle['id']]
+        return bundles
+    except Exception as e:
+        print(f"Error querying bundles: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def purchase_bundle(buyer_uuid: str, bundle_id: int) -> Dict[str, Any]:
+    """
+    Buy a bundle in a single transaction: claim the parent row, move the
+    money, then move every escrowed card to the buyer with one UPDATE.
+    Returns the same shape as purchase_marketplace_listing, with "bundle"
+    instead of "listing".
+    """
+    def fail(reason: str, error: str) -> Dict[str, Any]:
+        cursor.execute("ROLLBACK")
+        return {"success": False, "reason": reason, "error": error}
+
+    conn = get_db_connection(timeout=PURCHASE_LOCK_TIMEOUT)
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            DELETE FROM MarketBundles
+            WHERE id = ?
+            RETURNING id, uuid, title, price, card_count
+        """, (bundle_id,))
+        row = cursor.fetchone()
+        if not row:
+            return fail("unavailable", "Bundle is no longer available")
+        bundle = dict(row)
+        seller_uuid = bundle['uuid']
+        price = bundle['price']
+
+        if seller_uuid == buyer_uuid:
+            return fail("own_listing", "Cannot buy your own bundle")
+
+        cursor.execute("""
+            UPDATE Bank
+            SET money = money - ?
+            WHERE uuid = ? AND money - reserved >= ?
+        """, (price, buyer_uuid, price))
+        if cursor.rowcount != 1:
+            return fail("insufficient_funds", "Insufficient funds")
+
+        cursor.execute("UPDATE Bank SET money = money + ? WHERE uuid = ?", (price, seller_uuid))
+        if cursor.rowcount != 1:
+            return fail("seller_missing", "Seller bank account not found")
+
+        bundle['cards'] = _bundle_items(cursor, [bundle_id])[bundle_id]
+        cursor.execute("""
+            UPDATE CardsOpened
+            SET uuid = ?, escrow = NULL
+            WHERE uuid = ? AND id IN (SELECT card_id FROM MarketBundleItems WHERE bundle_id = ?)
+        """, (buyer_uuid, seller_uuid, bundle_id))
+        if cursor.rowcount != bundle['card_count']:
+            return fail("card_missing", "Seller no longer owns every card in this bundle")
+
+        cursor.execute("DELETE FROM MarketBundleItems WHERE bundle_id = ?", (bundle_id,))
+        cursor.execute("COMMIT")
+        return {"success": True, "bundle": bundle}
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if _lock_error(e):
+            return {"success": False, "reason": "busy", "error": "Bundle is being purchased by someone else, try again"}
+        print(f"Error purchasing bundle: {e}")
+        return {"success": False, "reason": "error", "error": "Purchase failed"}
+    finally:
+        conn.close()
+
+
+def cancel_bundle(user_uuid: str, bundle_id: int) -> bool:
+    """Cancel one of the user's bundles and release its cards from escrow."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM MarketBundles WHERE id = ? AND uuid = ?", (bundle_id, user_uuid))
+        if cursor.rowcount != 1:
+            return False
+        cursor.execute("""
+            UPDATE CardsOpened
+            SET escrow = NULL
+            WHERE id IN (SELECT card_id FROM MarketBundleItems WHERE bundle_id = ?)
+        """, (bundle_id,))
+        cursor.execute("DELETE FROM MarketBundleItems WHERE bundle_id = ?", (bundle_id,))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error cancelling bundle: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def record_auction_events(events: list) -> bool:
+    """
+    Append (auction_id, room_id, kind, payload) tuples to the auction log in
+    one transaction. payload is a dict, stored as JSON.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        _insert_auction_events(cursor, events)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error recording auction events: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def _insert_auction_events(cursor, events: list):
+    now = time.time()
+    cursor.executemany("""
+        INSERT INTO AuctionEvents (auction_id, room_id, kind, payload, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(auction_id, room_id, kind, json.dumps(payload), now)
+          for auction_id, room_id, kind, payload in events])
+
+
+def get_available_balances(user_uuids) -> Dict[str, int]:
+    """Spendable money (money - reserved) per user, for validating bids."""
+    user_uuids = list(set(user_uuids))
+    if not user_uuids:
+        return {}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        placeholders = ",".join("?" * len(user_uuids))
+        cursor.execute(f"""
+            SELECT uuid, money - reserved AS available
+            FROM Bank
+            WHERE uuid IN ({placeholders})
+        """, user_uuids)
+        return {row["uuid"]: row["available"] for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error reading balances: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def _release_auction_hold(cursor, auction_id: str) -> Optional[Dict[str, Any]]:
+    cursor.execute("""
+        DELETE FROM AuctionHolds
+        WHERE auction_id = ?
+        RETURNING uuid, amount
+    """, (auction_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    cursor.execute("UPDATE Bank SET reserved = reserved - ? WHERE uuid = ?", (row["amount"], row["uuid"]))
+    return dict(row)
+
+
+def move_auction_hold(auction_id: str, bidder_uuid: str, amount: int, events: list) -> bool:
+    """
+    Move an auction's hold to its new leading bid in one transaction: release
+    the previous leader's hold, reserve `amount` of the bidder's spendable
+    money, and append the bid events. False (and nothing changed) if the
+    bidder can't cover it.
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        _release_auction_hold(cursor, auction_id)
+        cursor.execute("""
+            UPDATE Bank
+            SET reserved = reserved + ?
+            WHERE uuid = ? AND money - reserved >= ?
+        """, (amount, bidder_uuid, amount))
+        if cursor.rowcount != 1:
+            cursor.execute("ROLLBACK")
+            return False
+        cursor.execute("""
+            INSERT INTO AuctionHolds (auction_id, uuid, amount, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (auction_id, bidder_uuid, amount, time.time()))
+        _insert_auction_events(cursor, events)
+        cursor.execute("COMMIT")
+        return True
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Error moving auction hold: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def queue_auction_card(card_id: int, events: list) -> Dict[str, Any]:
+    """
+    Put a card up for auction: reserve it in escrow ('auction') and append
+    the 'queued' event in one transaction, so a queued auction always has
+    its card. Returns {"success": True} or {"success": False, "reason",
+    "error"}; reason "card_taken" means the card was escrowed meanwhile.
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            UPDATE CardsOpened
+            SET escrow = 'auction'
+            WHERE id = ? AND escrow IS NULL
+        """, (card_id,))
+        if cursor.rowcount != 1:
+            cursor.execute("ROLLBACK")
+            return {"success": False, "reason": "card_taken", "error": "Card is already listed"}
+        _insert_auction_events(cursor, events)
+        cursor.execute("COMMIT")
+        return {"success": True}
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Error queueing auction card: {e}")
+        return {"success": False, "reason": "error", "error": str(e)}
+    finally:
+        conn.close()
+
+
+def settle_auction(auction_id: str, card_id: Optional[int], seller_uuid: str, card_name: str,
+                   rarity: str, events: list) -> Dict[str, Any]:
+    """
+    Settle a won auction against its hold in a single transaction: charge
+    the held amount, pay the seller, hand the escrowed card (card_id) over,
+    record the trade and append the 'ended' event. Auctions queued before
+    cards were escrowed have no card_id and transfer any free copy instead.
+    If the card can't be transferred, the hold is released instead and the
+    auction still ends. Returns {"success", "winner_uuid", "amount"} or
+    {"success": False, "reason", "error"}.
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        hold = _release_auction_hold(cursor, auction_id)
+        if hold is None:
+            cursor.execute("ROLLBACK")
+            return {"success": False, "reason": "no_hold", "error": "No funds held for this auction"}
+        winner_uuid, amount = hold["uuid"], hold["amount"]
+
+        if card_id is not None:
+            # The card is already in escrow, so this is a primary-key update
+            cursor.execute("""
+                UPDATE CardsOpened
+                SET uuid = ?, escrow = NULL
+                WHERE id = ? AND uuid = ? AND escrow = 'auction'
+            """, (winner_uuid, card_id, seller_uuid))
+        else:
+            cursor.execute("""
+                UPDATE CardsOpened
+                SET uuid = ?
+                WHERE id = (
+                    SELECT id FROM CardsOpened
+                    WHERE uuid = ? AND card_name = ? AND rarity = ? AND escrow IS NULL
+                    LIMIT 1
+                )
+            """, (winner_uuid, seller_uuid, card_name, rarity))
+        if cursor.rowcount != 1:
+            # Hold already released above; just end the auction
+            _insert_auction_events(cursor, events)
+            cursor.execute("COMMIT")
+            return {"success": False, "reason": "card_missing", "winner_uuid": winner_uuid,
+                    "amount": amount, "error": "Seller no longer owns this card"}
+
+        # The hold guarantees the money is there
+        cursor.execute("UPDATE Bank SET money = money - ? WHERE uuid = ?", (amount, winner_uuid))
+        cursor.execute("UPDATE Bank SET money = money + ? WHERE uuid = ?", (amount, seller_uuid))
+        traded_at = time.time()
+        _insert_trade(cursor, card_name, rarity, amount, "auction", winner_uuid, seller_uuid, traded_at)
+        _insert_auction_events(cursor, events)
+        cursor.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Error settling auction: {e}")
+        return {"success": False, "reason": "error", "error": str(e)}
+    finally:
+        conn.close()
+
+    price_stats.record(card_name, rarity, amount, ts=traded_at)
+    market_feed.trade(card_name, rarity, amount, traded_at=traded_at)
+    auction_shards.publish({"kind": "trade", "card_name": card_name, "rarity": rarity,
+                            "price": amount, "traded_at": traded_at})
+    return {"success": True, "winner_uuid": winner_uuid, "amount": amount}
+
+
+def release_auction(auction_id: str, card_id: Optional[int], events: list) -> bool:
+    """
+    End an auction without a sale: release any hold on it, return the card
+    from escrow to the seller and append the 'ended' event, in one
+    transaction. Used for auctions with no bids and when settlement keeps
+    failing.
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None  # manage BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        _release_auction_hold(cursor, auction_id)
+        if card_id is not None:
+            cursor.execute("UPDATE CardsOpened SET escrow = NULL WHERE id = ? AND escrow = 'auction'", (card_id,))
+        _insert_auction_events(cursor, events)
+        cursor.execute("COMMIT")
+        return True
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Error releasing auction: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def load_open_auctions() -> list:
+    """
+    Replay the auction log for every auction that never ended. Returns one
+    dict per auction in the order they were queued, with the listing fields
+    from 'queued' (card_id only for auctions queued since cards are
+    escrowed), plus ends_at (None if it hadn't started), current_bid and
+    winner_uuid as of the last bid / extension.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT e.auction_id, e.room_id, e.kind, e.payload
+            FROM AuctionEvents e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM AuctionEvents x
+                WHERE x.auction_id = e.auction_id AND x.kind = 'ended'
+            )
+            ORDER BY e.id ASC
+        """)
+        auctions: Dict[str, Dict[str, Any]] = {}
+        for row in cursor.fetchall():
+            payload = json.loads(row["payload"])
+            if row["kind"] == "queued":
+                auctions[row["auction_id"]] = dict(payload, auction_id=row["auction_id"],
+                                                   room_id=row["room_id"], ends_at=None,
+                                                   current_bid=payload["starting"], winner_uuid=None)
+                continue
+            auction = auctions.get(row["auction_id"])
+            if auction is None:
+                continue
+            if row["kind"] in ("started", "extended"):
+                auction["ends_at"] = payload["ends_at"]
+                auction["room_id"] = row["room_id"]
+            elif row["kind"] == "bid":
+                auction["current_bid"] = payload["amount"]
+                auction["winner_uuid"] = payload["bidder_uuid"]
+        return list(auctions.values())
+    except Exception as e:
+        print(f"Error loading open auctions: {e}")
+        return []
+    finally:
+        conn.close()
+
+
 def create_bank_account(user_uuid: str, starting_balance: int = 100) -> bool:
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -0,0 +1,52 @@
+# opaque keyset cursors.
+# A cursor is the sort key of the last row on a page (e.g. price + id),
+# JSON-encoded and base64url'd so clients treat it as an opaque token. The
+# next page then starts with a "WHERE (key) > (cursor)" seek instead of an
+# OFFSET scan.
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+# Upper bound on any single page, whatever the client asks for
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+# cursor element types for decode_cursor
+NUMBER = (int, float)
+TIMESTAMP = (str,)
+ROW_ID = (int,)
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[Tuple[type, ...]]) -> Optional[List[Any]]:
+    """
+    Decode a cursor produced by encode_cursor. `types` gives the accepted
+    types of each element, e.g. (NUMBER, ROW_ID) for a price + id cursor.
+    Returns None for an empty cursor; raises ValueError if it is malformed,
+    has the wrong arity, or an element has the wrong type.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid cursor")
+    for value, allowed in zip(values, types):
+        # bool is an int subclass but never a valid key
+        if isinstance(value, bool) or not isinstance(value, allowed):
+            raise ValueError("Invalid cursor")
+    return values
+
+
+def page_size(limit: Optional[int], default: int = 10) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE."""
+    if limit is None:
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))